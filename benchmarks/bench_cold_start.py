@@ -0,0 +1,142 @@
+"""
+Benchmark: cold start of the API, from process start to its first responses.
+
+Every run starts the API (`<package>.main:app` by default) in a fresh uvicorn process, as a serverless platform
+does on a cold start, against a migrated SQLite database and the local stub upstream, and measures:
+
+- import: the time to import the application module, in a separate interpreter;
+- first_response: from process start until `GET /stats` is answered;
+- first_completion: from process start until a `POST /requests/` sent right after is answered
+  (an upstream call to the stub, so it includes opening the OpenAI session and the database).
+
+The median, minimum and maximum over the runs are printed and written to a JSON report tagged with
+the git commit, which `benchmarks.compare_reports` compares like the load test reports.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.benchmarks.bench_cold_start --runs 10
+    python -m package.benchmarks.bench_cold_start --app package.main:create_app --factory --env MODEL_CATALOG_ENABLED=False
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from .loadgen import MODEL, PACKAGE, RESULTS_DIR, _git, _report_path, migrate
+from .stub_upstream import StubUpstream
+
+PHASES = ("import", "first_response", "first_completion")
+
+def _import_seconds(module: str, env: Dict[str, str]) -> float:
+    code = ("import importlib, time; started = time.perf_counter(); "
+            f"importlib.import_module({module!r}); print(time.perf_counter() - started)")
+    result = subprocess.run([sys.executable, "-c", code], env={**os.environ, **env},
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+def _wait_for_response(url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"The API exited with status {process.returncode} during startup")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                response.read()
+                return
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"The API did not answer {url} within {timeout}s")
+            time.sleep(0.005)
+
+def cold_start(args, env: Dict[str, str]) -> Dict[str, float]:
+    """
+    Starts the API once and returns the seconds from process start to its first responses.
+    """
+    base_url = f"http://127.0.0.1:{args.port}"
+    command = [sys.executable, "-m", "uvicorn", args.app, "--host", "127.0.0.1", "--port", str(args.port),
+               "--log-level", "warning", "--no-access-log"] + (["--factory"] if args.factory else [])
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env={**os.environ, **env})
+    try:
+        _wait_for_response(f"{base_url}/stats", process, args.timeout)
+        first_response = time.perf_counter() - started
+        request = urllib.request.Request(
+            f"{base_url}/requests/", data=json.dumps({"prompt": "cold start", "model": MODEL}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=args.timeout) as response:
+            response.read()
+        first_completion = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+    return {"first_response": first_response, "first_completion": first_completion}
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "median": round(statistics.median(samples) * 1000, 1),
+        "min": round(min(samples) * 1000, 1),
+        "max": round(max(samples) * 1000, 1),
+    }
+
+def main(args):
+    samples: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    with StubUpstream(port=args.stub_port, latency_ms=args.latency_ms, models_latency_ms=args.models_latency_ms) as stub:
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as workdir:
+                env = {
+                    "OPENAI_API_KEY": "sk-benchmark",
+                    "OPENAI_API_BASE": stub.api_base,
+                    "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'cold_start.db')}",
+                    "LOG_LEVEL": "WARNING",
+                    **dict(setting.split("=", 1) for setting in args.env),
+                }
+                migrate(env)
+                samples["import"].append(_import_seconds(args.app.split(":")[0], env))
+                for phase, seconds in cold_start(args, env).items():
+                    samples[phase].append(seconds)
+
+    results = {phase: _summary(samples[phase]) for phase in PHASES}
+    for phase, summary in results.items():
+        print(f"{phase:>16} | median {summary['median']:8.1f} ms | min {summary['min']:8.1f} ms | max {summary['max']:8.1f} ms")
+
+    commit = _git("rev-parse", "HEAD")
+    report = {
+        "workload": "cold_start",
+        "mode": "factory" if args.factory else "app",
+        "git_commit": commit,
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {"app": args.app, "runs": args.runs, "latency_ms": args.latency_ms,
+                   "models_latency_ms": args.models_latency_ms, "app_env": args.env},
+        "cold_start_ms": results,
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = _report_path(args.output_dir, commit, report["workload"], report["mode"])
+    with open(path, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"Report written to {path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default=f"{PACKAGE}.main:app", help="ASGI application, as module:attribute.")
+    parser.add_argument("--factory", action="store_true", help="Treat --app as a function returning the application.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--stub-port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Latency of stub completions.")
+    parser.add_argument("--models-latency-ms", type=float, default=300.0,
+                        help="Latency of the stub's model endpoints, e.g. the model catalog load.")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--env", action="append", default=[], metavar="SETTING=VALUE",
+                        help="Setting passed to the API process, e.g. MODEL_CATALOG_ENABLED=False. Repeatable.")
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    main(parser.parse_args())
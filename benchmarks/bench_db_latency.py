@@ -0,0 +1,116 @@
+"""
+Benchmark: API request latency under database load, sync Session vs AsyncSession.
+
+Simulates the `POST /requests` handler: each request loads the user's settings from the database
+and then awaits the upstream call (a sleep of --upstream-ms). Many requests run concurrently, and
+a share of them also update settings to keep the database busy with writes. The "sync" row runs
+the previous blocking `Session` queries inside async functions; the "async" row uses db_service on
+the pooled AsyncSession. A blocking query stalls every other request on the event loop, which
+shows up in p99 latency and in the event loop lag column.
+
+Point DATABASE_URL at a PostgreSQL server for representative numbers; the SQLite default only
+exercises the code paths.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.benchmarks.bench_db_latency --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ..database import Base, SessionLocal, close_db, engine, init_db
+from ..models.settings import SettingsModel
+from ..schemas.settings_schema import SettingsSchema
+from ..services.db_service import db_service
+from ..utils.config import settings
+
+def _percentile(samples, percent):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+async def _sync_request(sync_session, user_id, write):
+    # The pre-async code path: blocking Session queries inside an async function.
+    db = sync_session()
+    try:
+        user_settings = db.query(SettingsModel).filter(SettingsModel.user_id == user_id).first()
+        if write:
+            user_settings.cache_expiration_time = random.randint(60, 3600)
+            db.commit()
+    finally:
+        db.close()
+
+async def _async_request(user_id, write):
+    async with SessionLocal() as db:
+        user_settings = await db_service.get_settings(db, user_id)
+        if write:
+            await db_service.update_settings(
+                db, SettingsSchema(api_key=user_settings.api_key, cache_expiration_time=random.randint(60, 3600)), user_id
+            )
+
+async def _loop_lag(stop: asyncio.Event, samples):
+    # Measures how late a 1 ms timer fires, i.e. how long the event loop was blocked.
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        samples.append(time.perf_counter() - started - 0.001)
+
+async def _run(label, handle_request, args):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, lag = [], []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await handle_request(f"bench-user-{i % args.users}", random.random() < args.write_ratio)
+            await asyncio.sleep(args.upstream_ms / 1000)
+            latencies.append(time.perf_counter() - started)
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_loop_lag(stop, lag))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+    print(f"{label:>6} | {args.requests / elapsed:8.1f} req/s | p50 {statistics.median(latencies) * 1000:8.1f} ms | "
+          f"p99 {_percentile(latencies, 99) * 1000:8.1f} ms | loop lag p99 {_percentile(lag, 99) * 1000:7.1f} ms")
+
+async def main(args):
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+    await init_db()
+    async with SessionLocal() as db:
+        for i in range(args.users):
+            await db_service.create_settings(db, SettingsSchema(api_key=f"sk-bench-{i}"), f"bench-user-{i}")
+
+    sync_engine = create_engine(settings.DATABASE_URL, pool_size=settings.DATABASE_POOL_SIZE) \
+        if not settings.DATABASE_URL.startswith("sqlite") else create_engine(settings.DATABASE_URL)
+    sync_session = sessionmaker(sync_engine)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {args.users} users, "
+          f"{args.write_ratio:.0%} writes, upstream {args.upstream_ms} ms, database {engine.url.get_backend_name()}")
+    await _run("sync", lambda user_id, write: _sync_request(sync_session, user_id, write), args)
+    await _run("async", _async_request, args)
+
+    sync_engine.dispose()
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+    await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--upstream-ms", type=float, default=50)
+    asyncio.run(main(parser.parse_args()))
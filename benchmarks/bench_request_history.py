@@ -0,0 +1,127 @@
+"""
+Benchmark: request history page latency, keyset pagination vs OFFSET, as the page depth grows.
+
+Seeds the requests table with --rows rows spread over --users users, then times fetching one page of
+a user's history at increasing depths. The keyset row uses db_service.list_requests with a cursor
+pointing at that depth; the offset row runs the same filtered, ordered query with OFFSET. Keyset
+latency stays flat because the (user_id, created_at, id) index seeks straight to the cursor, while
+OFFSET has to walk past every skipped row.
+
+Seeding 50M rows is done server-side with generate_series and needs PostgreSQL; on other databases
+rows are inserted from Python, so use a smaller --rows.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.benchmarks.bench_request_history --rows 50000000
+    python -m package.benchmarks.bench_request_history --skip-seed   # reuse the rows of a previous run
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+
+from sqlalchemy import delete, insert, select, text
+
+from ..database import Base, SessionLocal, close_db, engine
+from ..models.request import RequestModel
+from ..models.settings import SettingsModel
+from ..services.db_service import db_service, encode_cursor
+
+SEED_CHUNK_ROWS = 1_000_000
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def _settings_id(user: int) -> str:
+    return f"bench-settings-{user}"
+
+async def _seed(args):
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(delete(RequestModel))
+        await connection.execute(delete(SettingsModel))
+        await connection.execute(insert(SettingsModel), [
+            {"id": _settings_id(user), "user_id": f"bench-user-{user}", "api_key": "sk-bench"} for user in range(args.users)
+        ])
+
+    postgres = engine.dialect.name == "postgresql"
+    chunk_rows = SEED_CHUNK_ROWS if postgres else 50_000
+    started = time.perf_counter()
+    for first in range(0, args.rows, chunk_rows):
+        last = min(first + chunk_rows, args.rows)
+        async with engine.begin() as connection:
+            if postgres:
+                await connection.execute(text("""
+                    INSERT INTO requests (id, user_id, prompt, model, parameters, response, status, created_at)
+                    SELECT lpad(g::text, 12, '0'), 'bench-settings-' || (g % :users), 'Benchmark prompt',
+                           'text-davinci-003', NULL, '"Benchmark response"',
+                           CASE WHEN g % 20 = 0 THEN 'failed' ELSE 'completed' END,
+                           :start + g * interval '1 second'
+                    FROM generate_series(:first, :last - 1) AS g
+                """), {"users": args.users, "start": START, "first": first, "last": last})
+            else:
+                await connection.execute(insert(RequestModel), [
+                    {"id": f"{g:012d}", "user_id": _settings_id(g % args.users), "prompt": "Benchmark prompt",
+                     "model": "text-davinci-003", "response": "Benchmark response",
+                     "status": "failed" if g % 20 == 0 else "completed", "created_at": START + timedelta(seconds=g)}
+                    for g in range(first, last)
+                ])
+        print(f"seeded {last}/{args.rows} rows ({time.perf_counter() - started:.0f} s)")
+    async with engine.begin() as connection:
+        await connection.execute(text("ANALYZE requests" if postgres else "ANALYZE"))
+
+def _history_query(user_id: str, page_size: int):
+    return (
+        select(RequestModel)
+        .where(RequestModel.user_id == user_id)
+        .order_by(RequestModel.created_at.desc(), RequestModel.id.desc())
+        .limit(page_size)
+    )
+
+async def _median_ms(call, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await call()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+async def main(args):
+    if not args.skip_seed:
+        await _seed(args)
+
+    user_id = _settings_id(0)
+    rows_per_user = args.rows // args.users
+    depths = [depth for depth in (0, 1_000, 10_000, 100_000, 1_000_000, 10_000_000) if depth < rows_per_user]
+    print(f"{args.rows} rows, {rows_per_user} per user, page size {args.page_size}, database {engine.dialect.name}")
+    print(f"{'depth':>10} | {'keyset':>10} | {'offset':>10}")
+    async with SessionLocal() as db:
+        for depth in depths:
+            # Position the cursor at the row just before the page (untimed setup)
+            cursor = None
+            if depth:
+                row = (await db.execute(_history_query(user_id, 1).offset(depth - 1))).scalars().one()
+                cursor = encode_cursor(row.created_at, row.id)
+
+            async def keyset_page():
+                await db_service.list_requests(db, user_id=user_id, limit=args.page_size, cursor=cursor)
+
+            async def offset_page():
+                list((await db.execute(_history_query(user_id, args.page_size).offset(depth))).scalars())
+
+            keyset_ms = await _median_ms(keyset_page, args.repeats)
+            offset_ms = await _median_ms(offset_page, args.repeats)
+            db.expunge_all()
+            print(f"{depth:>10} | {keyset_ms:8.2f}ms | {offset_ms:8.2f}ms")
+    await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--skip-seed", action="store_true")
+    asyncio.run(main(parser.parse_args()))
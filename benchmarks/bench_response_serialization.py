@@ -0,0 +1,62 @@
+"""
+Benchmark: serializing a completion response, the previous way and with FastJSONResponse.
+
+The previous path built the RequestResponseSchema, converted it with `.dict()`, ran jsonable_encoder
+over the dict and rendered it with JSONResponse (json.dumps, then encode). FastJSONResponse writes
+the schema to JSON bytes in one pass. Both are timed for completion texts of growing size, ASCII
+and non-ASCII, along with the peak memory allocated while rendering one response.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.benchmarks.bench_response_serialization --sizes 1000 100000 1000000 10000000
+"""
+import argparse
+import os
+import timeit
+import tracemalloc
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from ..schemas.request_schema import RequestResponseSchema
+from ..utils.responses import FastJSONResponse
+
+def previous_path(text: str) -> bytes:
+    formatted_response = RequestResponseSchema(status="success", response=text)
+    return JSONResponse(content=jsonable_encoder(formatted_response.dict())).body
+
+def fast_path(text: str) -> bytes:
+    return FastJSONResponse(content=RequestResponseSchema(status="success", response=text)).body
+
+def _peak_bytes(render, text: str) -> int:
+    tracemalloc.start()
+    render(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def main(args):
+    print(f"{'size':>10} {'text':>9} | {'previous':>11} {'fast':>11} {'speedup':>8} | {'previous peak':>14} {'fast peak':>11}")
+    for size in args.sizes:
+        for label, unit in (("ascii", "completion text "), ("non-ascii", "réponse générée ")):
+            text = (unit * (size // len(unit) + 1))[:size]
+            assert previous_path(text) == fast_path(text)
+            number = max(1, args.budget_bytes // size)
+            timings = {}
+            for name, render in (("previous", previous_path), ("fast", fast_path)):
+                timings[name] = min(timeit.repeat(lambda: render(text), number=number, repeat=args.repeat)) / number
+            peaks = {name: _peak_bytes(render, text) for name, render in (("previous", previous_path), ("fast", fast_path))}
+            print(f"{size:>10} {label:>9} | {timings['previous'] * 1e6:>9.1f}us {timings['fast'] * 1e6:>9.1f}us "
+                  f"{timings['previous'] / timings['fast']:>7.1f}x | {peaks['previous'] / 2 ** 20:>11.2f} MB "
+                  f"{peaks['fast'] / 2 ** 20:>8.2f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000, 10_000_000],
+                        help="Completion text sizes in characters.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-bytes", type=int, default=50_000_000,
+                        help="Characters serialized per timing repeat, to keep large sizes quick.")
+    main(parser.parse_args())
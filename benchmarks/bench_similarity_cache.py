@@ -0,0 +1,72 @@
+"""
+Benchmark: lookup latency of the near-duplicate prompt cache at a large number of indexed prompts.
+
+Indexes synthetic prompts into SimilarityCache, then measures lookups of near-duplicate variants
+(changed casing, whitespace and trailing punctuation) and of unseen prompts.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.benchmarks.bench_similarity_cache --entries 1000000 --lookups 20000
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+
+from ..utils.similarity_cache import SimilarityCache
+
+WORDS = ("summarize explain translate write describe compare list the a of in on for with about report "
+         "story poem email letter product customer order invoice weather history science market team "
+         "project plan budget review summary question answer code function python data table").split()
+
+def make_prompt(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 40))) + f" #{rng.getrandbits(32)}"
+
+def perturb(prompt: str, rng: random.Random) -> str:
+    words = prompt.split(" ")
+    index = rng.randrange(len(words))
+    words[index] = words[index].upper()
+    return "  ".join(words) + rng.choice(["", ".", "?", "!"])
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def main(args):
+    rng = random.Random(42)
+    cache = SimilarityCache(threshold=args.threshold, max_entries=args.entries)
+    base = {"model": "text-davinci-003", "temperature": 0}
+
+    prompts = []
+    started = time.perf_counter()
+    for i in range(args.entries):
+        prompt = make_prompt(rng)
+        if len(prompts) < args.lookups:
+            prompts.append(prompt)
+        cache.add({**base, "prompt": prompt}, f"key-{i}")
+    elapsed = time.perf_counter() - started
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"indexed {args.entries} prompts in {elapsed:.1f} s ({args.entries / elapsed:.0f}/s), peak RSS {rss_mb:.0f} MiB")
+
+    for label, queries in (
+        ("near-duplicate", [perturb(prompt, rng) for prompt in prompts]),
+        ("unseen", [make_prompt(rng) for _ in prompts]),
+    ):
+        hits, latencies = 0, []
+        for query in queries:
+            started = time.perf_counter()
+            hits += cache.lookup({**base, "prompt": query}) is not None
+            latencies.append((time.perf_counter() - started) * 1e6)
+        print(f"{label:>14} lookups: hit rate {hits / len(queries):6.1%} | "
+              f"p50 {statistics.median(latencies):7.1f} us | p99 {percentile(latencies, 0.99):7.1f} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    main(parser.parse_args())
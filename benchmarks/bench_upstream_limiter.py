@@ -0,0 +1,93 @@
+"""
+Benchmark: bursts against a rate-limited upstream, with and without the adaptive concurrency limiter.
+
+Runs the local stub upstream with a maximum concurrency, beyond which it answers 429, and fires a
+burst of concurrent completions through OpenAIService. Without the limiter every call is sent right
+away and most of the burst fails with 429. With it, the per-model limit settles around the upstream
+capacity and the excess waits in the queue, so nearly every call succeeds.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.benchmarks.bench_upstream_limiter --max-concurrency 16 --requests 1000 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+
+import aiohttp
+import openai
+
+from .stub_upstream import StubUpstream
+from ..services.openai_service import OpenAIService
+from ..utils.cache import cache_handler
+from ..utils.concurrency_limiter import AdaptiveConcurrencyLimiter
+from ..utils.exceptions import APIError
+
+MODEL = "text-davinci-003"
+
+async def _stub_stats(stub: StubUpstream, reset: bool = False) -> dict:
+    async with aiohttp.ClientSession() as session:
+        if reset:
+            await session.post(f"http://{stub.host}:{stub.port}/stats/reset")
+            return {}
+        async with session.get(f"http://{stub.host}:{stub.port}/stats") as response:
+            return await response.json()
+
+async def _run(stub: StubUpstream, label: str, service: OpenAIService, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {"ok": 0, "429": 0, "other": 0}
+
+    async def one():
+        async with semaphore:
+            try:
+                await service.process_request({"prompt": f"benchmark {uuid.uuid4().hex}", "model": MODEL})
+                outcomes["ok"] += 1
+            except APIError as e:
+                outcomes["429" if e.status_code == 429 else "other"] += 1
+
+    await _stub_stats(stub, reset=True)
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    upstream = await _stub_stats(stub)
+    print(f"{label:>10} | {outcomes['ok'] / elapsed:8.1f} ok/s | ok {outcomes['ok']:5d} | 429 {outcomes['429']:5d} | "
+          f"other {outcomes['other']:3d} | upstream peak {upstream['peak_in_flight']:3d}, 429s sent {upstream['rate_limited']:5d}")
+    if service.limiter is not None:
+        limit = service.limiter.stats()[MODEL]
+        print(f"{'':>10} | final limit {limit['limit']}, decreases {limit['decreases']}, "
+              f"queue wait avg {limit['queue_wait_ms_avg']} ms, max {limit['queue_wait_ms_max']} ms")
+
+async def main(args):
+    with StubUpstream(port=args.port, latency_ms=args.latency_ms, max_concurrency=args.max_concurrency) as stub:
+        openai.api_base = stub.api_base
+        await cache_handler.init()
+        print(f"{args.requests} requests, client concurrency {args.concurrency}, "
+              f"upstream latency {args.latency_ms} ms, upstream max concurrency {args.max_concurrency}")
+        for label, limited in (("unlimited", False), ("adaptive", True)):
+            service = OpenAIService()
+            service.limiter = AdaptiveConcurrencyLimiter(
+                initial_limit=args.initial_limit,
+                max_limit=args.concurrency,
+                queue_timeout=None,
+                is_overload=lambda e: isinstance(e, openai.error.RateLimitError),
+            ) if limited else None
+            await service.init()
+            try:
+                await _run(stub, label, service, args.requests, args.concurrency)
+            finally:
+                await service.close()
+        await cache_handler.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--initial-limit", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
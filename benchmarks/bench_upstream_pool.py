@@ -0,0 +1,77 @@
+"""
+Benchmark: upstream concurrency of OpenAIService against the local stub upstream.
+
+Fires a fixed number of concurrent completions through OpenAIService for several connection
+pool sizes and reports throughput and the peak number of requests the upstream saw in flight.
+The "blocking" row reproduces the previous synchronous `openai.Completion.create` call inside
+an async function, whose upstream concurrency stays at 1 regardless of load.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.benchmarks.bench_upstream_pool --latency-ms 200 --requests 256
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("DATABASE_URL", "sqlite:///./benchmark.db")
+
+import aiohttp
+import openai
+
+from .stub_upstream import StubUpstream
+from ..services.openai_service import OpenAIService
+from ..utils.cache import cache_handler
+
+async def _peak_in_flight(stub: StubUpstream, reset: bool = False) -> int:
+    async with aiohttp.ClientSession() as session:
+        if reset:
+            await session.post(f"http://{stub.host}:{stub.port}/stats/reset")
+            return 0
+        async with session.get(f"http://{stub.host}:{stub.port}/stats") as response:
+            return (await response.json())["peak_in_flight"]
+
+async def _blocking_completion(request_data):
+    # The pre-pool code path: a synchronous client call inside an async function.
+    response = openai.Completion.create(engine=request_data["model"], prompt=request_data["prompt"])
+    return response.choices[0].text.strip()
+
+async def _run(stub: StubUpstream, label: str, call, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await call({"prompt": f"benchmark {uuid.uuid4().hex}", "model": "text-davinci-003"})
+
+    await _peak_in_flight(stub, reset=True)
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    peak = await _peak_in_flight(stub)
+    print(f"{label:>12} | {total / elapsed:10.1f} req/s | {elapsed:8.2f} s | upstream peak in flight {peak:4d}")
+
+async def main(args):
+    with StubUpstream(port=args.port, latency_ms=args.latency_ms) as stub:
+        openai.api_base = stub.api_base
+        await cache_handler.init()
+        print(f"{args.requests} requests, client concurrency {args.concurrency}, upstream latency {args.latency_ms} ms")
+        await _run(stub, "blocking", _blocking_completion, min(args.requests, 16), args.concurrency)
+        for pool_size in args.pool_sizes:
+            service = OpenAIService()
+            await service.init(pool_size=pool_size)
+            try:
+                await _run(stub, f"pool={pool_size}", service.process_request, args.requests, args.concurrency)
+            finally:
+                await service.close()
+        await cache_handler.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=128)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 4, 16, 64])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,99 @@
+"""
+Compares load test reports written by benchmarks.loadgen, and cold start reports written by
+benchmarks.bench_cold_start, e.g. of a branch against main.
+
+Two reports are compared with each other; reports in two directories are paired by workload and
+mode. For every pair, the throughput, latency percentiles, the API process's CPU and peak RSS,
+and the cold start times are printed with their relative change. The exit status is 1 if any
+throughput dropped, or any p99 latency or median time to first response rose, by more than
+`--max-regression`.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.benchmarks.compare_reports package/benchmarks/results/<baseline>.json package/benchmarks/results/<candidate>.json
+    python -m package.benchmarks.compare_reports --baseline-dir results-main --candidate-dir results-branch
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Metric path in the report, and whether a higher value is better
+METRICS = (
+    (("throughput_rps",), True),
+    (("latency_ms", "p50"), False),
+    (("latency_ms", "p95"), False),
+    (("latency_ms", "p99"), False),
+    (("app_process", "cpu_percent"), False),
+    (("app_process", "rss_peak_mb"), False),
+    (("cold_start_ms", "import", "median"), False),
+    (("cold_start_ms", "first_response", "median"), False),
+    (("cold_start_ms", "first_completion", "median"), False),
+)
+GATED = {("throughput_rps",), ("latency_ms", "p99"), ("cold_start_ms", "first_response", "median")}
+
+def _read(path: str) -> dict:
+    with open(path) as report_file:
+        return json.load(report_file)
+
+def _load(paths: List[str]) -> Dict[Tuple[str, str], dict]:
+    """
+    Loads reports keyed by (workload, mode), keeping the latest report of each.
+    """
+    reports = {}
+    for path in sorted(paths):
+        report = _read(path)
+        reports[(report["workload"], report["mode"])] = report
+    return reports
+
+def _value(report: dict, path: Tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        report = (report or {}).get(key)
+    return report
+
+def compare(baseline: Dict[Tuple[str, str], dict], candidate: Dict[Tuple[str, str], dict], max_regression: float) -> bool:
+    """
+    Prints the comparison of paired reports and returns whether all gated metrics are within bounds.
+    """
+    passed = True
+    for key in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[key], candidate[key]
+        print(f"{key[0]} {key[1]}: {before['git_commit'][:10]} -> {after['git_commit'][:10]}")
+        for path, higher_is_better in METRICS:
+            old, new = _value(before, path), _value(after, path)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            regression = -change if higher_is_better else change
+            flag = ""
+            if path in GATED and regression > max_regression:
+                flag = "  REGRESSION"
+                passed = False
+            print(f"  {'.'.join(path):<36} {old:>10.2f} -> {new:>10.2f}  {change:+7.1%}{flag}")
+    for key in sorted(baseline.keys() ^ candidate.keys()):
+        print(f"{key[0]} {key[1]}: only in {'baseline' if key in baseline else 'candidate'}")
+    return passed
+
+def main(args) -> int:
+    if args.baseline_dir and args.candidate_dir:
+        baseline = _load(glob.glob(os.path.join(args.baseline_dir, "*.json")))
+        candidate = _load(glob.glob(os.path.join(args.candidate_dir, "*.json")))
+    elif len(args.reports) == 2:
+        # Two reports given explicitly are compared with each other, whatever their workloads
+        before, after = (_read(path) for path in args.reports)
+        key = (before["workload"], before["mode"])
+        baseline, candidate = {key: before}, {key: after}
+    else:
+        print("Pass a baseline and a candidate report, or --baseline-dir and --candidate-dir.", file=sys.stderr)
+        return 2
+    return 0 if compare(baseline, candidate, args.max_regression) else 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("reports", nargs="*", help="Baseline report, then candidate report.")
+    parser.add_argument("--baseline-dir")
+    parser.add_argument("--candidate-dir")
+    parser.add_argument("--max-regression", type=float, default=0.1,
+                        help="Largest accepted relative drop in throughput or rise in p99 latency.")
+    sys.exit(main(parser.parse_args()))
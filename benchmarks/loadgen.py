@@ -0,0 +1,331 @@
+"""
+Load test: drives the whole API end to end against the local stub upstream.
+
+Starts the stub upstream in-process and the API (`<package>.main:app` by default) as a uvicorn
+subprocess pointed at it, then sends `POST /requests/` at a fixed rate (open loop, `--rps`) or from a fixed
+number of clients (closed loop, `--concurrency`) for `--duration` seconds. Workloads:
+
+- hit: a small set of prompts, sent once before the run so every measured request is a cache hit.
+- miss: a unique prompt per request, so every request goes upstream.
+- mixed: a `--hit-ratio` share of hot prompts, the rest unique.
+
+In open loop, latency is measured from the time a request was due rather than sent, so a server
+that falls behind is not flattered by the load generator waiting for it. Every run starts a fresh
+API process and writes a JSON report with the throughput, p50/p95/p99 latency, status counts, the
+CPU time and RSS of the API process, and the stub's counters, tagged with the git commit. Compare
+reports of two commits with `benchmarks.compare_reports`.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.benchmarks.loadgen --workload all --concurrency 32 --duration 20
+    python -m package.benchmarks.loadgen --workload mixed --rps 200 --hit-ratio 0.8 --latency-distribution lognormal
+    python -m package.benchmarks.loadgen --workload miss --rps 100 --env OPENAI_BATCH_ENABLED=True
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from .stub_upstream import LATENCY_DISTRIBUTIONS, StubUpstream
+
+# The project package, which the API and the CLI modules are run from
+PACKAGE = __package__.rpartition(".")[0]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+MODEL = "text-davinci-003"
+WORKLOADS = ("hit", "miss", "mixed")
+
+def percentile(sorted_samples: List[float], q: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of already sorted samples.
+    """
+    if not sorted_samples:
+        return None
+    return sorted_samples[min(len(sorted_samples) - 1, max(0, round(q * len(sorted_samples)) - 1))]
+
+def _read_proc(pid: int) -> Tuple[Optional[float], Optional[int]]:
+    """
+    Returns the CPU seconds (user + system) and resident set size in bytes of a process, from /proc.
+    Both are None where /proc is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            # Fields after the parenthesised command name, starting with the state (field 3)
+            fields = stat.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None, None
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    return cpu_seconds, resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+class ProcessSampler:
+    """
+    Tracks the peak RSS of a process in a background thread while a run is measured.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            _, rss = _read_proc(self.pid)
+            self.peak_rss = max(self.peak_rss, rss or 0)
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "ProcessSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+def migrate(env: Dict[str, str]):
+    """
+    Creates the database schema of an API run, which the API does not do on startup.
+    """
+    subprocess.run([sys.executable, "-m", f"{PACKAGE}.cli.migrate"], env={**os.environ, **env}, check=True)
+
+class AppServer:
+    """
+    Runs the API in a uvicorn subprocess with the given settings, for one run.
+    """
+
+    def __init__(self, app: str, port: int, env: Dict[str, str], startup_timeout: float = 60.0):
+        self.app = app
+        self.port = port
+        self.env = env
+        self.startup_timeout = startup_timeout
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "AppServer":
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", self.app, "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning", "--no-access-log"],
+            env={**os.environ, **self.env},
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.app} exited with status {self.process.returncode} during startup")
+            try:
+                with urllib.request.urlopen(f"{self.base_url}/stats", timeout=1):
+                    return self
+            except OSError:
+                if time.monotonic() > deadline:
+                    self.__exit__()
+                    raise RuntimeError(f"{self.app} did not start within {self.startup_timeout}s")
+                time.sleep(0.1)
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+class Recorder:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+
+    async def send(self, session: aiohttp.ClientSession, url: str, payload: dict, due: float):
+        """
+        Sends one request and records its status and its latency since `due`.
+        """
+        try:
+            async with session.post(url, json=payload) as response:
+                await response.read()
+                status = str(response.status)
+        except aiohttp.ClientError as e:
+            status = type(e).__name__
+        self.statuses[status] += 1
+        if status == "200":
+            self.latencies.append(time.perf_counter() - due)
+
+def make_payload(workload: str, hit_ratio: float, hot_prompts: int) -> dict:
+    if workload == "hit" or (workload == "mixed" and random.random() < hit_ratio):
+        prompt = f"benchmark hot prompt {random.randrange(hot_prompts)}"
+    else:
+        prompt = f"benchmark {uuid.uuid4().hex}"
+    return {"prompt": prompt, "model": MODEL}
+
+async def _closed_loop(recorder: Recorder, session, url: str, args, duration: float):
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        while time.perf_counter() < deadline:
+            await recorder.send(session, url, make_payload(args.workload, args.hit_ratio, args.hot_prompts), time.perf_counter())
+
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+
+async def _open_loop(recorder: Recorder, session, url: str, args, duration: float):
+    started = time.perf_counter()
+    tasks = []
+    for index in range(int(args.rps * duration)):
+        due = started + index / args.rps
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        payload = make_payload(args.workload, args.hit_ratio, args.hot_prompts)
+        tasks.append(asyncio.create_task(recorder.send(session, url, payload, due)))
+    await asyncio.gather(*tasks)
+
+async def _get_json(session: aiohttp.ClientSession, url: str) -> dict:
+    async with session.get(url) as response:
+        return await response.json()
+
+async def _measure(server: AppServer, stub: StubUpstream, args) -> dict:
+    url = f"{server.base_url}/requests/"
+    stub_url = f"http://{stub.host}:{stub.port}/stats"
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        if args.workload != "miss":
+            # Fill the cache with the hot prompts
+            for index in range(args.hot_prompts):
+                await Recorder().send(session, url, {"prompt": f"benchmark hot prompt {index}", "model": MODEL}, 0.0)
+        if args.warmup:
+            await (_open_loop if args.rps else _closed_loop)(Recorder(), session, url, args, args.warmup)
+        await session.post(f"{stub_url}/reset")
+
+        recorder = Recorder()
+        cpu_before, _ = _read_proc(server.process.pid)
+        with ProcessSampler(server.process.pid) as sampler:
+            started = time.perf_counter()
+            await (_open_loop if args.rps else _closed_loop)(recorder, session, url, args, args.duration)
+            elapsed = time.perf_counter() - started
+        cpu_after, rss_end = _read_proc(server.process.pid)
+        upstream = await _get_json(session, stub_url)
+        app_stats = await _get_json(session, f"{server.base_url}/stats")
+
+    latencies = sorted(recorder.latencies)
+    cpu_seconds = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": sum(recorder.statuses.values()),
+        "statuses": dict(recorder.statuses),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            name: round(value * 1000, 2) if value is not None else None
+            for name, value in (("p50", percentile(latencies, 0.5)), ("p95", percentile(latencies, 0.95)),
+                                ("p99", percentile(latencies, 0.99)), ("max", latencies[-1] if latencies else None),
+                                ("mean", sum(latencies) / len(latencies) if latencies else None))
+        },
+        "app_process": {
+            "cpu_seconds": round(cpu_seconds, 3) if cpu_seconds is not None else None,
+            "cpu_percent": round(cpu_seconds / elapsed * 100, 1) if cpu_seconds is not None else None,
+            "rss_peak_mb": round(sampler.peak_rss / 2 ** 20, 1) if sampler.peak_rss else None,
+            "rss_end_mb": round(rss_end / 2 ** 20, 1) if rss_end else None,
+        },
+        "upstream": upstream,
+        "app_stats": {key: app_stats.get(key) for key in ("cache", "single_flight", "resilience", "stale_served")},
+    }
+
+def _git(*command: str) -> str:
+    try:
+        return subprocess.run(["git", *command], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def _report_path(output_dir: str, commit: str, workload: str, mode: str) -> str:
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return os.path.join(output_dir, f"{timestamp}-{commit[:10] or 'nogit'}-{workload}-{mode}.json")
+
+def _run_workload(args, workload: str, commit: str) -> str:
+    args.workload = workload
+    mode = f"rps{args.rps:g}" if args.rps else f"c{args.concurrency}"
+    stub_options = {
+        "latency_ms": args.latency_ms, "latency_distribution": args.latency_distribution,
+        "latency_spread": args.latency_spread, "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate, "max_concurrency": args.max_concurrency,
+        "slow_fraction": args.slow_fraction, "slow_latency_ms": args.slow_latency_ms,
+    }
+    with tempfile.TemporaryDirectory() as workdir, StubUpstream(port=args.stub_port, **stub_options) as stub:
+        env = {
+            "OPENAI_API_KEY": "sk-benchmark",
+            "OPENAI_API_BASE": stub.api_base,
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'loadgen.db')}",
+            "LOG_LEVEL": "WARNING",
+            **dict(setting.split("=", 1) for setting in args.env),
+        }
+        migrate(env)
+        with AppServer(args.app, args.port, env) as server:
+            result = asyncio.run(_measure(server, stub, args))
+
+    report = {
+        "workload": workload,
+        "mode": mode,
+        "git_commit": commit,
+        "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "app": args.app, "duration_s": args.duration, "warmup_s": args.warmup, "rps": args.rps,
+            "concurrency": None if args.rps else args.concurrency, "hit_ratio": args.hit_ratio if workload == "mixed" else None,
+            "hot_prompts": args.hot_prompts, "app_env": args.env, "stub": stub_options,
+        },
+        **result,
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = _report_path(args.output_dir, commit, workload, mode)
+    with open(path, "w") as output:
+        json.dump(report, output, indent=2)
+
+    latency = result["latency_ms"]
+    process = result["app_process"]
+    print(f"{workload:>6} {mode:>8} | {result['throughput_rps']:8.1f} req/s | p50 {latency['p50']} ms | "
+          f"p95 {latency['p95']} ms | p99 {latency['p99']} ms | cpu {process['cpu_percent']}% | "
+          f"rss {process['rss_peak_mb']} MB | {result['statuses']} -> {path}")
+    return path
+
+def main(args):
+    commit = _git("rev-parse", "HEAD")
+    for workload in (WORKLOADS if args.workload == "all" else (args.workload,)):
+        _run_workload(args, workload, commit)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default=f"{PACKAGE}.main:app", help="ASGI application to load test, as module:attribute.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--stub-port", type=int, default=8100)
+    parser.add_argument("--workload", choices=WORKLOADS + ("all",), default="all")
+    parser.add_argument("--rps", type=float, default=None, help="Send requests at this fixed rate (open loop).")
+    parser.add_argument("--concurrency", type=int, default=32, help="Clients sending back to back, unless --rps is set.")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--hit-ratio", type=float, default=0.8)
+    parser.add_argument("--hot-prompts", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--latency-spread", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("--slow-fraction", type=float, default=0.0)
+    parser.add_argument("--slow-latency-ms", type=float, default=2000.0)
+    parser.add_argument("--env", action="append", default=[], metavar="SETTING=VALUE",
+                        help="Setting passed to the API process, e.g. OPENAI_BATCH_ENABLED=True. Repeatable.")
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    main(parser.parse_args())
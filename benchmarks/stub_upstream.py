@@ -0,0 +1,200 @@
+"""
+Local stub of the OpenAI HTTP API used by the benchmarks.
+
+Serves the legacy completions and model endpoints with a configurable artificial latency so
+client-side concurrency can be measured without calling the real upstream. Latencies follow the
+chosen distribution around `latency_ms`: fixed, uniform, exponential or lognormal. With a maximum
+concurrency set, completions beyond it are rejected with 429 like an upstream rate limit, and
+with a slow fraction set, that share of completions takes the slow latency instead, for tail latency.
+Error and rate limit rates answer that share of completions with a 500 or a 429 at random.
+
+Run standalone with:
+    python -m package.benchmarks.stub_upstream --port 8100 --latency-ms 200
+    python -m package.benchmarks.stub_upstream --port 8100 --latency-ms 200 --max-concurrency 16
+    python -m package.benchmarks.stub_upstream --port 8100 --latency-ms 200 --latency-distribution lognormal --error-rate 0.01
+"""
+import argparse
+import asyncio
+import math
+import random
+import threading
+import time
+import uuid
+
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+def sample_latency_ms(distribution: str, mean_ms: float, spread: float) -> float:
+    """
+    Draws one latency with mean `mean_ms`. `spread` is the relative half-width of the uniform
+    distribution and the sigma of the lognormal one; the exponential distribution has no parameter.
+    """
+    if distribution == "uniform":
+        return random.uniform(mean_ms * (1 - spread), mean_ms * (1 + spread))
+    if distribution == "exponential":
+        return random.expovariate(1 / mean_ms) if mean_ms > 0 else 0.0
+    if distribution == "lognormal":
+        return random.lognormvariate(math.log(mean_ms) - spread ** 2 / 2, spread) if mean_ms > 0 else 0.0
+    return mean_ms
+
+def _error(status_code: int, message: str, error_type: str, code: Optional[str], headers: Optional[dict] = None):
+    return JSONResponse(status_code=status_code, headers=headers,
+                        content={"error": {"message": message, "type": error_type, "param": None, "code": code}})
+
+def create_stub_app(latency_ms: float = 200.0, max_concurrency: Optional[int] = None,
+                    slow_fraction: float = 0.0, slow_latency_ms: float = 2000.0,
+                    latency_distribution: str = "fixed", latency_spread: float = 0.5,
+                    error_rate: float = 0.0, rate_limit_rate: float = 0.0, retry_after: float = 1.0,
+                    models_latency_ms: float = 0.0) -> FastAPI:
+    """
+    Builds the stub upstream application.
+
+    Args:
+        latency_ms (float): Mean time in milliseconds each completion takes to "generate".
+        max_concurrency (Optional[int]): Number of completions in flight beyond which new ones get a 429.
+        slow_fraction (float): Share of completions that take `slow_latency_ms` instead.
+        slow_latency_ms (float): Latency in milliseconds of the slow completions.
+        latency_distribution (str): One of LATENCY_DISTRIBUTIONS.
+        latency_spread (float): Spread of the uniform and lognormal distributions, see sample_latency_ms.
+        error_rate (float): Share of completions answered with a 500 after their latency.
+        rate_limit_rate (float): Share of completions answered with a 429 right away.
+        retry_after (float): Seconds sent in the Retry-After header of 429s.
+        models_latency_ms (float): Time in milliseconds the model list and model lookups take.
+
+    Returns:
+        FastAPI: The stub application.
+    """
+    if latency_distribution not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"Unknown latency distribution: {latency_distribution}")
+    app = FastAPI(title="OpenAI stub upstream")
+    app.state.latency_ms = latency_ms
+    app.state.in_flight = 0
+    app.state.peak_in_flight = 0
+    app.state.max_concurrency = max_concurrency
+    app.state.rate_limited = 0
+    app.state.errors = 0
+    app.state.completions = 0
+
+    def rate_limited():
+        app.state.rate_limited += 1
+        return _error(429, "Rate limit reached for requests", "requests", "rate_limit_exceeded",
+                      headers={"Retry-After": f"{retry_after:g}"})
+
+    async def complete(request: Request, model: str):
+        body = await request.json()
+        if app.state.max_concurrency is not None and app.state.in_flight >= app.state.max_concurrency:
+            return rate_limited()
+        if rate_limit_rate and random.random() < rate_limit_rate:
+            return rate_limited()
+        app.state.in_flight += 1
+        app.state.peak_in_flight = max(app.state.peak_in_flight, app.state.in_flight)
+        try:
+            slow = random.random() < slow_fraction
+            delay_ms = slow_latency_ms if slow else sample_latency_ms(latency_distribution, app.state.latency_ms, latency_spread)
+            await asyncio.sleep(delay_ms / 1000)
+        finally:
+            app.state.in_flight -= 1
+        if error_rate and random.random() < error_rate:
+            app.state.errors += 1
+            return _error(500, "The server had an error while processing your request.", "server_error", None)
+        app.state.completions += 1
+        prompts = body.get("prompt", "")
+        if isinstance(prompts, str):
+            prompts = [prompts]
+        return {
+            "id": f"cmpl-{uuid.uuid4().hex}",
+            "object": "text_completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {"text": f" stub completion for: {prompt[:32]}", "index": index, "logprobs": None, "finish_reason": "stop"}
+                for index, prompt in enumerate(prompts)
+            ],
+            "usage": {"prompt_tokens": 8, "completion_tokens": 8, "total_tokens": 16},
+        }
+
+    @app.post("/v1/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        return await complete(request, body.get("model", "stub"))
+
+    @app.post("/v1/engines/{engine}/completions")
+    async def engine_completions(engine: str, request: Request):
+        return await complete(request, engine)
+
+    @app.get("/v1/models")
+    async def list_models():
+        await asyncio.sleep(models_latency_ms / 1000)
+        return {"object": "list", "data": [{"id": "text-davinci-003", "object": "model", "owned_by": "stub"}]}
+
+    @app.get("/v1/models/{model_id}")
+    async def retrieve_model(model_id: str):
+        await asyncio.sleep(models_latency_ms / 1000)
+        return {"id": model_id, "object": "model", "owned_by": "stub"}
+
+    @app.get("/stats")
+    async def stats():
+        return {"in_flight": app.state.in_flight, "peak_in_flight": app.state.peak_in_flight,
+                "rate_limited": app.state.rate_limited, "errors": app.state.errors,
+                "completions": app.state.completions}
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        app.state.peak_in_flight = 0
+        app.state.rate_limited = 0
+        app.state.errors = 0
+        app.state.completions = 0
+        return {"peak_in_flight": 0, "rate_limited": 0, "errors": 0, "completions": 0}
+
+    return app
+
+class StubUpstream:
+    """
+    Runs the stub upstream in a background thread for the duration of a benchmark.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8100, **app_options):
+        self.host = host
+        self.port = port
+        self.app = create_stub_app(**app_options)
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning", lifespan="off"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def api_base(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def __enter__(self) -> "StubUpstream":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.should_exit = True
+        self._thread.join()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local OpenAI stub upstream.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("--slow-fraction", type=float, default=0.0)
+    parser.add_argument("--slow-latency-ms", type=float, default=2000.0)
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-spread", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+    uvicorn.run(create_stub_app(latency_ms=args.latency_ms, max_concurrency=args.max_concurrency,
+                                slow_fraction=args.slow_fraction, slow_latency_ms=args.slow_latency_ms,
+                                latency_distribution=args.latency_distribution, latency_spread=args.latency_spread,
+                                error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                                retry_after=args.retry_after), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,54 @@
+"""
+Archives old monthly partitions of the requests table and queries the archive.
+
+`archive` moves partitions older than ARCHIVE_AFTER_MONTHS months into zstd-compressed JSONL files
+under ARCHIVE_PATH and drops them from the database; run it periodically, e.g. daily from cron.
+It also creates the partitions for the coming months. `query` prints archived rows as NDJSON.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.cli.archive_requests archive --older-than-months 6
+    python -m package.cli.archive_requests query --user-id <settings id> --created-after 2024-01-01
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime
+
+from ..database import close_db, get_engine
+from ..services.partition_service import ArchiveReader, archive_partitions, ensure_partitions
+
+async def archive(args):
+    try:
+        await ensure_partitions(get_engine())
+        archived = await archive_partitions(get_engine(), args.older_than_months, args.archive_path)
+    finally:
+        await close_db()
+    print(f"Archived {len(archived)} partitions ({sum(entry['rows'] for entry in archived)} rows).")
+
+def query(args):
+    reader = ArchiveReader(args.archive_path)
+    rows = reader.iter_requests(user_id=args.user_id, model=args.model, status=args.status,
+                                created_after=args.created_after, created_before=args.created_before)
+    for count, row in enumerate(rows):
+        if args.limit is not None and count >= args.limit:
+            break
+        print(json.dumps({**row, "created_at": row["created_at"].isoformat()}))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archive-path", help="Archive directory (default: ARCHIVE_PATH).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    archive_parser = commands.add_parser("archive", help="Archive and drop old partitions.")
+    archive_parser.add_argument("--older-than-months", type=int, help="Default: ARCHIVE_AFTER_MONTHS.")
+    query_parser = commands.add_parser("query", help="Print archived rows as NDJSON, oldest first.")
+    query_parser.add_argument("--user-id", help="Settings ID of the user.")
+    query_parser.add_argument("--model")
+    query_parser.add_argument("--status")
+    query_parser.add_argument("--created-after", type=datetime.fromisoformat)
+    query_parser.add_argument("--created-before", type=datetime.fromisoformat)
+    query_parser.add_argument("--limit", type=int)
+    args = parser.parse_args()
+    if args.command == "archive":
+        asyncio.run(archive(args))
+    else:
+        query(args)
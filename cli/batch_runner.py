@@ -0,0 +1,211 @@
+"""
+Offline batch runner: processes a JSONL file of requests through OpenAIService without the API.
+
+Each input line holds one RequestSchema object (the same shape as `POST /requests/batch`). Results
+are appended to the output JSONL file as `{"index", "status", "response" | "status_code", "detail"}`
+objects in completion order. Progress is checkpointed so a killed run resumes without re-sending lines
+that already have a result, and throughput and ETA are logged while it runs. Lines that failed with a
+transient upstream error (rate limited, unavailable) get no result; the checkpoint lists them and the
+next run sends them again.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.cli.batch_runner requests.jsonl results.jsonl --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+from ..services.batch_service import iter_ndjson_lines, map_unordered, process_line
+from ..services.openai_service import openai_service
+from ..utils.cache import cache_handler
+from ..utils.config import settings
+from ..utils.logger import logger
+
+READ_CHUNK_BYTES = 1024 * 1024
+# Status codes of errors that may succeed when the line is sent again
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class Checkpoint:
+    """
+    Tracks which input lines have a result.
+
+    Lines below `watermark` are all settled: done, or listed in `retry` when they failed with a transient
+    error and are sent again by the next run. `completed` holds the settled lines above the watermark,
+    which stays small because results arrive roughly in input order. `output_bytes` is the length of the
+    output file that the checkpoint accounts for.
+    """
+
+    def __init__(self, path: str, watermark: int = 0, completed: Optional[Set[int]] = None, output_bytes: int = 0,
+                 retry: Optional[Set[int]] = None):
+        self.path = path
+        self.watermark = watermark
+        self.completed = completed or set()
+        self.output_bytes = output_bytes
+        self.retry = retry or set()
+
+    @classmethod
+    def load(cls, path: str) -> "Checkpoint":
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path) as checkpoint_file:
+            data = json.load(checkpoint_file)
+        return cls(path, data["watermark"], set(data["completed"]), data["output_bytes"], set(data.get("retry", ())))
+
+    def save(self, output_bytes: int):
+        self.output_bytes = output_bytes
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as checkpoint_file:
+            json.dump({"watermark": self.watermark, "completed": sorted(self.completed), "output_bytes": output_bytes,
+                       "retry": sorted(self.retry)}, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def is_done(self, index: int) -> bool:
+        return (index < self.watermark or index in self.completed) and index not in self.retry
+
+    def mark_done(self, index: int):
+        self.retry.discard(index)
+        self._settle(index)
+
+    def mark_retry(self, index: int):
+        """
+        Records a line that failed with a transient error, so the watermark moves past it and the next run sends it again.
+        """
+        self.retry.add(index)
+        self._settle(index)
+
+    def _settle(self, index: int):
+        # Lines below the watermark were settled by an earlier run and are only sent again from `retry`
+        if index < self.watermark:
+            return
+        self.completed.add(index)
+        while self.watermark in self.completed:
+            self.completed.remove(self.watermark)
+            self.watermark += 1
+
+    def recover(self, output_path: str) -> int:
+        """
+        Reconciles the checkpoint with the output file after an interrupted run: drops a partially
+        written last line and marks results written after the last checkpoint as done.
+
+        Returns:
+            int: The number of results recovered from the output file.
+        """
+        if not os.path.exists(output_path):
+            return 0
+        recovered = 0
+        with open(output_path, "r+b") as output_file:
+            output_file.seek(self.output_bytes)
+            valid_bytes = self.output_bytes
+            for line in output_file:
+                if not line.endswith(b"\n"):
+                    break
+                self.mark_done(json.loads(line)["index"])
+                valid_bytes += len(line)
+                recovered += 1
+            output_file.truncate(valid_bytes)
+        return recovered
+
+def is_final(result: Dict[str, Any]) -> bool:
+    """
+    Whether a result is written to the output: successes and errors that would fail again. Other errors are
+    only listed in the checkpoint, to be retried.
+    """
+    return result["status"] != "error" or result["status_code"] not in TRANSIENT_STATUS_CODES
+
+def count_lines(path: str) -> int:
+    lines = 0
+    with open(path, "rb") as input_file:
+        while chunk := input_file.read(READ_CHUNK_BYTES):
+            lines += chunk.count(b"\n")
+    return lines
+
+async def read_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as input_file:
+        while chunk := await asyncio.to_thread(input_file.read, READ_CHUNK_BYTES):
+            yield chunk
+
+async def pending_lines(path: str, checkpoint: Checkpoint) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Yields the input lines that do not have a result yet. Blank lines are marked done as they are passed.
+    """
+    expected = 0
+    async for index, line in iter_ndjson_lines(read_chunks(path), settings.BATCH_MAX_LINE_BYTES):
+        for blank in range(expected, index):
+            checkpoint.mark_done(blank)
+        expected = index + 1
+        if not checkpoint.is_done(index):
+            yield index, line
+
+def _format_duration(seconds: float) -> str:
+    hours, remainder = divmod(int(seconds), 3600)
+    return f"{hours:d}:{remainder // 60:02d}:{remainder % 60:02d}"
+
+async def run(args):
+    checkpoint = Checkpoint.load(args.checkpoint or args.output + ".checkpoint")
+    recovered = checkpoint.recover(args.output)
+    total = count_lines(args.input)
+    if checkpoint.watermark or checkpoint.completed:
+        logger.info("Resuming at line %s with %s lines to retry (%s results recovered from %s).",
+                    checkpoint.watermark, len(checkpoint.retry), recovered, args.output)
+    else:
+        logger.info("Starting batch of %s lines.", total)
+
+    await cache_handler.init()
+    await openai_service.init()
+    done_at_start = checkpoint.watermark + len(checkpoint.completed) - len(checkpoint.retry)
+    processed = errors = retry_later = 0
+    started = last_progress = last_checkpoint = time.monotonic()
+    output_file = open(args.output, "ab")
+    try:
+        results = map_unordered(pending_lines(args.input, checkpoint), lambda item: process_line(*item), args.concurrency)
+        async for result in results:
+            processed += 1
+            if is_final(result):
+                output_file.write(json.dumps(result).encode("utf-8") + b"\n")
+                checkpoint.mark_done(result["index"])
+                errors += result["status"] == "error"
+            else:
+                checkpoint.mark_retry(result["index"])
+                retry_later += 1
+
+            now = time.monotonic()
+            if now - last_checkpoint >= args.checkpoint_interval:
+                output_file.flush()
+                os.fsync(output_file.fileno())
+                checkpoint.save(output_file.tell())
+                last_checkpoint = now
+            if now - last_progress >= args.progress_interval:
+                rate = processed / (now - started)
+                remaining = max(0, total - done_at_start - processed)
+                eta = _format_duration(remaining / rate) if rate else "unknown"
+                logger.info("%s/%s lines | %.1f lines/s | %s errors | %s to retry | ETA %s | cache %s",
+                            done_at_start + processed, total, rate, errors, retry_later, eta, cache_handler.stats())
+                last_progress = now
+    finally:
+        output_file.flush()
+        os.fsync(output_file.fileno())
+        checkpoint.save(output_file.tell())
+        output_file.close()
+        await openai_service.close()
+        await cache_handler.close()
+
+    elapsed = time.monotonic() - started
+    logger.info("Processed %s lines in %s (%.1f lines/s, %s errors).",
+                processed, _format_duration(elapsed), processed / elapsed if elapsed else 0, errors)
+    if retry_later:
+        logger.warning("%s lines failed with transient errors; run the same command again to retry them.", retry_later)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file with one request per line.")
+    parser.add_argument("output", help="JSONL file the results are appended to.")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint).")
+    parser.add_argument("--concurrency", type=int, default=settings.BATCH_CONCURRENCY, help="Number of requests in flight.")
+    parser.add_argument("--checkpoint-interval", type=float, default=5.0, help="Seconds between checkpoints.")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress reports.")
+    asyncio.run(run(parser.parse_args()))
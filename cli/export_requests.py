@@ -0,0 +1,61 @@
+"""
+Exports stored requests to an NDJSON or CSV file, optionally gzipped, without the API.
+
+Rows are read from a server-side cursor and written as they arrive, so memory use stays bounded
+however many rows are exported.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.cli.export_requests --user alice --format csv --gzip -o alice.csv.gz
+    python -m package.cli.export_requests --format ndjson -o all-requests.ndjson
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from ..database import SessionLocal, close_db
+from ..services.db_service import db_service
+from ..services.export_service import EXPORT_FORMATS, encode_export, stream_request_rows
+from ..utils.exceptions import NotFoundError
+from ..utils.logger import logger
+
+async def run(args):
+    started = time.monotonic()
+    rows = written = 0
+    output = open(args.output, "wb")
+    try:
+        async with SessionLocal() as db:
+            user_id = None
+            if args.user:
+                try:
+                    user_id = (await db_service.get_settings(db, args.user)).id
+                except NotFoundError:
+                    user_id = ""
+
+            async def counted(batches):
+                nonlocal rows
+                async for batch in batches:
+                    rows += len(batch)
+                    yield batch
+
+            batches = stream_request_rows(db, user_id=user_id, created_after=args.created_after,
+                                          created_before=args.created_before, batch_rows=args.batch_rows)
+            async for chunk in encode_export(counted(batches), args.format, compress=args.gzip):
+                output.write(chunk)
+                written += len(chunk)
+    finally:
+        output.close()
+        await close_db()
+    elapsed = time.monotonic() - started
+    logger.info("Exported %s rows (%s bytes) in %.1f s (%.0f rows/s).", rows, written, elapsed, rows / elapsed if elapsed else 0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", help="Only export requests of this user (default: all users).")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="Compress the output with gzip.")
+    parser.add_argument("--created-after", type=datetime.fromisoformat, help="ISO 8601 lower bound of created_at.")
+    parser.add_argument("--created-before", type=datetime.fromisoformat, help="ISO 8601 upper bound of created_at.")
+    parser.add_argument("--batch-rows", type=int, help="Rows fetched per round trip (default: EXPORT_BATCH_ROWS).")
+    parser.add_argument("-o", "--output", required=True, help="Output file.")
+    asyncio.run(run(parser.parse_args()))
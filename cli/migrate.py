@@ -0,0 +1,31 @@
+"""
+Creates the database schema: the tables that do not exist yet and, on PostgreSQL, the partitions of
+the requests table for the coming months.
+
+The API does not create tables on startup, so run this once per deployment before starting it
+(startup.sh does). Changes to existing tables are applied with the SQL files in migrations/.
+
+Run as a module of the project package, from the directory that contains it:
+    python -m package.cli.migrate
+"""
+import argparse
+import asyncio
+
+from ..database import close_db, get_engine, init_db
+# Importing the models registers their tables on Base
+from ..models import RequestModel, SettingsModel
+from ..services.partition_service import ensure_partitions
+from ..utils.logger import logger
+
+async def migrate(args):
+    try:
+        await init_db()
+        await ensure_partitions(get_engine(), args.months_ahead)
+    finally:
+        await close_db()
+    logger.info("Database schema is up to date.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months-ahead", type=int, help="Monthly partitions created ahead (default: PARTITION_MONTHS_AHEAD).")
+    asyncio.run(migrate(parser.parse_args()))
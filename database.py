@@ -0,0 +1,94 @@
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import declarative_base
+
+from .utils.config import settings
+from .utils.metrics import instrument_database
+
+# Async drivers used for the database URL schemes accepted in DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(database_url: str) -> str:
+    """
+    Rewrites a database URL to use an async driver, e.g. `postgresql://` to `postgresql+asyncpg://`.
+    URLs that already name an async driver are returned unchanged.
+    """
+    url = make_url(database_url)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+def create_engine(database_url: str = None):
+    """
+    Creates the async engine with the connection pool configured from settings.
+    SQLite connections are not pooled by the aiosqlite driver, so the pool settings only apply to server databases.
+    """
+    url = async_database_url(database_url or settings.DATABASE_URL)
+    if url.startswith("sqlite"):
+        return create_async_engine(url)
+    return create_async_engine(
+        url,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+    )
+
+_engine: Optional[AsyncEngine] = None
+
+def get_engine() -> AsyncEngine:
+    """
+    Returns the application's engine, creating it on first use, so that importing this module neither
+    loads the database driver nor builds the connection pool.
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_engine()
+        instrument_database(_engine)
+    return _engine
+
+def __getattr__(name: str):
+    # `from database import engine` still works, and creates the engine
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class LazySessionmaker:
+    """
+    Session factory bound to `get_engine()`: the engine is created when the first session is opened.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self._sessionmaker: Optional[async_sessionmaker] = None
+
+    def __call__(self, **kwargs) -> AsyncSession:
+        if self._sessionmaker is None:
+            self._sessionmaker = async_sessionmaker(get_engine(), **self.options)
+        return self._sessionmaker(**kwargs)
+
+# Sessions keep loaded attributes after commit, so returned models stay readable outside the session
+SessionLocal = LazySessionmaker(class_=AsyncSession, expire_on_commit=False)
+
+Base = declarative_base()
+
+async def init_db():
+    """
+    Creates the database tables that do not exist yet. Run by `python -m cli.migrate`, not on startup.
+    """
+    async with get_engine().begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+async def close_db():
+    """
+    Closes all pooled database connections.
+    """
+    if _engine is not None:
+        await _engine.dispose()
@@ -0,0 +1,22 @@
+# Gunicorn settings for running the API with several worker processes:
+#   PROMETHEUS_MULTIPROC_DIR=/tmp/metrics gunicorn package.main:app -c package/gunicorn.conf.py
+# run from the directory that contains the project package, like startup.sh.
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", 4))
+
+def on_starting(server):
+    # Samples left over from a previous run would be added to the new ones
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,68 +1,132 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.encoders import jsonable_encoder
 
-from .config import settings
-from .database import engine, Base
-from .routers import requests_router, settings_router
+from .utils.config import settings
+from .database import get_engine, close_db
+from .routers import requests_router, settings_router, admin_router
 from .utils.exceptions import APIError
-from .utils.logger import logger
+from .utils.logger import log_stats, logger
+from .utils.metrics import MetricsMiddleware, render_metrics
+from .utils.timing import ServerTimingMiddleware
+from .utils.responses import FastJSONResponse
 from .utils.cache import cache_handler
+from .utils.settings_cache import settings_cache
+from .utils.model_catalog import model_catalog
 from .services.openai_service import openai_service
-from .services.db_service import db_service
+from .services.write_behind import request_writer
 
-app = FastAPI(
-    title="AI Powered Request Handler",
-    version="1.0.0",
-    description="A simple API for interacting with OpenAI's API"
-)
-
-# Enable CORS for development
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Initialize database models
-Base.metadata.create_all(bind=engine)
-
-# Include routers for API endpoints
-app.include_router(requests_router, prefix="/requests", tags=["Requests"])
-app.include_router(settings_router, prefix="/settings", tags=["Settings"])
-
-@app.on_event("startup")
 async def startup_event():
     logger.info("Starting application...")
-    await cache_handler.init()
-    logger.info("Cache initialized.")
-    
-@app.on_event("shutdown")
+    # Tables are created by `python -m cli.migrate`; the engine, the shared cache and the OpenAI
+    # session are opened on first use, so nothing here waits on the network
+    await settings_cache.init(get_engine())
+    logger.info("Settings cache initialized.")
+    if settings.MODEL_CATALOG_ENABLED:
+        await model_catalog.init(openai_service.list_models, openai_service.retrieve_model, wait=False)
+        logger.info("Model catalog loading in the background.")
+    if settings.WRITE_BEHIND_ENABLED:
+        await request_writer.start()
+        logger.info("Write-behind request queue started.")
+
 async def shutdown_event():
     logger.info("Shutting down application...")
+    if settings.WRITE_BEHIND_ENABLED:
+        # Flush queued requests while the database is still available
+        await request_writer.close()
+        logger.info("Write-behind request queue drained: %s", request_writer.stats())
+    await model_catalog.close()
+    await openai_service.close()
+    logger.info("OpenAI client pool closed.")
     await cache_handler.close()
     logger.info("Cache closed.")
+    await settings_cache.close()
+    await close_db()
+    logger.info("Database connections closed.")
+
+async def get_stats():
+    """
+    Reports runtime counters of the response and settings caches, request coalescing, the write-behind
+    queue, the per-model upstream concurrency limits, upstream retries, hedging and latency, the per-model
+    circuit breakers, stale cached responses served, the model catalog and the log queue.
+    """
+    return {
+        "cache": cache_handler.stats(),
+        "settings_cache": settings_cache.stats(),
+        "single_flight": openai_service.single_flight.stats(),
+        "write_behind": request_writer.stats(),
+        "upstream_limiter": openai_service.limiter.stats() if openai_service.limiter is not None else {},
+        "resilience": openai_service.resilience.stats(),
+        "circuit_breakers": {model: breaker.stats() for model, breaker in openai_service.breakers.items()},
+        "stale_served": openai_service.stale_served,
+        "model_catalog": model_catalog.stats(),
+        "logging": log_stats(),
+    }
+
+async def get_metrics():
+    """
+    Exposes request, upstream, cache, database and token metrics in the Prometheus text format.
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
-@app.exception_handler(APIError)
 async def api_error_handler(request: Request, exc: APIError):
-    logger.error(f"API Error: {exc.detail}")
-    return JSONResponse(
+    logger.error("API Error: %s", exc.detail)
+    return FastJSONResponse(
         status_code=exc.status_code,
-        content=jsonable_encoder({"detail": exc.detail})
+        content={"detail": exc.detail},
+        headers=exc.headers
     )
 
-@app.exception_handler(RequestValidationError)
 async def validation_error_handler(request: Request, exc: RequestValidationError):
-    logger.error(f"Validation Error: {exc.errors()}")
-    return JSONResponse(
+    logger.error("Validation Error: %s", exc.errors())
+    return FastJSONResponse(
         status_code=400,
-        content=jsonable_encoder({"detail": exc.errors()})
+        content={"detail": exc.errors()}
     )
 
+def create_app() -> FastAPI:
+    """
+    Builds the application. Importing this module does no I/O: the database engine, the shared cache
+    and the OpenAI session are created on first use, and the database schema is created beforehand
+    by `python -m cli.migrate`.
+    """
+    app = FastAPI(
+        title="AI Powered Request Handler",
+        version="1.0.0",
+        description="A simple API for interacting with OpenAI's API",
+        on_startup=[startup_event],
+        on_shutdown=[shutdown_event],
+    )
+
+    # Enable CORS for development
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Time the phases of each request for the Server-Timing header and logs
+    if settings.SERVER_TIMING_ENABLED:
+        app.add_middleware(ServerTimingMiddleware)
+    # Record request counts and latencies per route for /metrics
+    app.add_middleware(MetricsMiddleware)
+
+    # Include routers for API endpoints
+    app.include_router(requests_router, prefix="/requests", tags=["Requests"])
+    app.include_router(settings_router, prefix="/settings", tags=["Settings"])
+    app.include_router(admin_router, prefix="/admin", tags=["Admin"])
+    app.add_api_route("/stats", get_stats, methods=["GET"], tags=["Monitoring"])
+    app.add_api_route("/metrics", get_metrics, methods=["GET"], tags=["Monitoring"])
+
+    app.add_exception_handler(APIError, api_error_handler)
+    app.add_exception_handler(RequestValidationError, validation_error_handler)
+    return app
+
+app = create_app()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,27 @@
+-- Converts requests.created_at from text to timestamptz (if it still is text) and adds the indexes used by GET /requests/.
+--
+-- Run with psql (the indexes are built CONCURRENTLY, which cannot run inside a transaction block):
+--     psql "$DATABASE_URL" -f migrations/0001_request_history_indexes.sql
+--
+-- The type change rewrites the table under an ACCESS EXCLUSIVE lock; run it in a maintenance window
+-- on large tables. Existing values are ISO 8601 strings, and values without an offset are read as UTC.
+
+SET TIME ZONE 'UTC';
+
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'requests' AND column_name = 'created_at') IN ('character varying', 'text') THEN
+        ALTER TABLE requests
+            ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at::timestamptz;
+    END IF;
+END
+$$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_requests_user_id_created_at
+    ON requests (user_id, created_at, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_requests_status_created_at
+    ON requests (status, created_at, id);
+
+ANALYZE requests;
@@ -0,0 +1,64 @@
+-- Converts the requests table into a table partitioned by month of created_at.
+--
+-- Run with psql after 0001, in a maintenance window (rows are copied into the new table):
+--     psql "$DATABASE_URL" -f migrations/0002_partition_requests_by_month.sql
+--
+-- Partitions are created for every month that has rows, plus a default partition. `cli.migrate`
+-- creates partitions for upcoming months, and `cli.archive_requests archive` creates them too
+-- and moves old ones to archive files.
+
+BEGIN;
+
+SET TIME ZONE 'UTC';
+
+ALTER TABLE requests RENAME TO requests_unpartitioned;
+ALTER TABLE requests_unpartitioned RENAME CONSTRAINT requests_pkey TO requests_unpartitioned_pkey;
+ALTER INDEX ix_requests_id RENAME TO ix_requests_unpartitioned_id;
+ALTER INDEX ix_requests_user_id_created_at RENAME TO ix_requests_unpartitioned_user_id_created_at;
+ALTER INDEX ix_requests_status_created_at RENAME TO ix_requests_unpartitioned_status_created_at;
+
+CREATE TABLE requests (
+    id VARCHAR NOT NULL,
+    user_id VARCHAR NOT NULL REFERENCES settings (id),
+    prompt VARCHAR NOT NULL,
+    model VARCHAR NOT NULL,
+    parameters JSON,
+    response JSON,
+    status VARCHAR NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX ix_requests_id ON requests (id);
+CREATE INDEX ix_requests_user_id_created_at ON requests (user_id, created_at, id);
+CREATE INDEX ix_requests_status_created_at ON requests (status, created_at, id);
+
+CREATE TABLE requests_default PARTITION OF requests DEFAULT;
+
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    FOR month IN
+        SELECT DISTINCT date_trunc('month', created_at)::date FROM requests_unpartitioned
+        UNION
+        SELECT generate_series(date_trunc('month', now()), date_trunc('month', now()) + interval '3 months', interval '1 month')::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF requests FOR VALUES FROM (%L) TO (%L)',
+            'requests_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+            month::timestamptz,
+            (month + interval '1 month')::timestamptz
+        );
+    END LOOP;
+END
+$$;
+
+INSERT INTO requests (id, user_id, prompt, model, parameters, response, status, created_at)
+SELECT id, user_id, prompt, model, parameters, response, status, created_at FROM requests_unpartitioned;
+
+DROP TABLE requests_unpartitioned;
+
+COMMIT;
+
+ANALYZE requests;
@@ -0,0 +1,2 @@
+from .request import RequestModel
+from .settings import SettingsModel
@@ -1,18 +1,28 @@
-from sqlalchemy import Column, String, JSON, ForeignKey
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, JSON, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
-from .database import Base
+from ..database import Base
 
 class RequestModel(Base):
     __tablename__ = "requests"
+    # History queries filter on user or status and page by (created_at, id).
+    # On PostgreSQL the table is partitioned by month of created_at (see services/partition_service.py).
+    __table_args__ = (
+        Index("ix_requests_user_id_created_at", "user_id", "created_at", "id"),
+        Index("ix_requests_status_created_at", "status", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id = Column(String, primary_key=True, index=True)
+    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, ForeignKey("settings.id"), nullable=False)
     prompt = Column(String, nullable=False)
     model = Column(String, nullable=False)
     parameters = Column(JSON, nullable=True)
     response = Column(JSON, nullable=True)
     status = Column(String, nullable=False, default="pending")
-    created_at = Column(String, nullable=False)  # Use appropriate datetime type
+    # Part of the primary key because the partition key must be included in unique constraints
+    created_at = Column(DateTime(timezone=True), primary_key=True, default=lambda: datetime.now(timezone.utc))
 
-    user = relationship("SettingsModel", back_populates="requests")
\ No newline at end of file
+    user = relationship("SettingsModel", back_populates="requests")
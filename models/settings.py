@@ -1,14 +1,17 @@
+import uuid
 from sqlalchemy import Column, String, Boolean, Integer
 from sqlalchemy.orm import relationship
 
-from .database import Base
+from ..database import Base
 
 class SettingsModel(Base):
     __tablename__ = "settings"
 
-    id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, index=True)
+    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(String, index=True, unique=True)
     api_key = Column(String, nullable=False)
     preferred_model = Column(String, default="text-davinci-003")
     is_cache_enabled = Column(Boolean, default=False)
-    cache_expiration_time = Column(Integer, default=3600)
\ No newline at end of file
+    cache_expiration_time = Column(Integer, default=3600)
+
+    requests = relationship("RequestModel", back_populates="user")
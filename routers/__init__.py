@@ -0,0 +1,3 @@
+from .admin import admin_router
+from .requests import requests_router
+from .settings import settings_router
@@ -0,0 +1,47 @@
+import asyncio
+import secrets
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, status
+from fastapi.responses import PlainTextResponse
+
+from ..utils.config import settings
+from ..utils.exceptions import APIError, NotFoundError
+from ..utils.logger import logger
+from ..utils.profiler import ProfilerBusy, profiler
+
+admin_router = APIRouter()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Admits requests carrying ADMIN_TOKEN in the `X-Admin-Token` header. Without an ADMIN_TOKEN, the
+    admin endpoints do not exist.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise NotFoundError(detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise APIError(detail="Invalid admin token.", status_code=status.HTTP_403_FORBIDDEN)
+
+@admin_router.get("/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile(seconds: float = Query(10.0, gt=0), interval_ms: float = Query(10.0, ge=1)):
+    """
+    Samples the stacks of this worker process for `seconds` and returns them as a collapsed-stack
+    file, e.g. for `flamegraph.pl profile.folded > profile.svg` or speedscope.
+
+    Args:
+        seconds (float): Sampling duration, capped at settings.PROFILER_MAX_SECONDS.
+        interval_ms (float): Milliseconds between samples.
+
+    Returns:
+        PlainTextResponse: One `frame;frame;...;frame count` line per distinct stack.
+    """
+    seconds = min(seconds, settings.PROFILER_MAX_SECONDS)
+    logger.info("Profiling for %ss every %sms.", seconds, interval_ms)
+    try:
+        # The sampler runs in a worker thread, so the event loop keeps serving the traffic being profiled
+        stacks = await asyncio.get_running_loop().run_in_executor(None, profiler.profile, seconds, interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise APIError(detail=str(e), status_code=status.HTTP_409_CONFLICT)
+    filename = f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+    return PlainTextResponse(stacks, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
@@ -1,63 +1,269 @@
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from typing import Optional, AsyncIterator, Awaitable, Callable
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import json
+import re
 
-from .models import RequestModel
-from .schemas import RequestSchema, RequestResponseSchema
-from .services.openai_service import openai_service
-from .utils.exceptions import APIError
-from .utils.logger import logger
+from ..database import SessionLocal
+from ..models import RequestModel
+from ..schemas import RequestSchema, RequestResponseSchema, RequestHistorySchema, RequestHistoryItemSchema
+from ..services.openai_service import openai_service
+from ..services.db_service import get_db, db_service, build_request_row
+from ..services.write_behind import request_writer
+from ..services.batch_service import iter_ndjson_lines, process_batch
+from ..services.export_service import stream_request_rows, encode_export
+from ..utils.config import settings
+from ..utils.exceptions import APIError, NotFoundError
+from ..utils.logger import logger
+from ..utils.timing import current_timings, phase
+from ..utils.responses import BodyStreamingResponse, FastJSONResponse, read_body
 
 requests_router = APIRouter()
 
+def _sse_event(data: str, event: Optional[str] = None) -> str:
+    """
+    Formats a single Server-Sent Events message.
+    """
+    if event:
+        return f"event: {event}\ndata: {data}\n\n"
+    return f"data: {data}\n\n"
+
+async def _sse_stream(first_fragment: Optional[str], fragments: AsyncIterator[str],
+                      on_complete: Optional[Callable[[str], Awaitable[None]]] = None) -> AsyncIterator[str]:
+    """
+    Forwards completion fragments as Server-Sent Events, terminated by a `[DONE]` message.
+    Once the stream has run to completion, `on_complete` is awaited with the joined text, stripped
+    like the cached and non-streamed responses.
+
+    Errors raised after the response has started are reported as an `error` event,
+    since the status code has already been sent.
+    """
+    try:
+        text = []
+        if first_fragment is not None:
+            text.append(first_fragment)
+            yield _sse_event(json.dumps({"text": first_fragment}))
+        async for fragment in fragments:
+            text.append(fragment)
+            yield _sse_event(json.dumps({"text": fragment}))
+        if on_complete is not None:
+            await on_complete("".join(text).strip())
+        yield _sse_event("[DONE]")
+    except APIError as e:
+        logger.error("API Error during stream: %s", e.detail)
+        yield _sse_event(json.dumps({"detail": e.detail}), event="error")
+
+async def _load_user_settings(db: AsyncSession, current_user: Optional[str]):
+    """
+    Loads the settings of the requesting user, or None for anonymous users and users without settings.
+    """
+    if not current_user:
+        return None
+    try:
+        return await db_service.get_settings(db, current_user)
+    except NotFoundError:
+        return None
+
+async def _record_request(db: AsyncSession, request_data: RequestSchema, user_settings, response: str):
+    """
+    Stores a completed request for a user with settings, through the write-behind queue when it is enabled.
+    The response has already been produced, so a failure to store it is logged rather than returned.
+    """
+    if user_settings is None:
+        return
+    try:
+        if request_writer.running:
+            await request_writer.enqueue(build_request_row(request_data.dict(), user_settings.id, response))
+        else:
+            await db_service.create_request(db, request_data, user_settings.id, response=response)
+    except Exception as e:
+        logger.error("Error recording request: %s", e)
+
+async def _record_streamed_request(request_data: RequestSchema, user_settings, response: str):
+    """
+    Stores a streamed request once its stream has completed. The session of the handler is closed by
+    then, so a session of its own is opened.
+    """
+    if user_settings is None:
+        return
+    async with SessionLocal() as db:
+        await _record_request(db, request_data, user_settings, response)
+
 @requests_router.post("/", response_model=RequestResponseSchema)
-async def process_request(request_data: RequestSchema):
+async def process_request(request_data: RequestSchema, current_user: str = None, db: AsyncSession = Depends(get_db)):
     """
     Handles user requests to process text using OpenAI.
 
     Args:
         request_data (RequestSchema): Data containing the prompt, model selection, and parameters.
+        current_user (str): ID of the requesting user, whose cache settings apply to the request.
 
     Returns:
-        JSONResponse: A JSON response containing the status and processed text from OpenAI.
+        FastJSONResponse: A JSON response containing the status and processed text from OpenAI.
+        StreamingResponse: A `text/event-stream` of completion fragments when `stream` is set.
 
     Raises:
         HTTPException: If the request data is invalid or an error occurs during processing.
     """
+    timings = current_timings()
+    if timings is not None:
+        # Reading, parsing and validating the body happened before the handler was called
+        timings.mark("validation")
     try:
         # Validate request data using the RequestSchema
-        validated_data = request_data.dict()
-        
+        validated_data = request_data.dict(exclude={"stream"})
+        with phase("settings"):
+            user_settings = await _load_user_settings(db, current_user)
+
+        if request_data.stream:
+            # Wait for the first fragment so upstream errors still map to a regular error response
+            fragments = openai_service.stream_request(validated_data, user_settings)
+            try:
+                first_fragment = await fragments.__anext__()
+            except StopAsyncIteration:
+                first_fragment = None
+            return StreamingResponse(
+                _sse_stream(first_fragment, fragments,
+                            lambda response: _record_streamed_request(request_data, user_settings, response)),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
         # Process the request using the openai_service
-        response = await openai_service.process_request(validated_data)
+        response = await openai_service.process_request(validated_data, user_settings)
+        with phase("persist"):
+            await _record_request(db, request_data, user_settings, response)
         
-        # Format the response using the RequestResponseSchema
-        formatted_response = RequestResponseSchema(
-            status="success",
-            response=response
-        )
-        
-        # Return the formatted response
-        return JSONResponse(
-            status_code=status.HTTP_200_OK,
-            content=jsonable_encoder(formatted_response.dict())
-        )
+        with phase("encode"):
+            # Format the response using the RequestResponseSchema
+            formatted_response = RequestResponseSchema(
+                status="success",
+                response=response
+            )
+            
+            # Return the formatted response, serialized straight from the schema
+            return FastJSONResponse(
+                status_code=status.HTTP_200_OK,
+                content=formatted_response
+            )
     except APIError as e:
         # Log the error
-        logger.error(f"API Error: {e.detail}")
+        logger.error("API Error: %s", e.detail)
         
         # Return an error response with details
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=e.status_code,
-            content=jsonable_encoder({"detail": e.detail})
+            content={"detail": e.detail},
+            headers=e.headers
         )
     except Exception as e:
         # Log the unexpected error
-        logger.error(f"Unexpected Error: {e}")
+        logger.error("Unexpected Error: %s", e)
         
         # Return a generic error response
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content=jsonable_encoder({"detail": "Internal Server Error"})
-        )
\ No newline at end of file
+            content={"detail": "Internal Server Error"}
+        )
+
+async def _ndjson_stream(results: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for result in results:
+        yield json.dumps(result) + "\n"
+
+@requests_router.post("/batch")
+async def process_batch_request(request: Request, current_user: str = None, concurrency: Optional[int] = None,
+                                db: AsyncSession = Depends(get_db)):
+    """
+    Processes a batch of requests sent as NDJSON, one RequestSchema object per line.
+
+    The body is read as a stream and lines are processed with bounded concurrency, so memory use does
+    not grow with the size of the batch. Results are streamed back as NDJSON in completion order.
+
+    Args:
+        request (Request): The incoming request whose body holds the NDJSON lines.
+        current_user (str): ID of the requesting user, whose cache settings apply to every line.
+        concurrency (Optional[int]): Number of lines processed at once. Defaults to settings.BATCH_CONCURRENCY
+            and is capped at settings.BATCH_MAX_CONCURRENCY.
+
+    Returns:
+        BodyStreamingResponse: An `application/x-ndjson` stream of `{"index", "status", "response" | "detail"}` objects,
+            where `index` is the zero-based line number in the request body.
+    """
+    user_settings = await _load_user_settings(db, current_user)
+    concurrency = max(1, min(concurrency or settings.BATCH_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY))
+    # Results are sent while the body is still being read, so disconnects are only listened for once it has been read
+    body_read = asyncio.Event()
+    lines = iter_ndjson_lines(read_body(request.stream(), body_read), settings.BATCH_MAX_LINE_BYTES)
+    return BodyStreamingResponse(
+        _ndjson_stream(process_batch(lines, concurrency, user_settings)),
+        body_read,
+        media_type="application/x-ndjson",
+    )
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+@requests_router.get("/export")
+async def export_requests(current_user: str, format: str = Query("ndjson", pattern="^(ndjson|csv)$"), gzip: bool = False,
+                          created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+                          db: AsyncSession = Depends(get_db)):
+    """
+    Exports all stored requests of a user, oldest first, as a file download.
+
+    Rows are read from a server-side cursor and encoded as they arrive, so memory use does not grow
+    with the number of rows exported.
+
+    Args:
+        current_user (str): The user whose requests are exported.
+        format (str): "ndjson" (one JSON object per row) or "csv" (with a header row).
+        gzip (bool): Compress the file with gzip.
+        created_after (Optional[datetime]): Only export requests created at or after this time.
+        created_before (Optional[datetime]): Only export requests created before this time.
+
+    Returns:
+        StreamingResponse: The exported rows. Users without settings get an empty export.
+    """
+    user_settings = await _load_user_settings(db, current_user)
+    # Settings IDs are never empty, so this matches no rows for users without settings
+    user_id = user_settings.id if user_settings is not None else ""
+    batches = stream_request_rows(db, user_id=user_id, created_after=created_after, created_before=created_before)
+    filename = f"requests-{re.sub(r'[^A-Za-z0-9_.-]', '_', current_user)}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        encode_export(batches, format, compress=gzip),
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@requests_router.get("/", response_model=RequestHistorySchema)
+async def list_requests(current_user: str, model: Optional[str] = None, status: Optional[str] = None,
+                        created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+                        limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                        db: AsyncSession = Depends(get_db)):
+    """
+    Lists the stored requests of the requesting user newest first, filtered by model, status and creation time.
+
+    Args:
+        current_user (str): The user whose requests are listed. Users without settings have no stored requests.
+        model (Optional[str]): Only list requests for this model.
+        status (Optional[str]): Only list requests with this status.
+        created_after (Optional[datetime]): Only list requests created at or after this time.
+        created_before (Optional[datetime]): Only list requests created before this time.
+        limit (int): Number of requests per page, up to 500.
+        cursor (Optional[str]): The `next_cursor` of the previous page.
+
+    Returns:
+        RequestHistorySchema: A page of requests and the cursor of the next page.
+    """
+    user_settings = await _load_user_settings(db, current_user)
+    if user_settings is None:
+        return RequestHistorySchema(items=[])
+    requests, next_cursor = await db_service.list_requests(
+        db, user_id=user_settings.id, model=model, status=status, created_after=created_after,
+        created_before=created_before, limit=limit, cursor=cursor,
+    )
+    return RequestHistorySchema(
+        items=[RequestHistoryItemSchema.model_validate(request) for request in requests],
+        next_cursor=next_cursor,
+    )
@@ -0,0 +1,2 @@
+from .request_schema import RequestSchema, RequestResponseSchema, RequestHistoryItemSchema, RequestHistorySchema
+from .settings_schema import SettingsSchema, SettingsResponseSchema
@@ -1,5 +1,7 @@
-from pydantic import BaseModel, validator, Field
-from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, validator, Field
+from typing import Optional, Dict, Any, List
+from ..utils.model_catalog import model_catalog
 
 class RequestSchema(BaseModel):
     """
@@ -13,6 +15,7 @@ class RequestSchema(BaseModel):
         top_p (Optional[float]):  A value between 0 and 1 that controls the diversity of the output.
         frequency_penalty (Optional[float]):  A value between -2.0 and 2.0 that penalizes the model for generating text that it has already generated.
         presence_penalty (Optional[float]):  A value between -2.0 and 2.0 that penalizes the model for generating text that is similar to the input text.
+        stream (bool): Whether to stream the response as Server-Sent Events while it is generated.
 
     Raises:
         ValueError: If the prompt is empty or the model is invalid.
@@ -25,6 +28,7 @@ class RequestSchema(BaseModel):
     top_p: Optional[float] = Field(None, description="A value between 0 and 1 that controls the diversity of the output.")
     frequency_penalty: Optional[float] = Field(None, description="A value between -2.0 and 2.0 that penalizes the model for generating text that it has already generated.")
     presence_penalty: Optional[float] = Field(None, description="A value between -2.0 and 2.0 that penalizes the model for generating text that is similar to the input text.")
+    stream: bool = Field(False, description="Whether to stream the response as Server-Sent Events while it is generated.")
 
     @validator("prompt")
     def prompt_validation(cls, value):
@@ -56,10 +60,11 @@ class RequestSchema(BaseModel):
             str: The validated model.
 
         Raises:
-            ValueError: If the model is invalid.
+            ValueError: If the model was recently found missing upstream.
         """
-        # Add validation logic to ensure the model is a valid OpenAI model. 
-        # For example, check against a list of supported models or use a regular expression.
+        # Checked against the in-memory catalog only, so validation never waits on the OpenAI API
+        if not model_catalog.is_known(value):
+            raise ValueError(f"Unknown model: {value}")
         return value
 
 class RequestResponseSchema(BaseModel):
@@ -67,4 +72,26 @@ class RequestResponseSchema(BaseModel):
     Schema for formatting the response from OpenAI.
     """
     status: str
-    response: str
\ No newline at end of file
+    response: str
+
+class RequestHistoryItemSchema(BaseModel):
+    """
+    Schema for a stored request in the request history.
+    """
+    id: str
+    prompt: str
+    model: str
+    parameters: Optional[Dict[str, Any]] = None
+    response: Optional[str] = None
+    status: str
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class RequestHistorySchema(BaseModel):
+    """
+    Schema for a page of the request history. Pass `next_cursor` as `cursor` to fetch the next page;
+    it is None on the last page.
+    """
+    items: List[RequestHistoryItemSchema]
+    next_cursor: Optional[str] = None
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, validator, Field
+from typing import Optional
+from pydantic import BaseModel, ConfigDict, validator, Field
 
 class SettingsSchema(BaseModel):
     """
@@ -36,4 +37,15 @@ class SettingsSchema(BaseModel):
         if not value:
             raise ValueError("API key cannot be empty.")
         # Add specific API key validation logic here (e.g., length, characters, pattern)
-        return value
\ No newline at end of file
+        return value
+
+class SettingsResponseSchema(BaseModel):
+    """
+    Schema for returning user settings. The API key is not included.
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    user_id: Optional[str] = None
+    preferred_model: str
+    is_cache_enabled: bool
+    cache_expiration_time: int
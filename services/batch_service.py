@@ -0,0 +1,126 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from pydantic import ValidationError
+
+from ..models import SettingsModel
+from ..schemas import RequestSchema
+from ..utils.exceptions import APIError
+from ..utils.logger import logger
+from .openai_service import openai_service
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Splits a stream of byte chunks into numbered NDJSON lines without buffering more than one line.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The raw body, e.g. `Request.stream()` or a file read in chunks.
+        max_line_bytes (int): Maximum length of a line. Longer lines are skipped and yielded as None.
+
+    Yields:
+        Tuple[int, Optional[bytes]]: The zero-based line index and the line, or None if it was too long.
+            Blank lines are skipped but still counted.
+    """
+    index = 0
+    buffer = b""
+    oversized = False
+    async for chunk in chunks:
+        buffer += chunk
+        # Lines are sliced from a moving offset and the remainder copied once per chunk, not once per line
+        start = 0
+        while True:
+            newline = buffer.find(b"\n", start)
+            if newline < 0:
+                break
+            line, start = buffer[start:newline], newline + 1
+            if oversized:
+                yield index, None
+                oversized = False
+            elif line.strip():
+                yield index, line
+            index += 1
+        buffer = buffer[start:]
+        if len(buffer) > max_line_bytes:
+            # Drop the rest of the line instead of buffering it
+            buffer = b""
+            oversized = True
+    if oversized:
+        yield index, None
+    elif buffer.strip():
+        yield index, buffer
+
+async def map_unordered(items: AsyncIterator[Any], worker: Callable[[Any], Awaitable[Any]], concurrency: int) -> AsyncIterator[Any]:
+    """
+    Runs `worker` over `items` with at most `concurrency` calls in flight, yielding results as they complete.
+
+    The next item is only read once a slot is free, so memory stays bounded by `concurrency` whatever the
+    number of items. Reading and processing overlap: results are yielded while the next item is awaited.
+    Pending calls are cancelled if the consumer stops early.
+    """
+    iterator = items.__aiter__()
+
+    async def next_item():
+        try:
+            return True, await iterator.__anext__()
+        except StopAsyncIteration:
+            return False, None
+
+    pending = set()
+    reader: Optional[asyncio.Future] = None
+    exhausted = False
+    try:
+        while True:
+            if reader is None and not exhausted and len(pending) < concurrency:
+                reader = asyncio.ensure_future(next_item())
+            waiting = pending | {reader} if reader is not None else pending
+            if not waiting:
+                return
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            if reader in done:
+                has_item, item = reader.result()
+                reader = None
+                if has_item:
+                    pending.add(asyncio.ensure_future(worker(item)))
+                else:
+                    exhausted = True
+            for task in done & pending:
+                pending.discard(task)
+                yield task.result()
+    finally:
+        for task in pending | ({reader} if reader is not None else set()):
+            task.cancel()
+
+async def process_line(index: int, line: Optional[bytes], user_settings: Optional[SettingsModel] = None) -> Dict[str, Any]:
+    """
+    Processes one NDJSON line holding a RequestSchema object.
+
+    Returns:
+        Dict[str, Any]: The result tagged with the line index, with either the response or the error
+            detail and the HTTP status code the error would have as a single request.
+    """
+    if line is None:
+        return {"index": index, "status": "error", "status_code": 413, "detail": "Line is too long."}
+    try:
+        request_data = RequestSchema(**json.loads(line))
+        response = await openai_service.process_request(request_data.dict(exclude={"stream"}), user_settings)
+        return {"index": index, "status": "success", "response": response}
+    except (ValueError, ValidationError) as e:
+        detail = json.loads(e.json()) if isinstance(e, ValidationError) else f"Invalid JSON: {e}"
+        return {"index": index, "status": "error", "status_code": 422, "detail": detail}
+    except APIError as e:
+        return {"index": index, "status": "error", "status_code": e.status_code, "detail": e.detail}
+    except Exception as e:
+        logger.error("Unexpected Error in batch line %s: %s", index, e)
+        return {"index": index, "status": "error", "status_code": 500, "detail": "Internal Server Error"}
+
+async def process_batch(lines: AsyncIterator[Tuple[int, Optional[bytes]]], concurrency: int,
+                        user_settings: Optional[SettingsModel] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Processes numbered NDJSON lines through openai_service with bounded concurrency.
+
+    Yields:
+        Dict[str, Any]: One result per line, in completion order.
+    """
+    async for result in map_unordered(lines, lambda item: process_line(item[0], item[1], user_settings), concurrency):
+        yield result
@@ -0,0 +1,100 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..utils.logger import logger
+
+class _Batch:
+    """
+    Prompts collected for one upstream call and the futures of the callers waiting on them.
+    """
+
+    def __init__(self, params: Dict[str, Any]):
+        self.params = params
+        self.prompts: List[str] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+class CompletionBatcher:
+    """
+    Groups concurrent completion calls that share a model and sampling parameters into a single
+    multi-prompt request to the legacy Completions API.
+
+    A batch is sent when its collection window elapses or when it reaches the maximum size, and
+    each choice in the response is routed back to the caller of the prompt at the same index.
+    """
+
+    def __init__(self, send: Callable[[Dict[str, Any]], Awaitable[Any]], window_ms: float = 10, max_batch_size: int = 20):
+        self._send = send
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: Dict[Tuple, _Batch] = {}
+        self.batches_sent = 0
+        self.prompts_sent = 0
+
+    async def submit(self, params: Dict[str, Any]) -> str:
+        """
+        Queues a single-prompt completion call and waits for its result.
+
+        Args:
+            params (Dict[str, Any]): Keyword arguments of the completion call, with a single `prompt`.
+
+        Returns:
+            str: The text of the choice generated for this prompt.
+
+        Raises:
+            Exception: Whatever the upstream call for the batch raised.
+        """
+        loop = asyncio.get_running_loop()
+        key = tuple(sorted((name, value) for name, value in params.items() if name != "prompt"))
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = _Batch(params)
+            batch.timer = loop.call_later(self.window, self._flush, key, batch)
+            self._pending[key] = batch
+
+        future = loop.create_future()
+        batch.prompts.append(params["prompt"])
+        batch.futures.append(future)
+        if len(batch.prompts) >= self.max_batch_size:
+            self._flush(key, batch)
+        return await future
+
+    def _flush(self, key: Tuple, batch: _Batch):
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+        batch.timer.cancel()
+        asyncio.ensure_future(self._dispatch(batch))
+
+    async def _dispatch(self, batch: _Batch):
+        # Callers that were cancelled while the batch was collecting do not need a completion
+        waiting = [(prompt, future) for prompt, future in zip(batch.prompts, batch.futures) if not future.done()]
+        if not waiting:
+            return
+        prompts = [prompt for prompt, _ in waiting]
+        self.batches_sent += 1
+        self.prompts_sent += len(prompts)
+        try:
+            response = await self._send({**batch.params, "prompt": prompts if len(prompts) > 1 else prompts[0]})
+            texts = {choice.index: choice.text for choice in response.choices}
+        except BaseException as e:
+            for _, future in waiting:
+                if not future.done():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for index, (_, future) in enumerate(waiting):
+            if future.done():
+                continue
+            if index in texts:
+                future.set_result(texts[index])
+            else:
+                logger.error("Batched completion response has no choice for prompt %s.", index)
+                future.set_exception(RuntimeError("Missing choice in batched completion response."))
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of upstream calls made, prompts sent through them and batches still collecting.
+        """
+        return {"batches_sent": self.batches_sent, "prompts_sent": self.prompts_sent, "collecting": len(self._pending)}
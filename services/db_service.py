@@ -1,233 +1,370 @@
-from sqlalchemy.orm import Session
-from .models import SettingsModel, RequestModel
-from .utils.logger import logger
-from .utils.exceptions import APIError, NotFoundError, DatabaseError
+import base64
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import SessionLocal
+from ..models import SettingsModel, RequestModel
+from ..schemas import SettingsSchema, RequestSchema
+from ..utils.logger import logger
+from ..utils.settings_cache import settings_cache
+from ..utils.exceptions import APIError, NotFoundError, DatabaseError, ValidationException
 
 # SQLAlchemy dependency injection
-def get_db():
-    # This function creates a database session (scoped)
+async def get_db() -> AsyncIterator[AsyncSession]:
+    # This function opens an async database session from the shared connection pool
     # It is a dependency injected into routes and services
     # It's the central point for accessing the database
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-# Functions for managing user settings
-async def create_settings(db: Session, settings_data: SettingsSchema, user_id: str):
-    """Creates new user settings.
+def build_request_row(request_data: Dict[str, Any], user_id: str, response: Optional[str] = None,
+                      status: str = "completed") -> Dict[str, Any]:
+    """
+    Maps request data and its response onto the column values of a RequestModel row.
 
     Args:
-        db (Session): Database session.
-        settings_data (SettingsSchema): Data to create settings.
-        user_id (str): User ID for the settings.
+        request_data (Dict[str, Any]): Data containing the prompt, model selection, and parameters.
+        user_id (str): ID of the settings row of the requesting user.
+        response (Optional[str]): The response text, if the request completed.
+        status (str): Processing status of the request.
 
     Returns:
-        SettingsModel: Created settings object.
-
-    Raises:
-        DatabaseError: If database error occurs.
+        Dict[str, Any]: Column values, including a generated id and creation time.
     """
-    try:
-        new_settings = SettingsModel(**settings_data.dict(), user_id=user_id)
-        db.add(new_settings)
-        db.commit()
-        db.refresh(new_settings)
-        return new_settings
-    except Exception as e:
-        logger.error(f"Error creating settings: {e}")
-        db.rollback()
-        raise DatabaseError(detail="Failed to create settings.")
-
-async def get_settings(db: Session, user_id: str):
-    """Retrieves settings for a user.
+    return {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "prompt": request_data["prompt"],
+        "model": request_data["model"],
+        "parameters": {key: value for key, value in request_data.items() if key not in ("prompt", "model", "stream")},
+        "response": response,
+        "status": status,
+        "created_at": datetime.now(timezone.utc),
+    }
 
-    Args:
-        db (Session): Database session.
-        user_id (str): User ID to retrieve settings.
+def encode_cursor(created_at: datetime, request_id: str) -> str:
+    """
+    Encodes the position after a request in the history order as an opaque cursor.
+    """
+    payload = json.dumps([created_at.isoformat(), request_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
 
-    Returns:
-        SettingsModel: Retrieved settings object.
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decodes a cursor produced by encode_cursor.
 
     Raises:
-        NotFoundError: If settings not found.
-        DatabaseError: If database error occurs.
+        ValidationException: If the cursor is malformed.
     """
     try:
-        settings = db.query(SettingsModel).filter(SettingsModel.user_id == user_id).first()
-        if not settings:
-            raise NotFoundError(detail="Settings not found.")
-        return settings
-    except NotFoundError as e:
-        logger.warning(f"Settings not found: {e}")
-        raise e
-    except Exception as e:
-        logger.error(f"Error fetching settings: {e}")
-        raise DatabaseError(detail="Failed to fetch settings.")
-
-async def update_settings(db: Session, settings_data: SettingsSchema, user_id: str):
-    """Updates settings for a user.
-
-    Args:
-        db (Session): Database session.
-        settings_data (SettingsSchema): Data to update settings.
-        user_id (str): User ID to update settings.
+        created_at, request_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), request_id
+    except Exception:
+        raise ValidationException(detail="Invalid cursor.")
 
-    Returns:
-        SettingsModel: Updated settings object.
+def _settings_values(settings: SettingsModel) -> Dict[str, Any]:
+    return {column.key: getattr(settings, column.key) for column in SettingsModel.__table__.columns}
 
-    Raises:
-        NotFoundError: If settings not found.
-        DatabaseError: If database error occurs.
+class DBService:
+    """
+    Database operations for user settings and requests. All queries run on an AsyncSession,
+    so they never block the event loop. Settings reads go through the shared settings cache,
+    which the settings write methods invalidate.
     """
-    try:
-        settings = db.query(SettingsModel).filter(SettingsModel.user_id == user_id).first()
-        if not settings:
-            raise NotFoundError(detail="Settings not found.")
-        for key, value in settings_data.dict(exclude_unset=True).items():
-            setattr(settings, key, value)
-        db.commit()
-        db.refresh(settings)
-        return settings
-    except NotFoundError as e:
-        logger.warning(f"Settings not found: {e}")
-        raise e
-    except Exception as e:
-        logger.error(f"Error updating settings: {e}")
-        db.rollback()
-        raise DatabaseError(detail="Failed to update settings.")
-
-async def delete_settings(db: Session, user_id: str):
-    """Deletes settings for a user.
 
-    Args:
-        db (Session): Database session.
-        user_id (str): User ID to delete settings.
+    # Methods for managing user settings
+    async def create_settings(self, db: AsyncSession, settings_data: SettingsSchema, user_id: str):
+        """Creates new user settings.
 
-    Raises:
-        NotFoundError: If settings not found.
-        DatabaseError: If database error occurs.
-    """
-    try:
-        settings = db.query(SettingsModel).filter(SettingsModel.user_id == user_id).first()
-        if not settings:
-            raise NotFoundError(detail="Settings not found.")
-        db.delete(settings)
-        db.commit()
-    except NotFoundError as e:
-        logger.warning(f"Settings not found: {e}")
-        raise e
-    except Exception as e:
-        logger.error(f"Error deleting settings: {e}")
-        db.rollback()
-        raise DatabaseError(detail="Failed to delete settings.")
-
-# Functions for managing user requests
-async def create_request(db: Session, request_data: RequestSchema, user_id: str):
-    """Creates a new user request.
+        Args:
+            db (AsyncSession): Database session.
+            settings_data (SettingsSchema): Data to create settings.
+            user_id (str): User ID for the settings.
 
-    Args:
-        db (Session): Database session.
-        request_data (RequestSchema): Data for the request.
-        user_id (str): User ID for the request.
+        Returns:
+            SettingsModel: Created settings object.
 
-    Returns:
-        RequestModel: Created request object.
+        Raises:
+            DatabaseError: If database error occurs.
+        """
+        try:
+            new_settings = SettingsModel(**settings_data.dict(), user_id=user_id)
+            db.add(new_settings)
+            await settings_cache.notify(db, user_id)
+            await db.commit()
+            settings_cache.invalidate(user_id)
+            await db.refresh(new_settings)
+            return new_settings
+        except Exception as e:
+            logger.error("Error creating settings: %s", e)
+            await db.rollback()
+            raise DatabaseError(detail="Failed to create settings.")
 
-    Raises:
-        DatabaseError: If database error occurs.
-    """
-    try:
-        new_request = RequestModel(**request_data.dict(), user_id=user_id)
-        db.add(new_request)
-        db.commit()
-        db.refresh(new_request)
-        return new_request
-    except Exception as e:
-        logger.error(f"Error creating request: {e}")
-        db.rollback()
-        raise DatabaseError(detail="Failed to create request.")
-
-async def get_request(db: Session, request_id: str):
-    """Retrieves a request by ID.
+    async def get_settings(self, db: AsyncSession, user_id: str):
+        """Retrieves settings for a user.
 
-    Args:
-        db (Session): Database session.
-        request_id (str): ID of the request.
+        Args:
+            db (AsyncSession): Database session.
+            user_id (str): User ID to retrieve settings.
 
-    Returns:
-        RequestModel: Retrieved request object.
+        Returns:
+            SettingsModel: Retrieved settings object. Cached settings are returned as a detached copy.
 
-    Raises:
-        NotFoundError: If request not found.
-        DatabaseError: If database error occurs.
-    """
-    try:
-        request = db.query(RequestModel).filter(RequestModel.id == request_id).first()
-        if not request:
-            raise NotFoundError(detail="Request not found.")
-        return request
-    except NotFoundError as e:
-        logger.warning(f"Request not found: {e}")
-        raise e
-    except Exception as e:
-        logger.error(f"Error fetching request: {e}")
-        raise DatabaseError(detail="Failed to fetch request.")
-
-async def update_request(db: Session, request_data: RequestSchema, request_id: str):
-    """Updates a request by ID.
+        Raises:
+            NotFoundError: If settings not found.
+            DatabaseError: If database error occurs.
+        """
+        try:
+            cached, values = settings_cache.get(user_id)
+            if cached:
+                if values is None:
+                    raise NotFoundError(detail="Settings not found.")
+                return SettingsModel(**values)
+            version = settings_cache.version
+            result = await db.execute(select(SettingsModel).where(SettingsModel.user_id == user_id))
+            settings = result.scalars().first()
+            settings_cache.set(user_id, _settings_values(settings) if settings else None, version)
+            if not settings:
+                raise NotFoundError(detail="Settings not found.")
+            return settings
+        except NotFoundError as e:
+            logger.warning("Settings not found: %s", e)
+            raise e
+        except Exception as e:
+            logger.error("Error fetching settings: %s", e)
+            raise DatabaseError(detail="Failed to fetch settings.")
 
-    Args:
-        db (Session): Database session.
-        request_data (RequestSchema): Data to update the request.
-        request_id (str): ID of the request.
+    async def update_settings(self, db: AsyncSession, settings_data: SettingsSchema, user_id: str):
+        """Updates settings for a user.
 
-    Returns:
-        RequestModel: Updated request object.
+        Args:
+            db (AsyncSession): Database session.
+            settings_data (SettingsSchema): Data to update settings.
+            user_id (str): User ID to update settings.
 
-    Raises:
-        NotFoundError: If request not found.
-        DatabaseError: If database error occurs.
-    """
-    try:
-        request = db.query(RequestModel).filter(RequestModel.id == request_id).first()
-        if not request:
-            raise NotFoundError(detail="Request not found.")
-        for key, value in request_data.dict(exclude_unset=True).items():
-            setattr(request, key, value)
-        db.commit()
-        db.refresh(request)
-        return request
-    except NotFoundError as e:
-        logger.warning(f"Request not found: {e}")
-        raise e
-    except Exception as e:
-        logger.error(f"Error updating request: {e}")
-        db.rollback()
-        raise DatabaseError(detail="Failed to update request.")
-
-async def delete_request(db: Session, request_id: str):
-    """Deletes a request by ID.
+        Returns:
+            SettingsModel: Updated settings object.
 
-    Args:
-        db (Session): Database session.
-        request_id (str): ID of the request.
+        Raises:
+            NotFoundError: If settings not found.
+            DatabaseError: If database error occurs.
+        """
+        try:
+            result = await db.execute(select(SettingsModel).where(SettingsModel.user_id == user_id))
+            settings = result.scalars().first()
+            if not settings:
+                raise NotFoundError(detail="Settings not found.")
+            for key, value in settings_data.dict(exclude_unset=True).items():
+                setattr(settings, key, value)
+            await settings_cache.notify(db, user_id)
+            await db.commit()
+            settings_cache.invalidate(user_id)
+            await db.refresh(settings)
+            return settings
+        except NotFoundError as e:
+            logger.warning("Settings not found: %s", e)
+            raise e
+        except Exception as e:
+            logger.error("Error updating settings: %s", e)
+            await db.rollback()
+            raise DatabaseError(detail="Failed to update settings.")
 
-    Raises:
-        NotFoundError: If request not found.
-        DatabaseError: If database error occurs.
-    """
-    try:
-        request = db.query(RequestModel).filter(RequestModel.id == request_id).first()
-        if not request:
-            raise NotFoundError(detail="Request not found.")
-        db.delete(request)
-        db.commit()
-    except NotFoundError as e:
-        logger.warning(f"Request not found: {e}")
-        raise e
-    except Exception as e:
-        logger.error(f"Error deleting request: {e}")
-        db.rollback()
-        raise DatabaseError(detail="Failed to delete request.")
\ No newline at end of file
+    async def delete_settings(self, db: AsyncSession, user_id: str):
+        """Deletes settings for a user.
+
+        Args:
+            db (AsyncSession): Database session.
+            user_id (str): User ID to delete settings.
+
+        Raises:
+            NotFoundError: If settings not found.
+            DatabaseError: If database error occurs.
+        """
+        try:
+            result = await db.execute(select(SettingsModel).where(SettingsModel.user_id == user_id))
+            settings = result.scalars().first()
+            if not settings:
+                raise NotFoundError(detail="Settings not found.")
+            await db.delete(settings)
+            await settings_cache.notify(db, user_id)
+            await db.commit()
+            settings_cache.invalidate(user_id)
+        except NotFoundError as e:
+            logger.warning("Settings not found: %s", e)
+            raise e
+        except Exception as e:
+            logger.error("Error deleting settings: %s", e)
+            await db.rollback()
+            raise DatabaseError(detail="Failed to delete settings.")
+
+    # Methods for managing user requests
+    async def create_request(self, db: AsyncSession, request_data: RequestSchema, user_id: str,
+                             response: Optional[str] = None, status: str = "completed"):
+        """Creates a new user request.
+
+        Args:
+            db (AsyncSession): Database session.
+            request_data (RequestSchema): Data for the request.
+            user_id (str): User ID for the request.
+            response (Optional[str]): The response text, if the request completed.
+            status (str): Processing status of the request.
+
+        Returns:
+            RequestModel: Created request object.
+
+        Raises:
+            DatabaseError: If database error occurs.
+        """
+        try:
+            new_request = RequestModel(**build_request_row(request_data.dict(), user_id, response, status))
+            db.add(new_request)
+            await db.commit()
+            await db.refresh(new_request)
+            return new_request
+        except Exception as e:
+            logger.error("Error creating request: %s", e)
+            await db.rollback()
+            raise DatabaseError(detail="Failed to create request.")
+
+    async def list_requests(self, db: AsyncSession, user_id: Optional[str] = None, model: Optional[str] = None,
+                            status: Optional[str] = None, created_after: Optional[datetime] = None,
+                            created_before: Optional[datetime] = None, limit: int = 50,
+                            cursor: Optional[str] = None) -> Tuple[List[RequestModel], Optional[str]]:
+        """Lists requests newest first, one page at a time.
+
+        Pages are found with keyset pagination on (created_at, id) rather than an offset, so the
+        cost of a page does not depend on how deep into the history it is.
+
+        Args:
+            db (AsyncSession): Database session.
+            user_id (Optional[str]): Only include requests of this settings ID.
+            model (Optional[str]): Only include requests for this model.
+            status (Optional[str]): Only include requests with this status.
+            created_after (Optional[datetime]): Only include requests created at or after this time.
+            created_before (Optional[datetime]): Only include requests created before this time.
+            limit (int): Maximum number of requests per page.
+            cursor (Optional[str]): Cursor returned with the previous page.
+
+        Returns:
+            Tuple[List[RequestModel], Optional[str]]: The page of requests, and the cursor of the
+                next page, which is None on the last page.
+
+        Raises:
+            ValidationException: If the cursor is malformed.
+            DatabaseError: If database error occurs.
+        """
+        query = select(RequestModel)
+        if user_id is not None:
+            query = query.where(RequestModel.user_id == user_id)
+        if model is not None:
+            query = query.where(RequestModel.model == model)
+        if status is not None:
+            query = query.where(RequestModel.status == status)
+        if created_after is not None:
+            query = query.where(RequestModel.created_at >= created_after)
+        if created_before is not None:
+            query = query.where(RequestModel.created_at < created_before)
+        if cursor is not None:
+            query = query.where(tuple_(RequestModel.created_at, RequestModel.id) < tuple_(*decode_cursor(cursor)))
+        # One extra row tells whether there is a next page
+        query = query.order_by(RequestModel.created_at.desc(), RequestModel.id.desc()).limit(limit + 1)
+        try:
+            requests = list((await db.execute(query)).scalars())
+        except Exception as e:
+            logger.error("Error listing requests: %s", e)
+            raise DatabaseError(detail="Failed to list requests.")
+        if len(requests) <= limit:
+            return requests, None
+        requests = requests[:limit]
+        return requests, encode_cursor(requests[-1].created_at, requests[-1].id)
+
+    async def get_request(self, db: AsyncSession, request_id: str):
+        """Retrieves a request by ID.
+
+        Args:
+            db (AsyncSession): Database session.
+            request_id (str): ID of the request.
+
+        Returns:
+            RequestModel: Retrieved request object.
+
+        Raises:
+            NotFoundError: If request not found.
+            DatabaseError: If database error occurs.
+        """
+        try:
+            result = await db.execute(select(RequestModel).where(RequestModel.id == request_id))
+            request = result.scalars().first()
+            if not request:
+                raise NotFoundError(detail="Request not found.")
+            return request
+        except NotFoundError as e:
+            logger.warning("Request not found: %s", e)
+            raise e
+        except Exception as e:
+            logger.error("Error fetching request: %s", e)
+            raise DatabaseError(detail="Failed to fetch request.")
+
+    async def update_request(self, db: AsyncSession, request_data: RequestSchema, request_id: str):
+        """Updates a request by ID.
+
+        Args:
+            db (AsyncSession): Database session.
+            request_data (RequestSchema): Data to update the request.
+            request_id (str): ID of the request.
+
+        Returns:
+            RequestModel: Updated request object.
+
+        Raises:
+            NotFoundError: If request not found.
+            DatabaseError: If database error occurs.
+        """
+        try:
+            result = await db.execute(select(RequestModel).where(RequestModel.id == request_id))
+            request = result.scalars().first()
+            if not request:
+                raise NotFoundError(detail="Request not found.")
+            for key, value in request_data.dict(exclude_unset=True).items():
+                setattr(request, key, value)
+            await db.commit()
+            await db.refresh(request)
+            return request
+        except NotFoundError as e:
+            logger.warning("Request not found: %s", e)
+            raise e
+        except Exception as e:
+            logger.error("Error updating request: %s", e)
+            await db.rollback()
+            raise DatabaseError(detail="Failed to update request.")
+
+    async def delete_request(self, db: AsyncSession, request_id: str):
+        """Deletes a request by ID.
+
+        Args:
+            db (AsyncSession): Database session.
+            request_id (str): ID of the request.
+
+        Raises:
+            NotFoundError: If request not found.
+            DatabaseError: If database error occurs.
+        """
+        try:
+            result = await db.execute(select(RequestModel).where(RequestModel.id == request_id))
+            request = result.scalars().first()
+            if not request:
+                raise NotFoundError(detail="Request not found.")
+            await db.delete(request)
+            await db.commit()
+        except NotFoundError as e:
+            logger.warning("Request not found: %s", e)
+            raise e
+        except Exception as e:
+            logger.error("Error deleting request: %s", e)
+            await db.rollback()
+            raise DatabaseError(detail="Failed to delete request.")
+
+db_service = DBService()
@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import RequestModel
+from ..utils.config import settings
+
+# Columns of an exported request row, in output order
+EXPORT_COLUMNS = ("id", "user_id", "prompt", "model", "parameters", "response", "status", "created_at")
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+async def stream_request_rows(db: AsyncSession, user_id: Optional[str] = None, created_after: Optional[datetime] = None,
+                              created_before: Optional[datetime] = None,
+                              batch_rows: Optional[int] = None) -> AsyncIterator[List[Sequence[Any]]]:
+    """
+    Streams request rows oldest first from a server-side cursor, in batches of up to `batch_rows` rows.
+
+    Only the export columns are selected, and rows are plain tuples rather than ORM objects, so memory
+    use is bounded by the batch size however many rows match.
+
+    Args:
+        db (AsyncSession): Database session.
+        user_id (Optional[str]): Only export requests of this settings ID.
+        created_after (Optional[datetime]): Only export requests created at or after this time.
+        created_before (Optional[datetime]): Only export requests created before this time.
+        batch_rows (Optional[int]): Rows fetched per round trip. Defaults to settings.EXPORT_BATCH_ROWS.
+
+    Yields:
+        List[Sequence[Any]]: Batches of rows with the values of EXPORT_COLUMNS.
+    """
+    table = RequestModel.__table__
+    query = select(*(table.c[column] for column in EXPORT_COLUMNS))
+    if user_id is not None:
+        query = query.where(table.c.user_id == user_id)
+    if created_after is not None:
+        query = query.where(table.c.created_at >= created_after)
+    if created_before is not None:
+        query = query.where(table.c.created_at < created_before)
+    query = query.order_by(table.c.created_at, table.c.id)
+    result = await db.stream(query.execution_options(yield_per=batch_rows or settings.EXPORT_BATCH_ROWS))
+    async for batch in result.partitions():
+        yield batch
+
+def _text_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+async def encode_ndjson(batches: AsyncIterator[List[Sequence[Any]]]) -> AsyncIterator[bytes]:
+    """
+    Encodes row batches as NDJSON objects keyed by column name, one chunk per batch.
+    """
+    async for batch in batches:
+        lines = [json.dumps(dict(zip(EXPORT_COLUMNS, map(_text_value, row)))) for row in batch]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+async def encode_csv(batches: AsyncIterator[List[Sequence[Any]]]) -> AsyncIterator[bytes]:
+    """
+    Encodes row batches as CSV with a header row, one chunk per batch. The JSON `parameters`
+    column is written as JSON text.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode("utf-8")
+    parameters = EXPORT_COLUMNS.index("parameters")
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in batch:
+            values = [_text_value(value) for value in row]
+            if values[parameters] is not None:
+                values[parameters] = json.dumps(values[parameters])
+            writer.writerow(values)
+        yield buffer.getvalue().encode("utf-8")
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """
+    Compresses a stream of chunks into a single gzip stream.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def encode_export(batches: AsyncIterator[List[Sequence[Any]]], export_format: str, compress: bool = False) -> AsyncIterator[bytes]:
+    """
+    Encodes row batches from stream_request_rows in `export_format` ("ndjson" or "csv"), gzipped if `compress`.
+
+    Raises:
+        ValueError: If the export format is not supported.
+    """
+    if export_format == "ndjson":
+        chunks = encode_ndjson(batches)
+    elif export_format == "csv":
+        chunks = encode_csv(batches)
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    return gzip_chunks(chunks) if compress else chunks
@@ -1,105 +1,527 @@
 from fastapi import HTTPException, status
-from typing import Dict, Any, Optional
-from .utils.logger import logger
-from .utils.exceptions import APIError, NotFoundError
-from .utils.cache import cache_handler
-from .config import settings
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+from ..utils.logger import logger
+from ..utils.exceptions import APIError, NotFoundError, RateLimitError, ServiceUnavailableError
+from ..utils.cache import cache_handler, make_cache_key
+from ..utils.single_flight import SingleFlight
+from ..utils.similarity_cache import SimilarityCache
+from ..utils.concurrency_limiter import AdaptiveConcurrencyLimiter, ConcurrencyLimitExceeded
+from ..utils.resilience import ResilientCaller, parse_retry_after
+from ..utils.circuit_breaker import OPEN, CircuitBreaker, CircuitOpenError
+from ..utils.model_catalog import ModelNotFound, model_catalog
+from ..utils.metrics import OPENAI_REQUEST_DURATION, STALE_RESPONSES, model_label, record_breaker_state, record_usage
+from ..utils.timing import phase
+from ..services.batcher import CompletionBatcher
+from ..utils.config import settings
+from ..models import SettingsModel
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import time
 import openai
+import aiohttp
 import json
 
+def _retry_after_header(e: Exception) -> Optional[str]:
+    if not isinstance(e, openai.error.OpenAIError):
+        return None
+    return e.headers.get("retry-after") or e.headers.get("Retry-After")
+
+def _is_transient(e: Exception) -> bool:
+    """
+    Tells whether a failed upstream call may succeed when sent again: rate limits, timeouts,
+    connection errors and server-side (5xx) errors.
+    """
+    if isinstance(e, (openai.error.RateLimitError, openai.error.Timeout, openai.error.APIConnectionError,
+                      openai.error.ServiceUnavailableError, openai.error.TryAgain)):
+        return True
+    return isinstance(e, openai.error.APIError) and (e.http_status is None or e.http_status >= 500)
+
+def _is_not_found(e: Exception) -> bool:
+    return isinstance(e, openai.error.OpenAIError) and (e.code in ("not_found", "model_not_found") or e.http_status == 404)
+
 class OpenAIService:
     def __init__(self):
         openai.api_key = settings.OPENAI_API_KEY
+        openai.api_base = settings.OPENAI_API_BASE
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Coalesces identical requests that miss the cache at the same time
+        self.single_flight = SingleFlight()
+        # Serves near-duplicate prompts of deterministic requests from the cache
+        self.similarity_cache: Optional[SimilarityCache] = None
+        if settings.SIMILARITY_CACHE_ENABLED:
+            self.similarity_cache = SimilarityCache(
+                threshold=settings.SIMILARITY_CACHE_THRESHOLD,
+                max_entries=settings.SIMILARITY_CACHE_MAX_ENTRIES,
+            )
+        # Groups concurrent completion calls into multi-prompt upstream requests
+        self.batcher: Optional[CompletionBatcher] = None
+        if settings.OPENAI_BATCH_ENABLED:
+            self.batcher = CompletionBatcher(
+                self._send_completion,
+                window_ms=settings.OPENAI_BATCH_WINDOW_MS,
+                max_batch_size=settings.OPENAI_BATCH_MAX_SIZE,
+            )
+        # Adapts the number of concurrent upstream calls per model to what OpenAI accepts
+        self.limiter: Optional[AdaptiveConcurrencyLimiter] = None
+        if settings.UPSTREAM_LIMITER_ENABLED:
+            self.limiter = AdaptiveConcurrencyLimiter(
+                initial_limit=settings.UPSTREAM_LIMITER_INITIAL_LIMIT,
+                min_limit=settings.UPSTREAM_LIMITER_MIN_LIMIT,
+                max_limit=settings.UPSTREAM_LIMITER_MAX_LIMIT,
+                latency_tolerance=settings.UPSTREAM_LIMITER_LATENCY_TOLERANCE,
+                queue_timeout=settings.UPSTREAM_LIMITER_QUEUE_TIMEOUT or None,
+                is_overload=lambda e: isinstance(e, openai.error.RateLimitError),
+            )
+        # Retries transient upstream failures and hedges slow completion calls
+        self.resilience = ResilientCaller(
+            max_retries=settings.OPENAI_MAX_RETRIES,
+            base_delay_ms=settings.OPENAI_RETRY_BASE_DELAY_MS,
+            max_delay_ms=settings.OPENAI_RETRY_MAX_DELAY_MS,
+            max_retry_after=settings.OPENAI_RETRY_AFTER_MAX,
+            hedge=settings.OPENAI_HEDGE_ENABLED,
+            hedge_quantile=settings.OPENAI_HEDGE_QUANTILE,
+            hedge_min_samples=settings.OPENAI_HEDGE_MIN_SAMPLES,
+            is_retryable=_is_transient,
+            retry_after=lambda e: parse_retry_after(_retry_after_header(e)),
+        )
+        # Per-model circuit breakers that stop upstream calls after repeated failures
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        # Background refreshes of stale cache entries, by cache key
+        self._revalidations: Dict[str, asyncio.Future] = {}
+        # Stale cached responses served, by reason
+        self.stale_served = {"revalidate": 0, "circuit_open": 0, "upstream_error": 0}
+
+    async def init(self, pool_size: Optional[int] = None):
+        """
+        Opens the pooled HTTP session used for all upstream OpenAI calls.
+
+        Args:
+            pool_size (Optional[int]): Maximum number of concurrent keep-alive connections.
+                Defaults to settings.OPENAI_POOL_SIZE.
+        """
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=pool_size or settings.OPENAI_POOL_SIZE,
+            keepalive_timeout=settings.OPENAI_POOL_KEEPALIVE_TIMEOUT,
+        )
+        self._session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        """
+        Closes the pooled HTTP session and its connections.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _use_session(self):
+        """
+        Binds the pooled session to the current task so the openai client reuses its connections
+        instead of opening a new session per call.
+        """
+        if self._session is None or self._session.closed:
+            await self.init()
+        openai.aiosession.set(self._session)
+
+    @asynccontextmanager
+    async def _upstream_slot(self, model: str, sample_latency: bool = True):
+        """
+        Holds a concurrency slot of the upstream model for the duration of a call, when the limiter is enabled.
+        """
+        if self.limiter is None:
+            yield
+        else:
+            async with self.limiter.slot(model, sample_latency=sample_latency):
+                yield
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        breaker = self.breakers.get(model)
+        if breaker is None:
+            breaker = self.breakers[model] = CircuitBreaker(
+                failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=settings.CIRCUIT_BREAKER_RESET_TIMEOUT,
+            )
+        return breaker
+
+    @asynccontextmanager
+    async def _guarded(self, model: str):
+        """
+        Runs an upstream call through the circuit breaker of its model. Transient failures count
+        against the upstream; any other answer from it shows it is reachable. Rate limits count as
+        neither: the concurrency limiter backs off on them, and opening the circuit would turn a
+        queue into 503s for every caller.
+
+        Raises:
+            CircuitOpenError: If the circuit of the model is open.
+        """
+        breaker = self._breaker(model)
+        allowed = breaker.allow()
+        record_breaker_state(model, breaker.state)
+        if not allowed:
+            raise CircuitOpenError(f"Circuit open for model {model}", retry_after=breaker.retry_after())
+        outcome = breaker.release
+        try:
+            yield
+            outcome = breaker.record_success
+        except Exception as e:
+            if isinstance(e, openai.error.RateLimitError):
+                outcome = breaker.release
+            elif _is_transient(e):
+                outcome = breaker.record_failure
+            elif isinstance(e, openai.error.OpenAIError):
+                outcome = breaker.record_success
+            raise
+        finally:
+            # Anything else, e.g. a cancelled hedge or an abandoned stream, ends the call without a
+            # verdict; a half-open probe that was never released would keep the circuit open for good
+            outcome()
+            record_breaker_state(model, breaker.state)
+
+    def _served_stale(self, request_data: Dict[str, Any], reason: str):
+        self.stale_served[reason] += 1
+        STALE_RESPONSES.labels(model_label(request_data.get("model", settings.DEFAULT_OPENAI_MODEL)), reason).inc()
+
+    def _unavailable_error(self, e: CircuitOpenError) -> ServiceUnavailableError:
+        logger.warning("OpenAI API unavailable: %s", e)
+        return ServiceUnavailableError(
+            detail="The OpenAI API is currently unavailable. Please retry later.",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+
+    def _revalidate(self, request_data: Dict[str, Any], cache_ttl: int):
+        """
+        Refreshes a stale cache entry in the background, unless a refresh of it is already running.
+        """
+        cache_key = make_cache_key(request_data)
+        if cache_key in self._revalidations:
+            return
+        refresh = asyncio.ensure_future(self.single_flight.do(cache_key, lambda: self._complete(request_data, cache_ttl)))
+        self._revalidations[cache_key] = refresh
+        refresh.add_done_callback(lambda _: self._revalidated(cache_key, refresh))
+
+    def _revalidated(self, cache_key: str, refresh: asyncio.Future):
+        self._revalidations.pop(cache_key, None)
+        if not refresh.cancelled() and refresh.exception() is not None:
+            logger.warning("Background refresh of a stale response failed: %s", refresh.exception())
+
+    def _rate_limit_error(self, e: Exception) -> RateLimitError:
+        """
+        Maps an upstream 429, or a call the limiter gave up queueing, onto a 429 response.
+        The Retry-After header of the upstream response is passed on.
+        """
+        if isinstance(e, ConcurrencyLimitExceeded):
+            logger.warning("Upstream concurrency limit exceeded: %s", e)
+            return RateLimitError(detail="Too many concurrent requests to the OpenAI API. Please retry later.")
+        logger.warning("OpenAI API rate limit: %s", e)
+        retry_after = _retry_after_header(e)
+        return RateLimitError(detail=f"OpenAI API rate limit: {e}", headers={"Retry-After": str(retry_after)} if retry_after else None)
+
+    def _completion_params(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Maps request data onto the keyword arguments of the OpenAI completion call.
+        """
+        return {
+            "engine": request_data.get("model", settings.DEFAULT_OPENAI_MODEL),
+            "prompt": request_data["prompt"],
+            "temperature": request_data.get("temperature", 0.7),
+            "max_tokens": request_data.get("max_tokens"),
+            "top_p": request_data.get("top_p"),
+            "frequency_penalty": request_data.get("frequency_penalty"),
+            "presence_penalty": request_data.get("presence_penalty"),
+            "request_timeout": settings.OPENAI_REQUEST_TIMEOUT,
+        }
 
-    async def process_request(self, request_data: Dict[str, Any]) -> str:
+    def _cache_policy(self, user_settings: Optional[SettingsModel]) -> Tuple[bool, int]:
+        """
+        Resolves whether responses may be cached for a user, and for how long.
+        """
+        if user_settings is None:
+            return True, settings.CACHE_EXPIRATION_TIME
+        return bool(user_settings.is_cache_enabled), user_settings.cache_expiration_time or settings.CACHE_EXPIRATION_TIME
+
+    async def _similar_cached_response(self, request_data: Dict[str, Any], cache_ttl: int) -> Optional[str]:
+        """
+        Looks up the cached response of a near-duplicate prompt. Only deterministic (temperature 0)
+        requests are eligible, since only their responses do not vary between calls.
+        """
+        if self.similarity_cache is None or request_data.get("temperature") != 0:
+            return None
+        cache_key = self.similarity_cache.lookup(request_data)
+        if cache_key is None:
+            return None
+        return await cache_handler.get_by_key(cache_key, max_age=cache_ttl)
+
+    def _index_similar(self, request_data: Dict[str, Any]):
+        """
+        Makes a freshly cached deterministic response available to near-duplicate prompts.
+        """
+        if self.similarity_cache is not None and request_data.get("temperature") == 0:
+            self.similarity_cache.add(request_data, make_cache_key(request_data))
+
+    async def process_request(self, request_data: Dict[str, Any], user_settings: Optional[SettingsModel] = None) -> str:
         """
         Processes a user request using the OpenAI API.
 
+        A cached response past its freshness is served right away while it is refreshed in the
+        background, for up to CACHE_STALE_WHILE_REVALIDATE seconds. Beyond that, up to its hard TTL,
+        it is served only while the circuit of the model is open or when the upstream call fails.
+
         Args:
             request_data (Dict[str, Any]): Data containing the prompt, model selection, and parameters.
+            user_settings (Optional[SettingsModel]): Settings of the requesting user. Their cache flag and
+                expiration time decide whether and for how long cached responses are used.
 
         Returns:
             str: The response text from OpenAI.
 
         Raises:
+            RateLimitError: If OpenAI rate limited the call, or no upstream slot became free in time.
+            ServiceUnavailableError: If the circuit of the model is open and no stale response is cached.
             APIError: If an error occurs during the OpenAI API call.
         """
         try:
+            cache_enabled, cache_ttl = self._cache_policy(user_settings)
+            stale_response = None
+
             # Check if the response is cached
-            cached_response = await cache_handler.get(request_data)
-            if cached_response:
-                logger.info("Using cached response.")
-                return cached_response
-
-            # Send the request to the OpenAI API
-            response = openai.Completion.create(
-                engine=request_data.get("model", settings.DEFAULT_OPENAI_MODEL),
-                prompt=request_data["prompt"],
-                temperature=request_data.get("temperature", 0.7),
-                max_tokens=request_data.get("max_tokens"),
-                top_p=request_data.get("top_p"),
-                frequency_penalty=request_data.get("frequency_penalty"),
-                presence_penalty=request_data.get("presence_penalty"),
-            )
+            if cache_enabled:
+                cached_response, staleness = await cache_handler.lookup(request_data, max_age=cache_ttl, max_stale=cache_handler.stale_ttl)
+                if cached_response and not staleness:
+                    logger.info("Using cached response.")
+                    return cached_response
+                similar_response = await self._similar_cached_response(request_data, cache_ttl)
+                if similar_response:
+                    logger.info("Using cached response.")
+                    return similar_response
+                if cached_response:
+                    stale_response = cached_response
+                    if self._breaker(request_data.get("model", settings.DEFAULT_OPENAI_MODEL)).state == OPEN:
+                        logger.info("Using stale cached response while the circuit is open.")
+                        self._served_stale(request_data, "circuit_open")
+                        return stale_response
+                    if staleness <= settings.CACHE_STALE_WHILE_REVALIDATE:
+                        logger.info("Using stale cached response while refreshing it.")
+                        self._revalidate(request_data, cache_ttl)
+                        self._served_stale(request_data, "revalidate")
+                        return stale_response
+
+            # Send the request to the OpenAI API, joining an identical request already in flight
+            try:
+                with phase("upstream"):
+                    return await self.single_flight.do(
+                        make_cache_key(request_data),
+                        lambda: self._complete(request_data, cache_ttl if cache_enabled else None),
+                    )
+            except Exception as e:
+                if stale_response is None or not (isinstance(e, CircuitOpenError) or _is_transient(e)):
+                    raise
+                logger.warning("Using stale cached response after upstream error: %s", e)
+                self._served_stale(request_data, "upstream_error")
+                return stale_response
+
+        except CircuitOpenError as e:
+            raise self._unavailable_error(e)
+
+        except (openai.error.RateLimitError, ConcurrencyLimitExceeded) as e:
+            raise self._rate_limit_error(e)
+
+        except openai.error.APIError as e:
+            logger.error("OpenAI API Error: %s", e)
+            raise APIError(detail=f"OpenAI API Error: {e}", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        except Exception as e:
+            logger.error("Unexpected Error: %s", e)
+            raise APIError(detail=f"Internal Server Error", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    async def _complete(self, request_data: Dict[str, Any], cache_ttl: Optional[int]) -> str:
+        """
+        Sends a completion request to the OpenAI API and caches the response text for `cache_ttl` seconds.
+        Nothing is cached when `cache_ttl` is None.
+        """
+        params = self._completion_params(request_data)
+        if self.batcher is not None:
+            response_text = (await self.batcher.submit(params)).strip()
+        else:
+            response = await self._send_completion(params)
             # Extract the response text
             response_text = response.choices[0].text.strip()
 
-            # Cache the response
-            await cache_handler.set(request_data, response_text)
+        # Cache the response
+        if cache_ttl is not None:
+            await cache_handler.set(request_data, response_text, ttl=cache_ttl)
+            self._index_similar(request_data)
+
+        return response_text
+
+    async def _send_completion(self, params: Dict[str, Any]):
+        """
+        Sends a completion call to the OpenAI API. `params["prompt"]` may be a list of prompts.
+        Transient failures are retried, and slow calls hedged when enabled, behind the circuit breaker of the model.
+        """
+        async with self._guarded(params["engine"]):
+            return await self.resilience.call(params["engine"], lambda: self._send_attempt(params))
+
+    async def _send_attempt(self, params: Dict[str, Any]):
+        """
+        Sends one attempt of a completion call, within a concurrency slot of its model.
+        """
+        await self._use_session()
+        async with self._upstream_slot(params["engine"]):
+            async with self._timed(params["engine"], "completion"):
+                response = await openai.Completion.acreate(**params)
+        record_usage(params["engine"], response.get("usage"))
+        return response
+
+    @asynccontextmanager
+    async def _timed(self, model: str, operation: str):
+        """
+        Records the latency and outcome of an upstream call in the OPENAI_REQUEST_DURATION histogram.
+        """
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "success"
+        finally:
+            OPENAI_REQUEST_DURATION.labels(model_label(model), operation, outcome).observe(time.perf_counter() - started)
+
+    async def stream_request(self, request_data: Dict[str, Any], user_settings: Optional[SettingsModel] = None) -> AsyncIterator[str]:
+        """
+        Streams the response for a user request from the OpenAI API as it is generated.
+
+        The full text is cached once the stream has run to completion; an interrupted stream is not cached.
+
+        Args:
+            request_data (Dict[str, Any]): Data containing the prompt, model selection, and parameters.
+            user_settings (Optional[SettingsModel]): Settings of the requesting user, applied as in process_request.
+
+        Yields:
+            str: Text fragments in the order OpenAI produces them. A cached response is yielded as a single fragment.
+
+        Raises:
+            RateLimitError: If OpenAI rate limited the call, or no upstream slot became free in time.
+            ServiceUnavailableError: If the circuit of the model is open.
+            APIError: If an error occurs during the OpenAI API call.
+        """
+        cache_enabled, cache_ttl = self._cache_policy(user_settings)
 
-            # Return the response text
-            return response_text
+        # Check if the response is cached
+        if cache_enabled:
+            cached_response = await cache_handler.get(request_data, max_age=cache_ttl)
+            if not cached_response:
+                cached_response = await self._similar_cached_response(request_data, cache_ttl)
+            if cached_response:
+                logger.info("Using cached response.")
+                yield cached_response
+                return
+
+        fragments = []
+        try:
+            await self._use_session()
+            params = self._completion_params(request_data)
+            # The slot is held until the stream ends; its duration depends on the reader, so it is not a latency sample
+            async with self._guarded(params["engine"]), self._upstream_slot(params["engine"], sample_latency=False):
+                async with self._timed(params["engine"], "stream"):
+                    stream = await openai.Completion.acreate(**params, stream=True)
+                async for chunk in stream:
+                    fragment = chunk.choices[0].text
+                    if fragment:
+                        fragments.append(fragment)
+                        yield fragment
+
+        except CircuitOpenError as e:
+            raise self._unavailable_error(e)
+
+        except (openai.error.RateLimitError, ConcurrencyLimitExceeded) as e:
+            raise self._rate_limit_error(e)
 
         except openai.error.APIError as e:
-            logger.error(f"OpenAI API Error: {e}")
+            logger.error("OpenAI API Error: %s", e)
             raise APIError(detail=f"OpenAI API Error: {e}", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         except Exception as e:
-            logger.error(f"Unexpected Error: {e}")
+            logger.error("Unexpected Error: %s", e)
             raise APIError(detail=f"Internal Server Error", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        # Cache the complete response
+        if cache_enabled:
+            await cache_handler.set(request_data, "".join(fragments).strip(), ttl=cache_ttl)
+            self._index_similar(request_data)
+
+    async def list_models(self) -> List[Dict[str, Any]]:
+        """
+        Fetches the available models from the OpenAI API.
+        """
+        await self._use_session()
+        models = await openai.Model.alist()
+        return models.data
+
+    async def retrieve_model(self, model_id: str) -> Dict[str, Any]:
+        """
+        Fetches one model from the OpenAI API.
+
+        Raises:
+            ModelNotFound: If the model does not exist.
+        """
+        await self._use_session()
+        try:
+            return await openai.Model.aretrieve(model_id, request_timeout=settings.OPENAI_REQUEST_TIMEOUT)
+        except openai.error.OpenAIError as e:
+            if _is_not_found(e):
+                raise ModelNotFound(model_id)
+            raise
+
     async def get_available_models(self) -> Optional[Dict[str, Any]]:
         """
-        Fetches available OpenAI models.
+        Fetches available OpenAI models, from the model catalog once it is loaded.
 
         Returns:
             Optional[Dict[str, Any]]: A dictionary of available models.
         """
+        if model_catalog.loaded:
+            return model_catalog.models()
         try:
-            models = openai.Model.list()
-            return models.data
+            return await self.list_models()
         except openai.error.APIError as e:
-            logger.error(f"OpenAI API Error: {e}")
+            logger.error("OpenAI API Error: %s", e)
             raise APIError(detail=f"OpenAI API Error: {e}", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         except Exception as e:
-            logger.error(f"Unexpected Error: {e}")
+            logger.error("Unexpected Error: %s", e)
             raise APIError(detail=f"Internal Server Error", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     async def get_model_details(self, model_id: str) -> Optional[Dict[str, Any]]:
         """
-        Retrieves details for a specific OpenAI model.
+        Retrieves details for a specific OpenAI model. Models in the catalog and ids recently found
+        missing are answered without calling the API.
 
         Args:
             model_id (str): The ID of the OpenAI model.
 
         Returns:
-            Optional[Dict[str, Any]]: A dictionary containing model details.
+            Optional[Dict[str, Any]]: The model object as returned by the API, e.g. {"id": ..., "object": "model",
+                "owned_by": ...}; the same shape as the entries of get_available_models.
         """
         try:
-            model_details = openai.Model.retrieve(model_id)
-            return model_details.data
-        except openai.error.APIError as e:
-            if e.code == "not_found":
-                logger.warning(f"OpenAI Model not found: {model_id}")
-                raise NotFoundError(detail=f"OpenAI Model not found: {model_id}")
+            if model_catalog.loaded:
+                model_details = await model_catalog.lookup(model_id)
             else:
-                logger.error(f"OpenAI API Error: {e}")
-                raise APIError(detail=f"OpenAI API Error: {e}", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                model_details = await self.retrieve_model(model_id)
+        except ModelNotFound:
+            model_details = None
+        except openai.error.APIError as e:
+            logger.error("OpenAI API Error: %s", e)
+            raise APIError(detail=f"OpenAI API Error: {e}", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         except Exception as e:
-            logger.error(f"Unexpected Error: {e}")
+            logger.error("Unexpected Error: %s", e)
             raise APIError(detail=f"Internal Server Error", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        if model_details is None:
+            logger.warning("OpenAI Model not found: %s", model_id)
+            raise NotFoundError(detail=f"OpenAI Model not found: {model_id}")
+        return model_details
+
 openai_service = OpenAIService()
\ No newline at end of file
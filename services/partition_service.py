@@ -0,0 +1,237 @@
+import io
+import json
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import zstandard
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from ..database import SessionLocal
+from ..utils.config import settings
+from ..utils.logger import logger
+from .export_service import encode_ndjson, stream_request_rows
+
+# Monthly partitions of the requests table are named requests_yYYYYmMM
+PARTITION_PATTERN = re.compile(r"^requests_y(\d{4})m(\d{2})$")
+ARCHIVE_PATTERN = re.compile(r"^requests-(\d{4})-(\d{2})\.jsonl\.zst$")
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def month_start(moment: datetime) -> date:
+    return date(moment.year, moment.month, 1)
+
+def partition_name(month: date) -> str:
+    return f"requests_y{month.year:04d}m{month.month:02d}"
+
+def archive_filename(month: date) -> str:
+    return f"requests-{month.year:04d}-{month.month:02d}.jsonl.zst"
+
+def _timestamp(month: date) -> str:
+    return f"{month.isoformat()} 00:00:00+00"
+
+def _month_datetime(month: date) -> datetime:
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+def _as_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    if moment is not None and moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+async def ensure_partitions(engine: AsyncEngine, months_ahead: Optional[int] = None):
+    """
+    Creates the monthly partitions of the requests table from the current month up to `months_ahead`
+    months ahead, plus a default partition for rows outside them. Does nothing on databases other than PostgreSQL.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    months_ahead = settings.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    current = month_start(datetime.now(timezone.utc))
+    async with engine.begin() as connection:
+        await connection.execute(text("CREATE TABLE IF NOT EXISTS requests_default PARTITION OF requests DEFAULT"))
+        for offset in range(months_ahead + 1):
+            await _create_partition(connection, add_months(current, offset))
+
+async def _create_partition(connection: AsyncConnection, month: date):
+    """
+    Creates the partition of one month, if it does not exist yet.
+
+    PostgreSQL refuses to create a partition while the default partition holds rows in its range, e.g.
+    rows written before the partition was created. Those rows are moved out of the default partition
+    first and inserted back once the partition exists, in the caller's transaction.
+    """
+    name = partition_name(month)
+    if (await connection.execute(text("SELECT to_regclass(:name)"), {"name": name})).scalar() is not None:
+        return
+    start, end = _timestamp(month), _timestamp(add_months(month, 1))
+    in_month = f"created_at >= '{start}' AND created_at < '{end}'"
+    # Blocks writes to the default partition until commit, so no row of the month lands there meanwhile
+    await connection.execute(text("LOCK TABLE requests_default IN SHARE ROW EXCLUSIVE MODE"))
+    moved = (await connection.execute(text(f"SELECT count(*) FROM requests_default WHERE {in_month}"))).scalar()
+    if moved:
+        await connection.execute(text("CREATE TEMPORARY TABLE requests_moving (LIKE requests)"))
+        await connection.execute(text(
+            f"WITH moved AS (DELETE FROM requests_default WHERE {in_month} RETURNING *) "
+            "INSERT INTO requests_moving SELECT * FROM moved"
+        ))
+    await connection.execute(text(f"CREATE TABLE {name} PARTITION OF requests FOR VALUES FROM ('{start}') TO ('{end}')"))
+    if moved:
+        await connection.execute(text("INSERT INTO requests SELECT * FROM requests_moving"))
+        await connection.execute(text("DROP TABLE requests_moving"))
+        logger.info("Moved %s rows of %s from the default partition to %s.", moved, month.strftime("%Y-%m"), name)
+
+async def list_partitions(engine: AsyncEngine) -> List[date]:
+    """
+    Returns the months of the existing monthly partitions, oldest first.
+    """
+    async with engine.connect() as connection:
+        result = await connection.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = 'requests'"
+        ))
+        months = []
+        for (name,) in result:
+            match = PARTITION_PATTERN.match(name)
+            if match:
+                months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+async def _write_archive(month: date, path: str) -> int:
+    """
+    Writes the rows of one month to a zstd-compressed JSONL file, atomically.
+
+    Returns:
+        int: The number of rows written.
+    """
+    rows = 0
+
+    async def counted(batches):
+        nonlocal rows
+        async for batch in batches:
+            rows += len(batch)
+            yield batch
+
+    tmp_path = path + ".tmp"
+    compressor = zstandard.ZstdCompressor(level=settings.ARCHIVE_COMPRESSION_LEVEL)
+    async with SessionLocal() as db:
+        batches = stream_request_rows(db, created_after=_month_datetime(month), created_before=_month_datetime(add_months(month, 1)))
+        with open(tmp_path, "wb") as archive_file:
+            with compressor.stream_writer(archive_file, closefd=False) as writer:
+                async for chunk in encode_ndjson(counted(batches)):
+                    writer.write(chunk)
+            archive_file.flush()
+            os.fsync(archive_file.fileno())
+    os.replace(tmp_path, path)
+    return rows
+
+async def archive_partitions(engine: AsyncEngine, older_than_months: Optional[int] = None,
+                             archive_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Moves monthly partitions older than `older_than_months` months into archive files and drops them.
+
+    Each partition is first written to `requests-YYYY-MM.jsonl.zst` in `archive_path`. It is then
+    detached and dropped in a transaction that locks it against writes and checks its row count
+    against the archive, so rows inserted while archiving are never lost; such a partition is left
+    in place for the next run.
+
+    Returns:
+        List[Dict[str, Any]]: The month, file and row count of every archived partition.
+
+    Raises:
+        RuntimeError: If the database is not PostgreSQL.
+    """
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("Partition archival requires PostgreSQL.")
+    older_than_months = settings.ARCHIVE_AFTER_MONTHS if older_than_months is None else older_than_months
+    archive_path = archive_path or settings.ARCHIVE_PATH
+    os.makedirs(archive_path, exist_ok=True)
+    cutoff = add_months(month_start(datetime.now(timezone.utc)), -older_than_months)
+
+    archived = []
+    for month in await list_partitions(engine):
+        if month >= cutoff:
+            continue
+        name = partition_name(month)
+        path = os.path.join(archive_path, archive_filename(month))
+        rows = await _write_archive(month, path)
+        async with engine.begin() as connection:
+            await connection.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+            current_rows = (await connection.execute(text(f"SELECT count(*) FROM {name}"))).scalar()
+            if current_rows != rows:
+                logger.warning("Partition %s changed while archiving (%s archived, %s now); keeping it.", name, rows, current_rows)
+                continue
+            await connection.execute(text(f"ALTER TABLE requests DETACH PARTITION {name}"))
+            await connection.execute(text(f"DROP TABLE {name}"))
+        logger.info("Archived partition %s: %s rows to %s.", name, rows, path)
+        archived.append({"month": month.isoformat(), "path": path, "rows": rows})
+    return archived
+
+class ArchiveReader:
+    """
+    Read-only access to archived request rows.
+
+    Archive files hold one month each, so queries only decompress the months that overlap their time range.
+
+    Args:
+        archive_path (Optional[str]): Directory of the archive files. Defaults to settings.ARCHIVE_PATH.
+    """
+
+    def __init__(self, archive_path: Optional[str] = None):
+        self.archive_path = archive_path or settings.ARCHIVE_PATH
+
+    def months(self) -> List[date]:
+        """
+        Returns the archived months, oldest first.
+        """
+        if not os.path.isdir(self.archive_path):
+            return []
+        months = []
+        for filename in os.listdir(self.archive_path):
+            match = ARCHIVE_PATTERN.match(filename)
+            if match:
+                months.append(date(int(match.group(1)), int(match.group(2)), 1))
+        return sorted(months)
+
+    def iter_requests(self, user_id: Optional[str] = None, model: Optional[str] = None, status: Optional[str] = None,
+                      created_after: Optional[datetime] = None, created_before: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yields archived request rows oldest first, filtered like db_service.list_requests.
+        Time bounds without a timezone are taken as UTC.
+
+        Yields:
+            Dict[str, Any]: Rows keyed by column name, with `created_at` as a datetime.
+        """
+        created_after = _as_utc(created_after)
+        created_before = _as_utc(created_before)
+        for month in self.months():
+            if created_after is not None and _month_datetime(add_months(month, 1)) <= created_after:
+                continue
+            if created_before is not None and _month_datetime(month) >= created_before:
+                continue
+            for row in self._read(month):
+                if user_id is not None and row["user_id"] != user_id:
+                    continue
+                if model is not None and row["model"] != model:
+                    continue
+                if status is not None and row["status"] != status:
+                    continue
+                if created_after is not None and row["created_at"] < created_after:
+                    continue
+                if created_before is not None and row["created_at"] >= created_before:
+                    continue
+                yield row
+
+    def _read(self, month: date) -> Iterator[Dict[str, Any]]:
+        decompressor = zstandard.ZstdDecompressor()
+        with open(os.path.join(self.archive_path, archive_filename(month)), "rb") as archive_file:
+            with decompressor.stream_reader(archive_file) as reader:
+                for line in io.TextIOWrapper(reader, encoding="utf-8"):
+                    row = json.loads(line)
+                    row["created_at"] = _as_utc(datetime.fromisoformat(row["created_at"]))
+                    yield row
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import JSON, Table, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ..database import SessionLocal
+from ..models import RequestModel
+from ..utils.config import settings
+from ..utils.logger import logger
+
+# Marks the end of the queue when the writer is closed
+_STOP = object()
+
+class WriteBehindQueue:
+    """
+    Buffers rows in memory and writes them to a table in batches from a background task.
+
+    A batch is flushed once `batch_size` rows have accumulated or `flush_interval_ms` has passed since
+    the first row of the batch arrived. Batches are written as one multi-row INSERT, or with COPY when
+    `use_copy` is set and the database is PostgreSQL on asyncpg. Rows of a batch that fails to write
+    are logged and dropped. `close` flushes everything still queued.
+
+    Args:
+        table (Table): The table rows are written to. Rows are dicts of its column values.
+        session_factory (async_sessionmaker): Opens the sessions used for flushing.
+        batch_size (int): Maximum number of rows per flush.
+        flush_interval_ms (float): Maximum time a row waits before its batch is flushed.
+        max_queue_size (int): Number of queued rows at which `enqueue` waits for a flush.
+        use_copy (bool): Write batches with PostgreSQL COPY instead of INSERT where supported.
+    """
+
+    def __init__(self, table: Table, session_factory: async_sessionmaker, batch_size: int = 500,
+                 flush_interval_ms: float = 200, max_queue_size: int = 100000, use_copy: bool = False):
+        self.table = table
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.use_copy = use_copy
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.counters = {"rows_written": 0, "rows_failed": 0, "flushes": 0}
+        self._flush_seconds_total = 0.0
+        self._flush_seconds_last = 0.0
+        self._flush_seconds_max = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    async def start(self):
+        """
+        Starts the background flush task.
+        """
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """
+        Stops accepting rows and waits until every queued row has been flushed.
+        """
+        if self._task is None:
+            return
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def enqueue(self, row: Dict[str, Any]):
+        """
+        Queues a row for writing. Waits while the queue is full, so a slow database slows callers
+        down instead of growing memory without bound.
+
+        Raises:
+            RuntimeError: If the writer is not running.
+        """
+        if not self.running:
+            raise RuntimeError("Write-behind queue is not running.")
+        await self._queue.put(row)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+            rows = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(rows) < self.batch_size:
+                try:
+                    row = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        row = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if row is _STOP:
+                    stopping = True
+                    break
+                rows.append(row)
+            await self._flush(rows)
+
+    async def _flush(self, rows: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        try:
+            async with self.session_factory() as db:
+                if self.use_copy and db.bind.dialect.driver == "asyncpg":
+                    await self._copy(db, rows)
+                else:
+                    await db.execute(insert(self.table).values(rows))
+                await db.commit()
+            self.counters["rows_written"] += len(rows)
+        except Exception as e:
+            logger.error("Error writing %s rows to %s: %s", len(rows), self.table.name, e)
+            self.counters["rows_failed"] += len(rows)
+        elapsed = time.perf_counter() - started
+        self.counters["flushes"] += 1
+        self._flush_seconds_total += elapsed
+        self._flush_seconds_last = elapsed
+        self._flush_seconds_max = max(self._flush_seconds_max, elapsed)
+
+    async def _copy(self, db: AsyncSession, rows: List[Dict[str, Any]]):
+        """
+        Writes rows with the COPY protocol of asyncpg. JSON columns are sent as encoded text.
+        """
+        columns = list(rows[0])
+        json_columns = {column for column in columns if isinstance(self.table.c[column].type, JSON)}
+        records = [
+            tuple(json.dumps(row[column]) if column in json_columns and row[column] is not None else row[column] for column in columns)
+            for row in rows
+        ]
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(self.table.name, records=records, columns=columns)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the queue depth, row and flush counts, and flush latency in milliseconds.
+        """
+        flushes = self.counters["flushes"]
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            **self.counters,
+            "flush_ms_last": round(self._flush_seconds_last * 1000, 3),
+            "flush_ms_avg": round(self._flush_seconds_total / flushes * 1000, 3) if flushes else 0.0,
+            "flush_ms_max": round(self._flush_seconds_max * 1000, 3),
+        }
+
+request_writer = WriteBehindQueue(
+    RequestModel.__table__,
+    SessionLocal,
+    batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+    flush_interval_ms=settings.WRITE_BEHIND_FLUSH_INTERVAL_MS,
+    max_queue_size=settings.WRITE_BEHIND_MAX_QUEUE_SIZE,
+    use_copy=settings.WRITE_BEHIND_USE_COPY,
+)
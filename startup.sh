@@ -14,5 +14,12 @@ if [ -z "$DATABASE_URL" ]; then
   exit 1
 fi
 
+# The application modules use relative imports, so they run as a package from the parent directory
+PACKAGE=$(basename "$PWD")
+cd .. || exit 1
+
+# Create the database tables and upcoming partitions
+python -m "$PACKAGE.cli.migrate" || exit 1
+
 # Start the application server using uvicorn
-uvicorn main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+exec uvicorn "$PACKAGE.main:app" --host 0.0.0.0 --port 8000
@@ -0,0 +1,76 @@
+import json
+import pytest
+
+from ..cli.batch_runner import Checkpoint, is_final
+
+# Test that the watermark advances over contiguous results and out-of-order results are kept above it
+def test_checkpoint_mark_done_advances_watermark(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "out.checkpoint"))
+    for index in (0, 2, 3, 5):
+        checkpoint.mark_done(index)
+    assert checkpoint.watermark == 1
+    assert checkpoint.completed == {2, 3, 5}
+    checkpoint.mark_done(1)
+    assert checkpoint.watermark == 4
+    assert checkpoint.completed == {5}
+    assert checkpoint.is_done(3) and checkpoint.is_done(5) and not checkpoint.is_done(4)
+
+# Test that a saved checkpoint loads back unchanged
+def test_checkpoint_save_and_load(tmp_path):
+    path = str(tmp_path / "out.checkpoint")
+    checkpoint = Checkpoint(path)
+    for index in (0, 1, 4):
+        checkpoint.mark_done(index)
+    checkpoint.save(output_bytes=123)
+
+    loaded = Checkpoint.load(path)
+    assert loaded.watermark == 2
+    assert loaded.completed == {4}
+    assert loaded.output_bytes == 123
+
+# Test that transient failures are listed for the next run without holding the watermark back
+def test_checkpoint_mark_retry_advances_watermark(tmp_path):
+    path = str(tmp_path / "out.checkpoint")
+    checkpoint = Checkpoint(path)
+    checkpoint.mark_retry(0)
+    for index in range(1, 1000):
+        checkpoint.mark_done(index)
+    assert checkpoint.watermark == 1000
+    assert checkpoint.completed == set()
+    assert checkpoint.retry == {0}
+    assert not checkpoint.is_done(0) and checkpoint.is_done(1)
+    checkpoint.save(output_bytes=0)
+
+    # The next run sends the line again; a success settles it, another transient failure keeps it listed
+    resumed = Checkpoint.load(path)
+    assert resumed.retry == {0}
+    resumed.mark_retry(0)
+    assert resumed.retry == {0} and resumed.completed == set()
+    resumed.mark_done(0)
+    assert resumed.retry == set() and resumed.completed == set()
+    assert resumed.is_done(0) and resumed.watermark == 1000
+
+# Test that recovery marks results written after the last checkpoint and drops a torn last line
+def test_checkpoint_recover_from_output_tail(tmp_path):
+    output_path = tmp_path / "out.jsonl"
+    checkpointed = json.dumps({"index": 0, "status": "ok", "response": "a"}) + "\n"
+    after_checkpoint = json.dumps({"index": 2, "status": "ok", "response": "c"}) + "\n"
+    output_path.write_bytes((checkpointed + after_checkpoint + '{"index": 1, "sta').encode())
+
+    checkpoint = Checkpoint(str(tmp_path / "out.checkpoint"), watermark=1, output_bytes=len(checkpointed))
+    assert checkpoint.recover(str(output_path)) == 1
+    assert checkpoint.is_done(2) and not checkpoint.is_done(1)
+    assert output_path.read_bytes() == (checkpointed + after_checkpoint).encode()
+
+# Test that recovery is a no-op when there is no output yet
+def test_checkpoint_recover_without_output(tmp_path):
+    checkpoint = Checkpoint(str(tmp_path / "out.checkpoint"))
+    assert checkpoint.recover(str(tmp_path / "missing.jsonl")) == 0
+    assert checkpoint.watermark == 0
+
+# Test that only successes and errors that would fail again are checkpointed
+def test_is_final_skips_transient_errors():
+    assert is_final({"index": 0, "status": "success", "response": "a"})
+    assert is_final({"index": 1, "status": "error", "status_code": 422, "detail": "Invalid JSON"})
+    assert not is_final({"index": 2, "status": "error", "status_code": 429, "detail": "Too many requests."})
+    assert not is_final({"index": 3, "status": "error", "status_code": 503, "detail": "Service unavailable."})
@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+
+from ..services.batch_service import iter_ndjson_lines, map_unordered
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+async def _collect(iterator):
+    return [item async for item in iterator]
+
+# Test case for splitting lines across chunk boundaries and numbering them by position
+@pytest.mark.asyncio
+async def test_iter_ndjson_lines_splits_chunks():
+    lines = await _collect(iter_ndjson_lines(_chunks(b'{"prompt": "a"}\n{"pro', b'mpt": "b"}\n\n{"prompt": "c"}'), 1024))
+    assert lines == [(0, b'{"prompt": "a"}'), (1, b'{"prompt": "b"}'), (3, b'{"prompt": "c"}')]
+
+# Test case for skipping lines longer than the limit without buffering them
+@pytest.mark.asyncio
+async def test_iter_ndjson_lines_skips_oversized_lines():
+    lines = await _collect(iter_ndjson_lines(_chunks(b"x" * 10, b"x" * 10, b"\nshort\n"), 16))
+    assert lines == [(0, None), (1, b"short")]
+
+# Test case for splitting many lines out of one chunk and carrying only the remainder over
+@pytest.mark.asyncio
+async def test_iter_ndjson_lines_many_lines_per_chunk():
+    chunk = b"".join(b"line %d\n" % i for i in range(1000)) + b"line 1000, cut"
+    lines = await _collect(iter_ndjson_lines(_chunks(chunk, b" here\n" + b"x" * 40, b"\nend"), 32))
+    assert lines[:3] == [(0, b"line 0"), (1, b"line 1"), (2, b"line 2")]
+    assert lines[-3:] == [(1000, b"line 1000, cut here"), (1001, None), (1002, b"end")]
+    assert len(lines) == 1003
+
+# Test case for keeping at most `concurrency` calls in flight
+@pytest.mark.asyncio
+async def test_map_unordered_bounds_concurrency():
+    in_flight = peak = 0
+
+    async def worker(item):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001 * (item % 3))
+        in_flight -= 1
+        return item * 2
+
+    async def items():
+        for i in range(50):
+            yield i
+
+    results = await _collect(map_unordered(items(), worker, concurrency=4))
+    assert sorted(results) == [i * 2 for i in range(50)]
+    assert peak == 4
+
+# Test case for yielding results in completion order rather than input order
+@pytest.mark.asyncio
+async def test_map_unordered_yields_in_completion_order():
+    async def worker(item):
+        await asyncio.sleep(item / 100)
+        return item
+
+    results = await _collect(map_unordered(_chunks(3, 1, 2), worker, concurrency=3))
+    assert results == [1, 2, 3]
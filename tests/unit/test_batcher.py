@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+
+from ..services.batcher import CompletionBatcher
+
+PARAMS = {"engine": "text-davinci-003", "temperature": 0.7, "max_tokens": None}
+
+class FakeUpstream:
+    """Records upstream calls and answers each prompt with its upper-cased text, in reverse order."""
+
+    def __init__(self, error: Exception = None):
+        self.calls = []
+        self.error = error
+
+    async def send(self, params):
+        self.calls.append(params)
+        await asyncio.sleep(0)
+        if self.error:
+            raise self.error
+        prompts = params["prompt"] if isinstance(params["prompt"], list) else [params["prompt"]]
+        choices = [SimpleNamespace(index=index, text=prompt.upper()) for index, prompt in enumerate(prompts)]
+        return SimpleNamespace(choices=list(reversed(choices)))
+
+# Test case for sending concurrent calls with the same parameters as one multi-prompt request
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_batched():
+    upstream = FakeUpstream()
+    batcher = CompletionBatcher(upstream.send, window_ms=5, max_batch_size=20)
+    results = await asyncio.gather(*(batcher.submit({**PARAMS, "prompt": f"prompt {i}"}) for i in range(5)))
+    assert results == [f"PROMPT {i}" for i in range(5)]
+    assert len(upstream.calls) == 1
+    assert upstream.calls[0]["prompt"] == [f"prompt {i}" for i in range(5)]
+
+# Test case for keeping calls with different sampling parameters in separate batches
+@pytest.mark.asyncio
+async def test_different_parameters_are_not_batched():
+    upstream = FakeUpstream()
+    batcher = CompletionBatcher(upstream.send, window_ms=5)
+    await asyncio.gather(
+        batcher.submit({**PARAMS, "prompt": "a"}),
+        batcher.submit({**PARAMS, "temperature": 0.0, "prompt": "b"}),
+    )
+    assert len(upstream.calls) == 2
+    assert all(isinstance(call["prompt"], str) for call in upstream.calls)
+
+# Test case for sending a batch as soon as it reaches the maximum size
+@pytest.mark.asyncio
+async def test_batch_is_sent_at_max_size():
+    upstream = FakeUpstream()
+    batcher = CompletionBatcher(upstream.send, window_ms=60000, max_batch_size=3)
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit({**PARAMS, "prompt": str(i)}) for i in range(6))), timeout=1
+    )
+    assert results == [str(i) for i in range(6)]
+    assert batcher.stats() == {"batches_sent": 2, "prompts_sent": 6, "collecting": 0}
+
+# Test case for propagating an upstream error to every caller in the batch
+@pytest.mark.asyncio
+async def test_error_is_propagated_to_batch():
+    batcher = CompletionBatcher(FakeUpstream(error=ValueError("upstream failed")).send, window_ms=5)
+    results = await asyncio.gather(
+        *(batcher.submit({**PARAMS, "prompt": str(i)}) for i in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+
+# Test case for leaving cancelled callers out of the upstream request
+@pytest.mark.asyncio
+async def test_cancelled_caller_is_not_sent():
+    upstream = FakeUpstream()
+    batcher = CompletionBatcher(upstream.send, window_ms=20)
+    cancelled = asyncio.ensure_future(batcher.submit({**PARAMS, "prompt": "cancelled"}))
+    kept = asyncio.ensure_future(batcher.submit({**PARAMS, "prompt": "kept"}))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    assert await kept == "KEPT"
+    assert upstream.calls[0]["prompt"] == "kept"
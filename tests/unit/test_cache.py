@@ -0,0 +1,141 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+
+from ..utils.cache import CacheHandler, LRUCache, make_cache_key
+
+REQUEST_DATA = {
+    "prompt": "Write a short story about a dog and a cat.",
+    "model": "text-davinci-003",
+    "temperature": 0.7
+}
+
+class FakeBackend:
+    """Shared cache backend kept in a dict."""
+
+    def __init__(self):
+        self.entries = {}
+
+    async def init(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def get(self, key):
+        return self.entries.get(key)
+
+    async def set(self, key, value, ttl):
+        self.entries[key] = value
+
+# Test case for the cache key ignoring fields that do not affect the completion
+def test_cache_key_ignores_unrelated_fields():
+    assert make_cache_key(REQUEST_DATA) == make_cache_key({**REQUEST_DATA, "stream": True})
+    assert make_cache_key(REQUEST_DATA) != make_cache_key({**REQUEST_DATA, "temperature": 0.0})
+
+# Test case for evicting the least recently used entry when the size bound is reached
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_bytes=10**9)
+    cache.set("a", "x" * 100, ttl=60)
+    cache.set("b", "x" * 100, ttl=60)
+    cache.max_bytes = cache.size_bytes
+    cache.get("a")
+    cache.set("c", "x" * 100, ttl=60)
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.size_bytes <= cache.max_bytes
+
+# Test case for expiring entries after their TTL and rejecting entries older than a reader's max age
+def test_lru_expiration_and_max_age():
+    cache = LRUCache(max_bytes=10**6)
+    cache.set("a", "value", ttl=60, created_at=time.time() - 30)
+    assert cache.get("a") == "value"
+    assert cache.get("a", max_age=10) is None
+    cache.set("b", "value", ttl=1, created_at=time.time() - 2)
+    assert cache.get("b") is None
+    assert len(cache) == 1
+
+# Test case for falling through to L2 and promoting the entry to L1
+@pytest.mark.asyncio
+async def test_handler_falls_through_to_l2():
+    backend = FakeBackend()
+    writer = CacheHandler(backend=backend, l1_max_bytes=10**6)
+    await writer.set(REQUEST_DATA, "response", ttl=60)
+
+    reader = CacheHandler(backend=backend, l1_max_bytes=10**6)
+    assert await reader.get(REQUEST_DATA) == "response"
+    assert await reader.get(REQUEST_DATA) == "response"
+    stats = reader.stats()
+    assert stats["l1"]["hits"] == 1 and stats["l1"]["misses"] == 1
+    assert stats["l2"]["hits"] == 1 and stats["l2"]["misses"] == 0
+
+# Test case for applying a reader's max age to L2 entries
+@pytest.mark.asyncio
+async def test_handler_applies_max_age_to_l2():
+    backend = FakeBackend()
+    writer = CacheHandler(backend=backend, l1_max_bytes=10**6)
+    with patch("time.time", return_value=time.time() - 120):
+        await writer.set(REQUEST_DATA, "response", ttl=3600)
+
+    reader = CacheHandler(backend=backend, l1_max_bytes=10**6)
+    assert await reader.get(REQUEST_DATA, max_age=60) is None
+    assert await reader.get(REQUEST_DATA, max_age=600) == "response"
+
+# Test case for serving entries past their soft TTL only to readers accepting stale entries, up to the hard TTL
+def test_lru_stale_lookup():
+    cache = LRUCache(max_bytes=10**6)
+    cache.set("a", "value", ttl=60, created_at=time.time() - 90, stale_ttl=60)
+    assert cache.get("a") is None
+    value, staleness = cache.lookup("a", max_stale=60)
+    assert value == "value" and 29 < staleness < 31
+    assert cache.lookup("a", max_stale=10) == (None, 0.0)
+    assert cache.lookup("a", max_age=10, max_stale=60) == (None, 0.0)
+    cache.set("b", "value", ttl=60, created_at=time.time() - 130, stale_ttl=60)
+    assert cache.lookup("b", max_stale=3600) == (None, 0.0)
+    assert len(cache) == 1
+
+# Test case for keeping stale entries in L2 until their hard TTL
+@pytest.mark.asyncio
+async def test_handler_stale_lookup_from_l2():
+    backend = FakeBackend()
+    writer = CacheHandler(backend=backend, l1_max_bytes=10**6, stale_ttl=600)
+    with patch("time.time", return_value=time.time() - 120):
+        await writer.set(REQUEST_DATA, "response", ttl=60)
+
+    reader = CacheHandler(backend=backend, l1_max_bytes=10**6, stale_ttl=600)
+    assert await reader.get(REQUEST_DATA) is None
+    value, staleness = await reader.lookup(REQUEST_DATA, max_stale=600)
+    assert value == "response" and 59 < staleness < 61
+    # Promoted to L1 with its original lifetimes
+    assert reader.l1.lookup(make_cache_key(REQUEST_DATA), max_stale=600)[0] == "response"
+
+# Test case for treating a corrupt L2 entry as a miss
+@pytest.mark.asyncio
+async def test_handler_corrupt_l2_entry_is_a_miss():
+    backend = FakeBackend()
+    handler = CacheHandler(backend=backend, l1_max_bytes=10**6)
+    backend.entries[make_cache_key(REQUEST_DATA)] = '{"value": "truncat'
+    assert await handler.lookup(REQUEST_DATA) == (None, 0.0)
+    backend.entries[make_cache_key(REQUEST_DATA)] = '{"value": "response"}'
+    assert await handler.get(REQUEST_DATA) is None
+    assert handler.stats()["l2"]["misses"] == 2
+
+# Test case for opening the shared backend once, on its first use
+@pytest.mark.asyncio
+async def test_handler_opens_backend_on_first_use():
+    backend = FakeBackend()
+    opened = []
+
+    async def init():
+        await asyncio.sleep(0.01)
+        opened.append(True)
+
+    backend.init = init
+    handler = CacheHandler(backend=backend, l1_max_bytes=10**6)
+    await asyncio.gather(*(handler.lookup(REQUEST_DATA) for _ in range(5)))
+    await handler.set(REQUEST_DATA, "cached response")
+    assert opened == [True]
+    await handler.close()
+    await handler.lookup({**REQUEST_DATA, "temperature": 0.0})
+    assert opened == [True, True]
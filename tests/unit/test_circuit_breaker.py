@@ -0,0 +1,57 @@
+import time
+import pytest
+from unittest.mock import patch
+
+from ..utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+def open_breaker(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record_failure()
+
+# Test case for opening the circuit after consecutive failures only
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats() == {"state": OPEN, "consecutive_failures": 3, "opened": 1, "rejected": 1}
+
+# Test case for letting a single probe through once the reset timeout has passed
+def test_half_open_allows_one_probe():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+    assert 0 < breaker.retry_after() <= 30
+    with patch("time.monotonic", return_value=time.monotonic() + 31):
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+# Test case for reopening the circuit when the probe fails
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    open_breaker(breaker)
+    later = time.monotonic() + 31
+    with patch("time.monotonic", return_value=later):
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.stats()["opened"] == 2
+
+# Test case for freeing the probe slot when the probe ends without a verdict
+def test_released_probe_allows_another():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    open_breaker(breaker)
+    with patch("time.monotonic", return_value=time.monotonic() + 31):
+        assert breaker.allow()
+        breaker.release()
+        assert breaker.allow()
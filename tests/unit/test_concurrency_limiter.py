@@ -0,0 +1,177 @@
+import asyncio
+import pytest
+
+from ..utils.concurrency_limiter import AdaptiveConcurrencyLimiter, ConcurrencyLimitExceeded
+
+MODEL = "text-davinci-003"
+
+class Overloaded(Exception):
+    pass
+
+class StubUpstream:
+    """
+    In-process upstream that rejects calls beyond `capacity` concurrent ones, like a 429 rate limit.
+    """
+
+    def __init__(self, capacity: int, latency: float = 0.01):
+        self.capacity = capacity
+        self.latency = latency
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.rejected = 0
+
+    async def call(self):
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            # A rejection also takes a round trip to arrive
+            await asyncio.sleep(0.001)
+            raise Overloaded()
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+def make_limiter(**options) -> AdaptiveConcurrencyLimiter:
+    options.setdefault("is_overload", lambda e: isinstance(e, Overloaded))
+    options.setdefault("latency_tolerance", 0)
+    return AdaptiveConcurrencyLimiter(**options)
+
+async def limited_call(limiter: AdaptiveConcurrencyLimiter, upstream: StubUpstream) -> bool:
+    try:
+        async with limiter.slot(MODEL):
+            await upstream.call()
+        return True
+    except Overloaded:
+        return False
+
+# Test case for queueing calls beyond the limit instead of failing them
+@pytest.mark.asyncio
+async def test_excess_calls_are_queued():
+    limiter = make_limiter(initial_limit=4, max_limit=4)
+    upstream = StubUpstream(capacity=4)
+
+    results = await asyncio.gather(*(limited_call(limiter, upstream) for _ in range(20)))
+    assert all(results)
+    assert upstream.peak_in_flight == 4
+    stats = limiter.stats()[MODEL]
+    assert stats["completed"] == 20
+    assert stats["queued"] == 16
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+
+# Test case for growing the limit additively while calls succeed at full use
+@pytest.mark.asyncio
+async def test_limit_grows_while_healthy():
+    limiter = make_limiter(initial_limit=2, max_limit=8)
+    upstream = StubUpstream(capacity=100, latency=0.001)
+
+    await asyncio.gather(*(limited_call(limiter, upstream) for _ in range(200)))
+    assert limiter.stats()[MODEL]["limit"] == 8
+    assert upstream.peak_in_flight == 8
+
+# Test case for not growing a limit that is not fully used
+@pytest.mark.asyncio
+async def test_limit_does_not_grow_when_idle():
+    limiter = make_limiter(initial_limit=4)
+    upstream = StubUpstream(capacity=100, latency=0.001)
+
+    for _ in range(20):
+        await limited_call(limiter, upstream)
+    assert limiter.stats()[MODEL]["limit"] == 4
+
+# Test case for halving the limit once per burst of overload signals
+@pytest.mark.asyncio
+async def test_overload_decreases_limit_once_per_round():
+    limiter = make_limiter(initial_limit=16)
+    upstream = StubUpstream(capacity=4)
+
+    results = await asyncio.gather(*(limited_call(limiter, upstream) for _ in range(16)))
+    assert results.count(False) == 12
+    stats = limiter.stats()[MODEL]
+    assert stats["throttled"] == 12
+    assert stats["decreases"] == 1
+    assert stats["limit"] == 8
+
+# Test case for never dropping below the minimum limit
+@pytest.mark.asyncio
+async def test_limit_respects_minimum():
+    limiter = make_limiter(initial_limit=4, min_limit=2)
+    upstream = StubUpstream(capacity=0)
+
+    for _ in range(5):
+        await limited_call(limiter, upstream)
+    assert limiter.stats()[MODEL]["limit"] == 2
+
+# Test case for converging on the capacity of a rate-limited upstream
+@pytest.mark.asyncio
+async def test_converges_on_upstream_capacity():
+    limiter = make_limiter(initial_limit=32, max_limit=64)
+    upstream = StubUpstream(capacity=8, latency=0.002)
+
+    results = await asyncio.gather(*(limited_call(limiter, upstream) for _ in range(1000)))
+    # After the first cuts, calls wait for a slot instead of being rejected upstream
+    assert results.count(False) < 100
+    assert upstream.peak_in_flight == 8
+    assert 4 <= limiter.stats()[MODEL]["limit"] < 16
+
+# Test case for cutting the limit when latency rises well above the baseline
+@pytest.mark.asyncio
+async def test_latency_increase_decreases_limit():
+    limiter = make_limiter(initial_limit=4, latency_tolerance=2.0)
+    upstream = StubUpstream(capacity=100, latency=0.002)
+
+    for _ in range(5):
+        await limited_call(limiter, upstream)
+    upstream.latency = 0.05
+    for _ in range(10):
+        await limited_call(limiter, upstream)
+    stats = limiter.stats()[MODEL]
+    assert stats["decreases"] >= 1
+    assert stats["limit"] < 4
+
+# Test case for rejecting calls that wait longer than the queue timeout
+@pytest.mark.asyncio
+async def test_queue_timeout_rejects():
+    limiter = make_limiter(initial_limit=1, max_limit=1, queue_timeout=0.01)
+    upstream = StubUpstream(capacity=1, latency=0.05)
+
+    holder = asyncio.create_task(limited_call(limiter, upstream))
+    await asyncio.sleep(0)
+    with pytest.raises(ConcurrencyLimitExceeded):
+        await limited_call(limiter, upstream)
+    assert await holder
+    stats = limiter.stats()[MODEL]
+    assert stats["rejected"] == 1
+    assert stats["queue_depth"] == 0 and stats["in_flight"] == 0
+
+# Test case for freeing the queue position of a cancelled caller
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_queue():
+    limiter = make_limiter(initial_limit=1, max_limit=1)
+    upstream = StubUpstream(capacity=1, latency=0.02)
+
+    holder = asyncio.create_task(limited_call(limiter, upstream))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(limited_call(limiter, upstream))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert await holder
+    assert await limited_call(limiter, upstream)
+    assert limiter.stats()[MODEL]["in_flight"] == 0
+
+# Test case for keeping separate limits per key
+@pytest.mark.asyncio
+async def test_limits_are_per_key():
+    limiter = make_limiter(initial_limit=4)
+
+    with pytest.raises(Overloaded):
+        async with limiter.slot("model-a"):
+            raise Overloaded()
+    async with limiter.slot("model-b"):
+        pass
+    stats = limiter.stats()
+    assert stats["model-a"]["limit"] == 2
+    assert stats["model-b"]["limit"] == 4
@@ -0,0 +1,25 @@
+import pytest
+
+from ..database import async_database_url
+
+# Test that sync database URLs are rewritten to their async drivers
+@pytest.mark.parametrize("database_url, expected", [
+    ("postgresql://user:secret@db:5432/app", "postgresql+asyncpg://user:secret@db:5432/app"),
+    ("postgresql+psycopg2://user:secret@db/app", "postgresql+asyncpg://user:secret@db/app"),
+    ("sqlite:///./app.db", "sqlite+aiosqlite:///./app.db"),
+])
+def test_async_database_url(database_url, expected):
+    assert async_database_url(database_url) == expected
+
+# Test that URLs already naming an async driver are left unchanged
+def test_async_database_url_keeps_async_driver():
+    assert async_database_url("postgresql+asyncpg://user@db/app") == "postgresql+asyncpg://user@db/app"
+
+# Test that one engine is created and shared by the sessions
+@pytest.mark.asyncio
+async def test_engine_is_shared_by_sessions():
+    from .. import database
+    engine = database.get_engine()
+    assert database.engine is engine
+    async with database.SessionLocal() as db:
+        assert db.bind is engine
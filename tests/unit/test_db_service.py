@@ -1,19 +1,22 @@
 import pytest
+import pytest_asyncio
 from fastapi import status
 from fastapi.testclient import TestClient
 from typing import Optional
 
 from ..services.db_service import db_service
 from ..schemas.settings_schema import SettingsSchema, SettingsResponseSchema
-from ..utils.exceptions import APIError, NotFoundError, DatabaseError
+from ..schemas.request_schema import RequestSchema
+from ..utils.exceptions import APIError, NotFoundError, DatabaseError, ValidationException
 from ..models.settings import SettingsModel
 from ..database import engine, SessionLocal, Base
 
 # Create a database session for testing
-@pytest.fixture(scope="session")
-def db():
+@pytest_asyncio.fixture
+async def db():
     # Create all tables in the database
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
     # Create a database session
     db = SessionLocal()
     # Yield the session
@@ -21,8 +24,9 @@ def db():
         yield db
     finally:
         # Close the session and remove all tables after the test
-        db.close()
-        Base.metadata.drop_all(bind=engine)
+        await db.close()
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
 
 # Mock user ID
 USER_ID = "test_user"
@@ -106,4 +110,45 @@ async def test_create_settings_duplicate(db):
     with pytest.raises(DatabaseError) as exc:
         await db_service.create_settings(db, SettingsSchema(**SETTINGS_DATA), USER_ID)
     # Assert the database error message
-    assert "Failed to create settings." in str(exc.value)
\ No newline at end of file
+    assert "Failed to create settings." in str(exc.value)
+# Create request test cases
+@pytest.mark.asyncio
+async def test_create_request(db):
+    # Create settings first for testing
+    settings = await db_service.create_settings(db, SettingsSchema(**SETTINGS_DATA), USER_ID)
+    # Create a request using db_service.create_request
+    request = await db_service.create_request(
+        db, RequestSchema(prompt="Write a haiku", temperature=0.2), settings.id, response="An old silent pond"
+    )
+    # Assert the request row holds the prompt, parameters and response
+    assert request.user_id == settings.id
+    assert request.prompt == "Write a haiku"
+    assert request.parameters["temperature"] == 0.2
+    assert request.response == "An old silent pond"
+    assert request.status == "completed"
+
+# List requests test cases
+@pytest.mark.asyncio
+async def test_list_requests_pages_with_cursor(db):
+    # Create settings and requests first for testing
+    settings = await db_service.create_settings(db, SettingsSchema(**SETTINGS_DATA), USER_ID)
+    for i in range(5):
+        await db_service.create_request(db, RequestSchema(prompt=f"Prompt {i}"), settings.id, response=f"Response {i}")
+    await db_service.create_request(db, RequestSchema(prompt="Failed prompt"), settings.id, status="failed")
+    # Page through the completed requests two at a time
+    pages, cursor = [], None
+    while True:
+        page, cursor = await db_service.list_requests(db, user_id=settings.id, status="completed", limit=2, cursor=cursor)
+        pages.append(page)
+        if cursor is None:
+            break
+    # Assert every completed request is listed once, newest first
+    requests = [request for page in pages for request in page]
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [request.prompt for request in requests] == [f"Prompt {i}" for i in reversed(range(5))]
+
+@pytest.mark.asyncio
+async def test_list_requests_invalid_cursor(db):
+    # Attempt to list requests with a malformed cursor
+    with pytest.raises(ValidationException):
+        await db_service.list_requests(db, cursor="not-a-cursor")
@@ -0,0 +1,107 @@
+import os
+import time
+import pytest
+import pytest_asyncio
+
+from ..utils.disk_cache import DiskCacheBackend
+
+# Create a disk cache in a temporary directory for each test
+@pytest_asyncio.fixture
+async def disk_cache(tmp_path):
+    backend = DiskCacheBackend(path=str(tmp_path), compaction_interval=3600, compaction_min_bytes=0)
+    await backend.init()
+    try:
+        yield backend
+    finally:
+        await backend.close()
+
+# Test case for reading back a stored entry
+@pytest.mark.asyncio
+async def test_set_and_get(disk_cache):
+    await disk_cache.set("key", "Once upon a time", ttl=60)
+    assert await disk_cache.get("key") == "Once upon a time"
+    assert await disk_cache.get("missing") is None
+
+# Test case for expired entries not being served
+@pytest.mark.asyncio
+async def test_expired_entry_is_not_served(disk_cache):
+    await disk_cache.set("key", "value", ttl=-1)
+    assert await disk_cache.get("key") is None
+
+# Test case for entries surviving a restart
+@pytest.mark.asyncio
+async def test_entries_survive_restart(tmp_path):
+    backend = DiskCacheBackend(path=str(tmp_path))
+    await backend.init()
+    await backend.set("key", "value", ttl=60)
+    await backend.close()
+
+    restarted = DiskCacheBackend(path=str(tmp_path))
+    await restarted.init()
+    try:
+        assert await restarted.get("key") == "value"
+    finally:
+        await restarted.close()
+
+# Test case for a second instance (another worker process) seeing appends and compactions
+@pytest.mark.asyncio
+async def test_other_instance_sees_appends_and_compaction(disk_cache, tmp_path):
+    other = DiskCacheBackend(path=str(tmp_path))
+    await other.init()
+    try:
+        await disk_cache.set("key", "value", ttl=60)
+        assert await other.get("key") == "value"
+
+        await disk_cache.set("expired", "value", ttl=-1)
+        disk_cache.compact(force=True)
+        await disk_cache.set("after compaction", "value", ttl=60)
+        assert await other.get("after compaction") == "value"
+        assert await other.get("key") == "value"
+        assert await other.get("expired") is None
+
+        await other.set("other", "value", ttl=60)
+        assert await disk_cache.get("other") == "value"
+    finally:
+        await other.close()
+
+# Test case for compaction dropping superseded and expired records
+@pytest.mark.asyncio
+async def test_compaction_reclaims_space(disk_cache):
+    for i in range(10):
+        await disk_cache.set("key", f"value {i}", ttl=60)
+    await disk_cache.set("expired", "value", ttl=-1)
+    size_before = os.path.getsize(disk_cache.data_path)
+    disk_cache.compact()
+    assert os.path.getsize(disk_cache.data_path) < size_before
+    assert await disk_cache.get("key") == "value 9"
+
+# Test case for ignoring a partially written record at the end of the log
+@pytest.mark.asyncio
+async def test_partial_record_is_ignored(disk_cache, tmp_path):
+    await disk_cache.set("key", "value", ttl=60)
+    with open(disk_cache.data_path, "ab") as log:
+        log.write(b"RC01partial")
+    restarted = DiskCacheBackend(path=str(tmp_path))
+    await restarted.init()
+    try:
+        assert await restarted.get("key") == "value"
+    finally:
+        await restarted.close()
+
+# Test case for appending after a torn record: the record left behind is dropped, so later records are indexed
+@pytest.mark.asyncio
+async def test_append_after_torn_record(disk_cache, tmp_path):
+    await disk_cache.set("key", "value", ttl=60)
+    with open(disk_cache.data_path, "ab") as log:
+        log.write(b"RC01partial")
+    await disk_cache.set("after", "value after", ttl=60)
+    assert await disk_cache.get("after") == "value after"
+
+    restarted = DiskCacheBackend(path=str(tmp_path))
+    await restarted.init()
+    try:
+        assert await restarted.get("key") == "value"
+        assert await restarted.get("after") == "value after"
+        assert os.path.getsize(restarted.data_path) == restarted.stats()["file_bytes"]
+    finally:
+        await restarted.close()
@@ -0,0 +1,68 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert
+
+from ..services.export_service import EXPORT_COLUMNS, stream_request_rows, encode_export
+from ..models.request import RequestModel
+from ..database import engine, SessionLocal, Base
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+# Create a database session with requests of two users for testing
+@pytest_asyncio.fixture
+async def db():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(RequestModel), [
+            {"id": f"request-{i:03d}", "user_id": "user-a" if i % 2 else "user-b", "prompt": f'Prompt, "{i}"',
+             "model": "text-davinci-003", "parameters": {"temperature": 0.5}, "response": f"Response {i}",
+             "status": "completed", "created_at": START + timedelta(seconds=i)}
+            for i in range(25)
+        ])
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+
+async def collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+# Test case for streaming rows in batches of the requested size
+@pytest.mark.asyncio
+async def test_stream_rows_in_batches(db):
+    batches = [batch async for batch in stream_request_rows(db, user_id="user-a", batch_rows=5)]
+    assert [len(batch) for batch in batches] == [5, 5, 2]
+    assert [row[0] for batch in batches for row in batch] == [f"request-{i:03d}" for i in range(1, 25, 2)]
+
+# Test case for exporting NDJSON objects keyed by column name
+@pytest.mark.asyncio
+async def test_export_ndjson(db):
+    output = await collect(encode_export(stream_request_rows(db, user_id="user-b", batch_rows=4), "ndjson"))
+    rows = [json.loads(line) for line in output.decode().splitlines()]
+    assert len(rows) == 13
+    assert list(rows[0]) == list(EXPORT_COLUMNS)
+    assert rows[0]["parameters"] == {"temperature": 0.5}
+    assert datetime.fromisoformat(rows[1]["created_at"]).replace(tzinfo=timezone.utc) == START + timedelta(seconds=2)
+
+# Test case for exporting gzipped CSV with a header row and quoted values
+@pytest.mark.asyncio
+async def test_export_csv_gzip(db):
+    output = await collect(encode_export(stream_request_rows(db, batch_rows=10), "csv", compress=True))
+    rows = list(csv.reader(io.StringIO(gzip.decompress(output).decode())))
+    assert rows[0] == list(EXPORT_COLUMNS)
+    assert len(rows) == 26
+    assert rows[1][2] == 'Prompt, "0"'
+    assert json.loads(rows[1][4]) == {"temperature": 0.5}
+
+# Test case for rejecting unknown export formats
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        encode_export(None, "xml")
@@ -0,0 +1,54 @@
+import json
+import logging
+import queue
+import sys
+
+from ..utils.logger import JsonFormatter, NonBlockingQueueHandler, SamplingFilter
+
+def make_record(msg, *args, **extra):
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+# Test case for formatting a record as JSON with its arguments and extra fields
+def test_json_formatter():
+    record = make_record("GET %s %s", "/requests", 200, timings={"upstream": 12.5})
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "GET /requests 200"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "app"
+    assert entry["timings"] == {"upstream": 12.5}
+    assert "args" not in entry and "msg" not in entry
+
+# Test case for including the formatted exception in the JSON entry
+def test_json_formatter_exception():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("app", logging.ERROR, __file__, 1, "Failed", (), sys.exc_info())
+    entry = json.loads(JsonFormatter().format(record))
+    assert "ValueError: boom" in entry["exc_info"]
+
+# Test case for keeping one in every 1/rate records of a sampled message and all other messages
+def test_sampling_filter():
+    sampler = SamplingFilter({"Using cached response.": 0.25, "Always kept.": 1})
+    kept = [sampler.filter(make_record("Using cached response.")) for _ in range(100)]
+    assert sum(kept) == 25
+    assert sampler.sampled_out == 75
+    assert all(sampler.filter(make_record("Always kept.")) for _ in range(10))
+    assert sampler.filter(make_record("Error: %s", "x"))
+
+    record = make_record("Using cached response.")
+    while not sampler.filter(record):
+        record = make_record("Using cached response.")
+    assert record.sample_rate == 0.25
+
+# Test case for dropping records instead of blocking when the queue is full
+def test_queue_handler_drops_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    for index in range(5):
+        handler.handle(make_record("Line %s", index))
+    assert handler.dropped == 3
+    record = handler.queue.get_nowait()
+    # Records are queued unformatted, the listener thread builds the message
+    assert record.msg == "Line %s" and record.args == (0,)
@@ -0,0 +1,91 @@
+import pytest
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from ..utils import metrics
+from ..utils.cache import CacheHandler
+from ..utils.metrics import MetricsMiddleware, instrument_database, model_label, record_usage, render_metrics
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+async def get(app, path: str) -> int:
+    """
+    Sends a GET request straight to an ASGI app and returns the response status.
+    """
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+             "server": ("testserver", 80), "client": ("testclient", 50000)}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]["status"]
+
+# Test case for capping the number of model label values
+def test_model_label_is_bounded(monkeypatch):
+    monkeypatch.setattr(metrics, "_model_labels", set())
+    monkeypatch.setattr(metrics.settings, "METRICS_MAX_MODEL_LABELS", 2)
+    assert [model_label(model) for model in ("a", "b", "c", "a")] == ["a", "b", "other", "a"]
+
+# Test case for counting the tokens reported in a completion's usage
+def test_record_usage():
+    before = sample("openai_tokens_total", model="text-davinci-003", type="completion")
+    record_usage("text-davinci-003", {"prompt_tokens": 5, "completion_tokens": 7, "total_tokens": 12})
+    record_usage("text-davinci-003", None)
+    assert sample("openai_tokens_total", model="text-davinci-003", type="completion") - before == 7
+
+# Test case for labelling HTTP requests by route template rather than by path
+@pytest.mark.asyncio
+async def test_middleware_labels_route_templates():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        return {"id": item_id}
+
+    before = sample("http_requests_total", method="GET", route="/items/{item_id}", status="200")
+    unmatched = sample("http_requests_total", method="GET", route="unmatched", status="404")
+    for item_id in ("1", "2", "3"):
+        assert await get(app, f"/items/{item_id}") == 200
+    assert await get(app, "/nothing/here") == 404
+    assert sample("http_requests_total", method="GET", route="/items/{item_id}", status="200") - before == 3
+    assert sample("http_requests_total", method="GET", route="unmatched", status="404") - unmatched == 1
+    assert b'route="/items/1"' not in render_metrics()[0]
+
+# Test case for counting cache lookups per tier and result
+@pytest.mark.asyncio
+async def test_cache_lookups_are_counted():
+    cache = CacheHandler(l1_max_bytes=1024 * 1024)
+    request_data = {"prompt": "Hello", "model": "text-davinci-003"}
+    hits = sample("cache_lookups_total", tier="l1", result="hit")
+    misses = sample("cache_lookups_total", tier="l1", result="miss")
+    assert await cache.get(request_data) is None
+    await cache.set(request_data, "Hi", ttl=60)
+    assert await cache.get(request_data) == "Hi"
+    assert sample("cache_lookups_total", tier="l1", result="hit") - hits == 1
+    assert sample("cache_lookups_total", tier="l1", result="miss") - misses == 1
+
+# Test case for timing database statements by type and session commits
+@pytest.mark.asyncio
+async def test_database_is_instrumented():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_database(engine)
+    selects = sample("db_query_duration_seconds_count", statement="SELECT")
+    commits = sample("db_commit_duration_seconds_count")
+    try:
+        async with AsyncSession(engine) as session:
+            await session.execute(text("SELECT 1"))
+            await session.commit()
+    finally:
+        await engine.dispose()
+    assert sample("db_query_duration_seconds_count", statement="SELECT") - selects == 1
+    assert sample("db_commit_duration_seconds_count") - commits == 1
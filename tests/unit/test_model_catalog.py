@@ -0,0 +1,193 @@
+import asyncio
+import pytest
+from pydantic import ValidationError
+
+from ..utils.model_catalog import ModelCatalog, ModelNotFound
+from ..schemas import request_schema
+from ..schemas.request_schema import RequestSchema
+
+MODELS = [{"id": "text-davinci-003"}, {"id": "gpt-3.5-turbo-instruct"}]
+
+class Upstream:
+    """
+    Fake model endpoints that count the calls they receive.
+    """
+
+    def __init__(self, models=MODELS):
+        self.models = {model["id"]: model for model in models}
+        self.list_calls = 0
+        self.retrieve_calls = []
+        self.fail = False
+
+    async def list_models(self):
+        self.list_calls += 1
+        if self.fail:
+            raise ConnectionError("upstream down")
+        return list(self.models.values())
+
+    async def retrieve_model(self, model_id):
+        self.retrieve_calls.append(model_id)
+        if model_id not in self.models:
+            raise ModelNotFound(model_id)
+        return self.models[model_id]
+
+async def make_catalog(upstream, **options) -> ModelCatalog:
+    options.setdefault("refresh_interval", 60)
+    options.setdefault("negative_ttl", 60)
+    catalog = ModelCatalog(**options)
+    await catalog.init(upstream.list_models, upstream.retrieve_model)
+    return catalog
+
+# Test case for serving models from the catalog without calling the API
+@pytest.mark.asyncio
+async def test_lookup_is_served_from_catalog():
+    upstream = Upstream()
+    catalog = await make_catalog(upstream)
+    try:
+        assert catalog.models() == MODELS
+        assert await catalog.lookup("text-davinci-003") == {"id": "text-davinci-003"}
+        assert upstream.list_calls == 1 and upstream.retrieve_calls == []
+    finally:
+        await catalog.close()
+
+# Test case for remembering ids found missing upstream
+@pytest.mark.asyncio
+async def test_missing_model_is_negatively_cached():
+    upstream = Upstream()
+    catalog = await make_catalog(upstream)
+    try:
+        assert await catalog.lookup("no-such-model") is None
+        assert await catalog.lookup("no-such-model") is None
+        assert upstream.retrieve_calls == ["no-such-model"]
+        assert catalog.stats()["negative_hits"] == 1
+    finally:
+        await catalog.close()
+
+# Test case for asking the API again once a negative entry has expired
+@pytest.mark.asyncio
+async def test_negative_entry_expires():
+    upstream = Upstream()
+    catalog = await make_catalog(upstream, negative_ttl=0.01)
+    try:
+        assert await catalog.lookup("no-such-model") is None
+        await asyncio.sleep(0.02)
+        assert await catalog.lookup("no-such-model") is None
+        assert upstream.retrieve_calls == ["no-such-model", "no-such-model"]
+    finally:
+        await catalog.close()
+
+# Test case for adding models created after the last refresh
+@pytest.mark.asyncio
+async def test_new_model_is_added_on_lookup():
+    upstream = Upstream()
+    catalog = await make_catalog(upstream)
+    try:
+        upstream.models["ft-new"] = {"id": "ft-new"}
+        assert await catalog.lookup("ft-new") == {"id": "ft-new"}
+        assert catalog.get("ft-new") == {"id": "ft-new"}
+    finally:
+        await catalog.close()
+
+# Test case for refreshing in the background and keeping the catalog when a refresh fails
+@pytest.mark.asyncio
+async def test_background_refresh():
+    upstream = Upstream()
+    catalog = await make_catalog(upstream, refresh_interval=0.01)
+    try:
+        upstream.models["ft-new"] = {"id": "ft-new"}
+        await asyncio.sleep(0.05)
+        assert catalog.get("ft-new") is not None
+        upstream.fail = True
+        await asyncio.sleep(0.05)
+        assert len(catalog.models()) == 3
+        assert catalog.stats()["refresh_failures"] > 0
+    finally:
+        await catalog.close()
+
+# Test case for validating models only once the catalog is loaded, confirming unknown ids in the background
+@pytest.mark.asyncio
+async def test_is_known():
+    upstream = Upstream()
+    upstream.fail = True
+    catalog = await make_catalog(upstream)
+    try:
+        assert catalog.is_known("anything")
+        upstream.fail = False
+        await catalog.refresh()
+        assert catalog.is_known("text-davinci-003")
+        upstream.models["ft-new"] = {"id": "ft-new"}
+        # Ids not confirmed missing yet are accepted while they are confirmed
+        assert catalog.is_known("ft-new")
+        assert catalog.is_known("no-such-model")
+        assert catalog.is_known("no-such-model")
+        await asyncio.sleep(0)
+        assert catalog.is_known("ft-new")
+        assert not catalog.is_known("no-such-model")
+        assert upstream.retrieve_calls == ["ft-new", "no-such-model"]
+    finally:
+        await catalog.close()
+
+# Test case for confirming each unknown id once and bounding the confirmations in flight
+@pytest.mark.asyncio
+async def test_is_known_bounds_confirmations():
+    upstream = Upstream()
+    catalog = await make_catalog(upstream, max_confirmations=2)
+    release = asyncio.Event()
+    retrieve_model = upstream.retrieve_model
+
+    async def slow_retrieve(model_id):
+        await release.wait()
+        return await retrieve_model(model_id)
+
+    catalog._retrieve_model = slow_retrieve
+    try:
+        for model_id in ("bad-1", "bad-1", "bad-2", "bad-3", "bad-2"):
+            assert catalog.is_known(model_id)
+        assert sorted(catalog._confirming) == ["bad-1", "bad-2"]
+        assert catalog.stats()["confirmations_skipped"] == 1
+        release.set()
+        await asyncio.gather(*catalog._confirming.values())
+        assert upstream.retrieve_calls == ["bad-1", "bad-2"]
+        assert not catalog.is_known("bad-1") and not catalog.is_known("bad-2")
+        # Slots are free again, so the skipped id is confirmed on its next validation
+        assert catalog.is_known("bad-3")
+        await asyncio.gather(*catalog._confirming.values())
+        assert upstream.retrieve_calls == ["bad-1", "bad-2", "bad-3"]
+        assert not catalog.is_known("bad-3")
+    finally:
+        await catalog.close()
+
+# Test case for loading the catalog in the background without waiting for it
+@pytest.mark.asyncio
+async def test_init_without_waiting():
+    upstream = Upstream()
+    catalog = ModelCatalog(refresh_interval=60, negative_ttl=60)
+    await catalog.init(upstream.list_models, upstream.retrieve_model, wait=False)
+    try:
+        assert not catalog.loaded and upstream.list_calls == 0
+        # Every id is accepted until the catalog is loaded
+        assert catalog.is_known("no-such-model")
+        await asyncio.sleep(0.01)
+        assert catalog.loaded and upstream.list_calls == 1
+        await catalog.lookup("no-such-model")
+        assert not catalog.is_known("no-such-model")
+    finally:
+        await catalog.close()
+
+# Test case for rejecting request models found missing upstream and accepting models released since the last refresh
+@pytest.mark.asyncio
+async def test_request_schema_rejects_unknown_model(monkeypatch):
+    upstream = Upstream()
+    catalog = await make_catalog(upstream)
+    monkeypatch.setattr(request_schema, "model_catalog", catalog)
+    try:
+        assert RequestSchema(prompt="Hello", model="text-davinci-003").model == "text-davinci-003"
+        upstream.models["ft-new"] = {"id": "ft-new"}
+        assert RequestSchema(prompt="Hello", model="ft-new").model == "ft-new"
+        assert RequestSchema(prompt="Hello", model="no-such-model").model == "no-such-model"
+        await asyncio.gather(*catalog._confirming.values())
+        assert RequestSchema(prompt="Hello", model="ft-new").model == "ft-new"
+        with pytest.raises(ValidationError):
+            RequestSchema(prompt="Hello", model="no-such-model")
+    finally:
+        await catalog.close()
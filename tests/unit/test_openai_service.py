@@ -1,4 +1,7 @@
+import asyncio
+import time
 import pytest
+import pytest_asyncio
 from fastapi import status
 from fastapi.testclient import TestClient
 from typing import Optional, Dict, Any
@@ -6,15 +9,24 @@ from typing import Optional, Dict, Any
 from ..services.openai_service import openai_service
 from ..schemas.request_schema import RequestSchema
 from ..utils.exceptions import APIError, NotFoundError, DatabaseError
+from ..utils.config import settings
+from ..utils.cache import cache_handler
+from ..utils.circuit_breaker import CLOSED, HALF_OPEN
+from ..utils.metrics import model_label
+from ..utils.model_catalog import model_catalog
 from ..models.request import RequestModel
+from ..models.settings import SettingsModel
 from ..database import engine, SessionLocal, Base
-from unittest.mock import patch
+from unittest.mock import patch, AsyncMock
+import openai
+from prometheus_client import REGISTRY
 
 # Create a database session for testing
-@pytest.fixture(scope="session")
-def db():
+@pytest_asyncio.fixture
+async def db():
     # Create all tables in the database
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
     # Create a database session
     db = SessionLocal()
     # Yield the session
@@ -22,8 +34,9 @@ def db():
         yield db
     finally:
         # Close the session and remove all tables after the test
-        db.close()
-        Base.metadata.drop_all(bind=engine)
+        await db.close()
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
 
 # Mock user ID
 USER_ID = "test_user"
@@ -44,6 +57,9 @@ MOCK_OPENAI_RESPONSE = {
     ]
 }
 
+# The same response as returned by the openai client, with attribute access
+MOCK_OPENAI_COMPLETION = openai.openai_object.OpenAIObject.construct_from(MOCK_OPENAI_RESPONSE)
+
 # Mock data for cached responses
 MOCK_CACHED_RESPONSE = "Once upon a time, there was a dog named Sparky..."
 
@@ -52,89 +68,280 @@ class TestOpenAIService:
     # Test case for processing a valid request
     @pytest.mark.asyncio
     async def test_process_request_valid(self, db):
-        with patch('openai.Completion.create', return_value=MOCK_OPENAI_RESPONSE):
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, return_value=MOCK_OPENAI_COMPLETION):
             response = await openai_service.process_request(REQUEST_DATA)
             assert response == MOCK_OPENAI_RESPONSE["choices"][0]["text"].strip()
 
     # Test case for handling API errors during request processing
     @pytest.mark.asyncio
     async def test_process_request_api_error(self):
-        with patch('openai.Completion.create', side_effect=openai.error.APIError):
+        # A prompt of its own, so the response cached by the valid request is not served
+        request_data = {**REQUEST_DATA, "prompt": "Upstream API error"}
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, side_effect=openai.error.APIError):
             with pytest.raises(APIError):
-                await openai_service.process_request(REQUEST_DATA)
+                await openai_service.process_request(request_data)
 
     # Test case for handling unexpected errors during request processing
     @pytest.mark.asyncio
     async def test_process_request_unexpected_error(self):
-        with patch('openai.Completion.create', side_effect=Exception):
+        # A prompt of its own, so the response cached by the valid request is not served
+        request_data = {**REQUEST_DATA, "prompt": "Unexpected upstream error"}
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, side_effect=Exception):
             with pytest.raises(APIError):
-                await openai_service.process_request(REQUEST_DATA)
+                await openai_service.process_request(request_data)
+
+    # Test case for mapping an upstream rate limit onto a 429 with its Retry-After header
+    @pytest.mark.asyncio
+    async def test_process_request_rate_limited(self):
+        request_data = {**REQUEST_DATA, "model": "rate-limited-model"}
+        rate_limit_error = openai.error.RateLimitError("Rate limit reached", http_status=429, headers={"retry-after": "2"})
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, side_effect=rate_limit_error):
+            with patch.object(cache_handler, 'lookup', new_callable=AsyncMock, return_value=(None, 0.0)):
+                with patch.object(openai_service.resilience, 'max_retries', 0):
+                    with pytest.raises(APIError) as error:
+                        await openai_service.process_request(request_data)
+                    assert error.value.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+                    assert error.value.headers == {"Retry-After": "2"}
+        # The 429 is an overload signal: the model's concurrency limit is cut and its slot released
+        limiter_stats = openai_service.limiter.stats()["rate-limited-model"]
+        assert limiter_stats["throttled"] == 1 and limiter_stats["decreases"] == 1
+        assert limiter_stats["limit"] < settings.UPSTREAM_LIMITER_INITIAL_LIMIT
+        assert limiter_stats["in_flight"] == 0
+
+    # Test case for retrying a transient upstream failure
+    @pytest.mark.asyncio
+    async def test_process_request_retries_transient_error(self):
+        server_error = openai.error.APIError("Bad gateway", http_status=502)
+        counters = dict(openai_service.resilience.counters)
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, side_effect=[server_error, MOCK_OPENAI_COMPLETION]) as mock_create:
+            with patch.object(cache_handler, 'lookup', new_callable=AsyncMock, return_value=(None, 0.0)):
+                with patch.object(openai_service.resilience, 'base_delay', 0):
+                    response = await openai_service.process_request(REQUEST_DATA)
+                    assert response == MOCK_OPENAI_RESPONSE["choices"][0]["text"].strip()
+                    assert mock_create.call_count == 2
+        assert openai_service.resilience.counters["calls"] == counters["calls"] + 1
+        assert openai_service.resilience.counters["retries"] == counters["retries"] + 1
+        assert openai_service.resilience.counters["retries_exhausted"] == counters["retries_exhausted"]
+
+    # Test case for serving a stale response right away while it is refreshed in the background
+    @pytest.mark.asyncio
+    async def test_process_request_stale_while_revalidate(self):
+        request_data = {**REQUEST_DATA, "prompt": "Stale while revalidate"}
+        with patch('time.time', return_value=time.time() - settings.CACHE_EXPIRATION_TIME - 1):
+            await cache_handler.set(request_data, "Stale response")
+        revalidations = openai_service.stale_served["revalidate"]
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, return_value=MOCK_OPENAI_COMPLETION) as mock_create:
+            assert await openai_service.process_request(request_data) == "Stale response"
+            await asyncio.gather(*openai_service._revalidations.values())
+            mock_create.assert_called_once()
+        assert await cache_handler.get(request_data) == MOCK_OPENAI_RESPONSE["choices"][0]["text"].strip()
+        assert openai_service.stale_served["revalidate"] == revalidations + 1
+
+    # Test case for serving a stale response instead of calling upstream while the circuit is open
+    @pytest.mark.asyncio
+    async def test_process_request_stale_while_circuit_open(self):
+        request_data = {**REQUEST_DATA, "prompt": "Stale while circuit open", "model": "circuit-open-model"}
+        with patch('time.time', return_value=time.time() - settings.CACHE_EXPIRATION_TIME - settings.CACHE_STALE_WHILE_REVALIDATE - 60):
+            await cache_handler.set(request_data, "Stale response")
+        breaker = openai_service._breaker("circuit-open-model")
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        labels = {"model": model_label("circuit-open-model"), "reason": "circuit_open"}
+        served = REGISTRY.get_sample_value("stale_responses_total", labels) or 0.0
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, return_value=MOCK_OPENAI_RESPONSE) as mock_create:
+            assert await openai_service.process_request(request_data) == "Stale response"
+            mock_create.assert_not_called()
+        assert REGISTRY.get_sample_value("stale_responses_total", labels) == served + 1
+
+    # Test case for failing fast with 503 while the circuit is open and nothing is cached
+    @pytest.mark.asyncio
+    async def test_process_request_circuit_open_without_stale(self):
+        request_data = {**REQUEST_DATA, "prompt": "Circuit open without stale", "model": "unavailable-model"}
+        breaker = openai_service._breaker("unavailable-model")
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, return_value=MOCK_OPENAI_RESPONSE) as mock_create:
+            with pytest.raises(APIError) as error:
+                await openai_service.process_request(request_data)
+            assert error.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert "Retry-After" in error.value.headers
+            mock_create.assert_not_called()
+        assert REGISTRY.get_sample_value("circuit_breaker_state", {"model": model_label("unavailable-model")}) == 2
+
+    # Test case for a cancelled half-open probe letting the next call probe the upstream
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_releases_circuit(self):
+        breaker = openai_service._breaker("probed-model")
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        breaker._opened_at -= breaker.reset_timeout
+        started = asyncio.Event()
+
+        async def probe():
+            async with openai_service._guarded("probed-model"):
+                started.set()
+                await asyncio.sleep(60)
+
+        task = asyncio.ensure_future(probe())
+        await started.wait()
+        assert breaker.state == HALF_OPEN and breaker._probing
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not breaker._probing
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+
+    # Test case for serving a stale response when the upstream call fails
+    @pytest.mark.asyncio
+    async def test_process_request_stale_if_error(self):
+        request_data = {**REQUEST_DATA, "prompt": "Stale if error", "model": "failing-model"}
+        with patch('time.time', return_value=time.time() - settings.CACHE_EXPIRATION_TIME - settings.CACHE_STALE_WHILE_REVALIDATE - 60):
+            await cache_handler.set(request_data, "Stale response")
+        server_error = openai.error.APIError("Bad gateway", http_status=502)
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, side_effect=server_error):
+            with patch.object(openai_service.resilience, 'max_retries', 0):
+                assert await openai_service.process_request(request_data) == "Stale response"
+        assert openai_service.breakers["failing-model"].consecutive_failures == 1
+
+    # Test case for leaving upstream rate limits out of the circuit breaker
+    @pytest.mark.asyncio
+    async def test_rate_limits_do_not_open_circuit(self):
+        breaker = openai_service._breaker("rate-limited-breaker-model")
+        rate_limited = openai.error.RateLimitError("Rate limit reached", headers={"Retry-After": "1"})
+        for _ in range(breaker.failure_threshold * 2):
+            with pytest.raises(openai.error.RateLimitError):
+                async with openai_service._guarded("rate-limited-breaker-model"):
+                    raise rate_limited
+        assert breaker.state == CLOSED
+        assert breaker.consecutive_failures == 0
+        assert breaker.allow()
+        breaker.release()
 
     # Test case for fetching available OpenAI models
     @pytest.mark.asyncio
     async def test_get_available_models(self):
-        with patch('openai.Model.list', return_value={"data": [{"id": "text-davinci-003"}]}):
+        model_list = openai.openai_object.OpenAIObject.construct_from({"object": "list", "data": [{"id": "text-davinci-003"}]})
+        with patch('openai.Model.alist', new_callable=AsyncMock, return_value=model_list):
             models = await openai_service.get_available_models()
             assert models == [{"id": "text-davinci-003"}]
 
     # Test case for handling API errors during model fetching
     @pytest.mark.asyncio
     async def test_get_available_models_api_error(self):
-        with patch('openai.Model.list', side_effect=openai.error.APIError):
+        with patch('openai.Model.alist', new_callable=AsyncMock, side_effect=openai.error.APIError):
             with pytest.raises(APIError):
                 await openai_service.get_available_models()
 
     # Test case for handling unexpected errors during model fetching
     @pytest.mark.asyncio
     async def test_get_available_models_unexpected_error(self):
-        with patch('openai.Model.list', side_effect=Exception):
+        with patch('openai.Model.alist', new_callable=AsyncMock, side_effect=Exception):
             with pytest.raises(APIError):
                 await openai_service.get_available_models()
 
     # Test case for retrieving details for a specific OpenAI model
     @pytest.mark.asyncio
     async def test_get_model_details(self):
-        with patch('openai.Model.retrieve', return_value={"data": {"id": "text-davinci-003"}}):
+        model = openai.openai_object.OpenAIObject.construct_from({"id": "text-davinci-003", "object": "model", "owned_by": "openai"})
+        with patch('openai.Model.aretrieve', new_callable=AsyncMock, return_value=model):
             model_details = await openai_service.get_model_details("text-davinci-003")
-            assert model_details == {"id": "text-davinci-003"}
+            assert model_details == {"id": "text-davinci-003", "object": "model", "owned_by": "openai"}
 
     # Test case for handling API errors during model detail retrieval
     @pytest.mark.asyncio
     async def test_get_model_details_api_error(self):
-        with patch('openai.Model.retrieve', side_effect=openai.error.APIError):
+        with patch('openai.Model.aretrieve', new_callable=AsyncMock, side_effect=openai.error.APIError):
             with pytest.raises(APIError):
                 await openai_service.get_model_details("text-davinci-003")
 
     # Test case for handling model not found errors during model detail retrieval
     @pytest.mark.asyncio
     async def test_get_model_details_not_found(self):
-        with patch('openai.Model.retrieve', side_effect=openai.error.APIError(code="not_found")):
+        with patch('openai.Model.aretrieve', new_callable=AsyncMock, side_effect=openai.error.APIError(code="not_found")):
             with pytest.raises(NotFoundError):
                 await openai_service.get_model_details("text-davinci-003")
 
+    # Test case for answering model lookups from the loaded model catalog without calling the API
+    @pytest.mark.asyncio
+    async def test_get_model_details_from_catalog(self):
+        with patch.object(model_catalog, "_models", {"text-davinci-003": {"id": "text-davinci-003"}}), \
+                patch.object(model_catalog, "loaded_at", time.monotonic()):
+            with patch('openai.Model.aretrieve', new_callable=AsyncMock) as mock_retrieve:
+                assert await openai_service.get_model_details("text-davinci-003") == {"id": "text-davinci-003"}
+                assert await openai_service.get_available_models() == [{"id": "text-davinci-003"}]
+                mock_retrieve.assert_not_called()
+
     # Test case for handling unexpected errors during model detail retrieval
     @pytest.mark.asyncio
     async def test_get_model_details_unexpected_error(self):
-        with patch('openai.Model.retrieve', side_effect=Exception):
+        with patch('openai.Model.aretrieve', new_callable=AsyncMock, side_effect=Exception):
             with pytest.raises(APIError):
                 await openai_service.get_model_details("text-davinci-003")
 
     # Test case for checking if cached response exists and returns it
     @pytest.mark.asyncio
     async def test_process_request_cached_response(self):
-        with patch('openai.Completion.create', return_value=MOCK_OPENAI_RESPONSE):
-            with patch('..utils.cache.cache_handler.get', return_value=MOCK_CACHED_RESPONSE):
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, return_value=MOCK_OPENAI_COMPLETION) as mock_create:
+            with patch.object(cache_handler, 'lookup', new_callable=AsyncMock, return_value=(MOCK_CACHED_RESPONSE, 0.0)):
                 response = await openai_service.process_request(REQUEST_DATA)
                 assert response == MOCK_CACHED_RESPONSE
+                mock_create.assert_not_called()
 
     # Test case for caching response if not cached
     @pytest.mark.asyncio
     async def test_process_request_cache_response(self):
-        with patch('openai.Completion.create', return_value=MOCK_OPENAI_RESPONSE):
-            with patch('..utils.cache.cache_handler.get', return_value=None):
-                with patch('..utils.cache.cache_handler.set') as mock_set:
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, return_value=MOCK_OPENAI_COMPLETION):
+            with patch.object(cache_handler, 'lookup', new_callable=AsyncMock, return_value=(None, 0.0)):
+                with patch.object(cache_handler, 'set', new_callable=AsyncMock) as mock_set:
                     response = await openai_service.process_request(REQUEST_DATA)
-                    mock_set.assert_called_once_with(REQUEST_DATA, MOCK_OPENAI_RESPONSE["choices"][0]["text"].strip())
+                    mock_set.assert_called_once_with(REQUEST_DATA, MOCK_OPENAI_RESPONSE["choices"][0]["text"].strip(), ttl=settings.CACHE_EXPIRATION_TIME)
+
+    # Test case for bypassing the cache for users who disabled it
+    @pytest.mark.asyncio
+    async def test_process_request_cache_disabled_for_user(self):
+        user_settings = SettingsModel(is_cache_enabled=False, cache_expiration_time=60)
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, return_value=MOCK_OPENAI_COMPLETION):
+            with patch.object(cache_handler, 'lookup', new_callable=AsyncMock) as mock_lookup:
+                with patch.object(cache_handler, 'set', new_callable=AsyncMock) as mock_set:
+                    await openai_service.process_request(REQUEST_DATA, user_settings)
+                    mock_lookup.assert_not_called()
+                    mock_set.assert_not_called()
+
+    # Test case for applying the user's cache expiration time
+    @pytest.mark.asyncio
+    async def test_process_request_user_cache_expiration(self):
+        user_settings = SettingsModel(is_cache_enabled=True, cache_expiration_time=60)
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, return_value=MOCK_OPENAI_COMPLETION):
+            with patch.object(cache_handler, 'lookup', new_callable=AsyncMock, return_value=(None, 0.0)) as mock_lookup:
+                with patch.object(cache_handler, 'set', new_callable=AsyncMock) as mock_set:
+                    response = await openai_service.process_request(REQUEST_DATA, user_settings)
+                    mock_lookup.assert_called_once_with(REQUEST_DATA, max_age=60, max_stale=settings.CACHE_STALE_IF_ERROR)
+                    mock_set.assert_called_once_with(REQUEST_DATA, response, ttl=60)
+
+    # Test case for streaming a response fragment by fragment and caching the full text
+    @pytest.mark.asyncio
+    async def test_stream_request(self):
+        async def mock_stream():
+            for fragment in ["Once upon", " a time"]:
+                yield openai.openai_object.OpenAIObject.construct_from({"choices": [{"text": fragment}]})
+
+        with patch('openai.Completion.acreate', new_callable=AsyncMock, return_value=mock_stream()):
+            with patch.object(cache_handler, 'get', new_callable=AsyncMock, return_value=None):
+                with patch.object(cache_handler, 'set', new_callable=AsyncMock) as mock_set:
+                    fragments = [fragment async for fragment in openai_service.stream_request(REQUEST_DATA)]
+                    assert fragments == ["Once upon", " a time"]
+                    mock_set.assert_called_once_with(REQUEST_DATA, "Once upon a time", ttl=settings.CACHE_EXPIRATION_TIME)
+
+    # Test case for streaming a cached response as a single fragment
+    @pytest.mark.asyncio
+    async def test_stream_request_cached_response(self):
+        with patch('openai.Completion.acreate', new_callable=AsyncMock) as mock_create:
+            with patch.object(cache_handler, 'get', new_callable=AsyncMock, return_value=MOCK_CACHED_RESPONSE):
+                fragments = [fragment async for fragment in openai_service.stream_request(REQUEST_DATA)]
+                assert fragments == [MOCK_CACHED_RESPONSE]
+                mock_create.assert_not_called()
 
 # Test cases for database service
 class TestDBService:
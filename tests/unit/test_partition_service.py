@@ -0,0 +1,85 @@
+import pytest
+import pytest_asyncio
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import insert, text
+
+from ..services.partition_service import (
+    ArchiveReader, _write_archive, add_months, archive_filename, archive_partitions, ensure_partitions,
+    month_start, partition_name,
+)
+from ..models.request import RequestModel
+from ..models.settings import SettingsModel
+from ..database import engine, Base
+
+# Create requests spread over two months for testing
+@pytest_asyncio.fixture
+async def requests_table():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(RequestModel), [
+            {"id": f"request-{i:02d}", "user_id": "user-a" if i % 2 else "user-b", "prompt": f"Prompt {i}",
+             "model": "text-davinci-003", "response": f"Response {i}", "status": "failed" if i % 5 == 0 else "completed",
+             "created_at": datetime(2024, 1, 25, tzinfo=timezone.utc) + timedelta(days=i)}
+            for i in range(20)
+        ])
+    yield
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+
+# Test case for month arithmetic and partition naming
+def test_month_helpers():
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert partition_name(date(2024, 5, 1)) == "requests_y2024m05"
+    assert archive_filename(date(2024, 5, 1)) == "requests-2024-05.jsonl.zst"
+
+# Test case for writing one month of rows to an archive file and reading them back
+@pytest.mark.asyncio
+async def test_archive_round_trip(requests_table, tmp_path):
+    for month in (date(2024, 1, 1), date(2024, 2, 1)):
+        await _write_archive(month, str(tmp_path / archive_filename(month)))
+    reader = ArchiveReader(str(tmp_path))
+    assert reader.months() == [date(2024, 1, 1), date(2024, 2, 1)]
+
+    rows = list(reader.iter_requests())
+    assert [row["id"] for row in rows] == [f"request-{i:02d}" for i in range(20)]
+    assert rows[0]["created_at"] == datetime(2024, 1, 25, tzinfo=timezone.utc)
+
+    failed = list(reader.iter_requests(user_id="user-b", status="failed"))
+    assert [row["id"] for row in failed] == ["request-00", "request-10"]
+
+    february = list(reader.iter_requests(created_after=datetime(2024, 2, 1), created_before=datetime(2024, 2, 3)))
+    assert [row["id"] for row in february] == ["request-07", "request-08"]
+
+# Test case for refusing to archive partitions on databases without partitioning
+@pytest.mark.asyncio
+async def test_archive_partitions_requires_postgres(requests_table, tmp_path):
+    if engine.dialect.name == "postgresql":
+        pytest.skip("Runs against a database without partitioning.")
+    with pytest.raises(RuntimeError):
+        await archive_partitions(engine, archive_path=str(tmp_path))
+
+# Test case for creating a month partition while the default partition holds rows of that month
+@pytest.mark.asyncio
+async def test_ensure_partitions_moves_rows_out_of_default():
+    if engine.dialect.name != "postgresql":
+        pytest.skip("Partitions require PostgreSQL.")
+    next_month = add_months(month_start(datetime.now(timezone.utc)), 1)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(text("CREATE TABLE requests_default PARTITION OF requests DEFAULT"))
+        await connection.execute(insert(SettingsModel), [{"id": "user-a", "user_id": "alice", "api_key": "sk-test"}])
+        await connection.execute(insert(RequestModel), [
+            {"id": f"request-{i}", "user_id": "user-a", "prompt": "Prompt", "model": "text-davinci-003",
+             "status": "completed", "created_at": datetime(next_month.year, next_month.month, 1 + i, tzinfo=timezone.utc)}
+            for i in range(3)
+        ])
+    try:
+        await ensure_partitions(engine, months_ahead=1)
+        async with engine.connect() as connection:
+            in_partition = (await connection.execute(text(f"SELECT count(*) FROM {partition_name(next_month)}"))).scalar()
+            in_default = (await connection.execute(text("SELECT count(*) FROM requests_default"))).scalar()
+        assert (in_partition, in_default) == (3, 0)
+    finally:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
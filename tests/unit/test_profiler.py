@@ -0,0 +1,38 @@
+import threading
+import time
+import pytest
+
+from ..utils.profiler import ProfilerBusy, SamplingProfiler
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+# Test case for capturing the stacks of running threads in the collapsed-stack format
+def test_profile_captures_running_code():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        stacks = SamplingProfiler().profile(0.2, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+    lines = stacks.splitlines()
+    assert lines
+    busy = [line for line in lines if line.startswith("busy-worker;") and "busy_loop (test_profiler.py:" in line]
+    assert busy
+    stack, count = busy[0].rsplit(" ", 1)
+    assert int(count) > 0
+
+# Test case for refusing to run two profiles at once
+def test_concurrent_profile_is_refused():
+    profiler = SamplingProfiler()
+    runner = threading.Thread(target=profiler.profile, args=(0.2,))
+    runner.start()
+    time.sleep(0.05)
+    try:
+        with pytest.raises(ProfilerBusy):
+            profiler.profile(0.01)
+    finally:
+        runner.join()
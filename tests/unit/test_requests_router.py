@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from unittest.mock import AsyncMock, patch
+
+from ..routers import requests_router
+from ..schemas import RequestSchema, SettingsSchema
+from ..services.db_service import db_service
+from ..services.openai_service import openai_service
+from ..database import engine, SessionLocal, Base
+
+SETTINGS_DATA = {"api_key": "sk-test", "preferred_model": "text-davinci-003"}
+
+# Create the tables with stored requests of two users, and a client for the requests router
+@pytest_asyncio.fixture
+async def client():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with SessionLocal() as db:
+        for user in ("alice", "bob"):
+            user_settings = await db_service.create_settings(db, SettingsSchema(**SETTINGS_DATA), user)
+            for i in range(3):
+                request_data = RequestSchema(prompt=f"{user} prompt {i}", model="text-davinci-003", temperature=0.5)
+                await db_service.create_request(db, request_data, user_settings.id, response=f"{user} response {i}")
+    app = FastAPI()
+    app.include_router(requests_router, prefix="/requests")
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            yield client
+    finally:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+
+# Test case for listing the stored requests of the requesting user, page by page
+@pytest.mark.asyncio
+async def test_list_requests(client):
+    response = await client.get("/requests/", params={"current_user": "alice", "limit": 2})
+    assert response.status_code == 200
+    page = response.json()
+    assert [item["prompt"] for item in page["items"]] == ["alice prompt 2", "alice prompt 1"]
+    assert page["items"][0]["response"] == "alice response 2"
+    assert page["items"][0]["parameters"]["temperature"] == 0.5
+    assert page["items"][0]["status"] == "completed"
+
+    response = await client.get("/requests/", params={"current_user": "alice", "limit": 2, "cursor": page["next_cursor"]})
+    page = response.json()
+    assert [item["prompt"] for item in page["items"]] == ["alice prompt 0"]
+    assert page["next_cursor"] is None
+
+# Test case for never listing other users' requests
+@pytest.mark.asyncio
+async def test_list_requests_is_scoped_to_the_user(client):
+    response = await client.get("/requests/")
+    assert response.status_code == 422
+    response = await client.get("/requests/", params={"current_user": "carol"})
+    assert response.json() == {"items": [], "next_cursor": None}
+
+# Test case for storing a streamed completion once its stream has completed
+@pytest.mark.asyncio
+async def test_stream_request_is_recorded(client):
+    async def stream_request(request_data, user_settings=None):
+        for fragment in ("\n\nHello", ", ", "world\n"):
+            yield fragment
+
+    with patch.object(openai_service, "stream_request", stream_request):
+        response = await client.post("/requests/", params={"current_user": "bob"},
+                                     json={"prompt": "bob streamed prompt", "model": "text-davinci-003", "stream": True})
+    assert response.status_code == 200
+    assert response.text.endswith("data: [DONE]\n\n")
+
+    page = (await client.get("/requests/", params={"current_user": "bob", "limit": 1})).json()
+    assert page["items"][0]["prompt"] == "bob streamed prompt"
+    assert page["items"][0]["response"] == "Hello, world"
+
+# Test case for processing every line of a batch while its body is read from the same connection
+@pytest.mark.asyncio
+async def test_batch_request(client):
+    lines = [json.dumps({"prompt": f"batch prompt {i}", "model": "text-davinci-003"}) for i in range(5)]
+    with patch.object(openai_service, "process_request", new_callable=AsyncMock, return_value="Batch response"):
+        # The ASGI transport sends no spec_version, so the response also listens for disconnects
+        response = await asyncio.wait_for(client.post("/requests/batch", content="\n".join(lines) + "\n"), timeout=5)
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(result["index"] for result in results) == list(range(5))
+    assert all(result["status"] == "success" for result in results)
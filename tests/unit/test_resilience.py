@@ -0,0 +1,164 @@
+import asyncio
+import pytest
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+from ..utils.resilience import LatencyHistogram, ResilientCaller, backoff_delay, parse_retry_after
+
+MODEL = "text-davinci-003"
+
+class Transient(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("transient")
+        self.retry_after = retry_after
+
+def make_caller(**options) -> ResilientCaller:
+    options.setdefault("base_delay_ms", 1)
+    options.setdefault("is_retryable", lambda e: isinstance(e, Transient))
+    options.setdefault("retry_after", lambda e: getattr(e, "retry_after", None))
+    return ResilientCaller(**options)
+
+def flaky(failures, result="response"):
+    """
+    Returns a call factory that raises the given failures in turn, then returns `result`.
+    """
+    failures = list(failures)
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        if failures:
+            raise failures.pop(0)
+        return result
+
+    fn.calls = calls
+    return fn
+
+# Test case for estimating quantiles from the latency histogram
+def test_histogram_quantiles():
+    histogram = LatencyHistogram()
+    for index in range(1, 101):
+        histogram.record(index / 1000)
+    assert histogram.quantile(0.5) == pytest.approx(0.050, rel=0.1)
+    assert histogram.quantile(0.95) == pytest.approx(0.095, rel=0.1)
+    assert LatencyHistogram().quantile(0.5) is None
+
+# Test case for decaying old samples so quantiles follow recent latency
+def test_histogram_decays_old_samples():
+    histogram = LatencyHistogram(window=100)
+    for _ in range(100):
+        histogram.record(1.0)
+    for _ in range(300):
+        histogram.record(0.01)
+    assert histogram.quantile(0.9) == pytest.approx(0.01, rel=0.1)
+
+# Test case for keeping backoff delays within the capped exponential bound
+def test_backoff_delay_is_capped():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, 0.1, 1.0) <= min(1.0, 0.1 * 2 ** attempt)
+
+# Test case for parsing Retry-After in seconds and as an HTTP date
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after(retry_at) <= 30
+
+# Test case for retrying transient failures until a call succeeds
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried():
+    caller = make_caller(max_retries=2)
+    fn = flaky([Transient(), Transient()])
+    assert await caller.call(MODEL, fn) == "response"
+    assert len(fn.calls) == 3
+    assert caller.stats()["retries"] == 2
+
+# Test case for giving up once the retries are used up
+@pytest.mark.asyncio
+async def test_retries_are_exhausted():
+    caller = make_caller(max_retries=1)
+    fn = flaky([Transient(), Transient()])
+    with pytest.raises(Transient):
+        await caller.call(MODEL, fn)
+    assert len(fn.calls) == 2
+    assert caller.stats()["retries_exhausted"] == 1
+
+# Test case for not retrying permanent failures
+@pytest.mark.asyncio
+async def test_permanent_failures_are_not_retried():
+    caller = make_caller()
+    fn = flaky([ValueError("bad request")])
+    with pytest.raises(ValueError):
+        await caller.call(MODEL, fn)
+    assert len(fn.calls) == 1
+
+# Test case for waiting at least as long as Retry-After asks
+@pytest.mark.asyncio
+async def test_retry_after_is_respected():
+    caller = make_caller()
+    fn = flaky([Transient(retry_after=0.05)])
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    assert await caller.call(MODEL, fn) == "response"
+    assert loop.time() - started >= 0.05
+
+# Test case for failing right away when Retry-After is longer than allowed
+@pytest.mark.asyncio
+async def test_long_retry_after_is_not_waited_for():
+    caller = make_caller(max_retry_after=1.0)
+    fn = flaky([Transient(retry_after=60)])
+    with pytest.raises(Transient):
+        await caller.call(MODEL, fn)
+    assert len(fn.calls) == 1
+
+# Test case for hedging a call slower than the observed p95 and cancelling the loser
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged():
+    caller = make_caller(hedge=True, hedge_min_samples=20)
+    for _ in range(20):
+        caller._histogram(MODEL).record(0.01)
+    delays = [1.0, 0.01]
+    cancelled = []
+
+    async def fn():
+        delay = delays.pop(0)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(delay)
+            raise
+        return delay
+
+    assert await caller.call(MODEL, fn) == 0.01
+    # Let the cancellation of the slow call be delivered
+    await asyncio.sleep(0)
+    assert cancelled == [1.0]
+    stats = caller.stats()
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+
+# Test case for not hedging before a model has enough latency samples
+@pytest.mark.asyncio
+async def test_no_hedging_without_samples():
+    caller = make_caller(hedge=True, hedge_min_samples=20)
+    assert caller.hedge_delay(MODEL) is None
+    for _ in range(20):
+        await caller.call(MODEL, flaky([]))
+    assert caller.hedge_delay(MODEL) is not None
+    assert caller.stats()["hedges"] == 0
+
+# Test case for falling back to the hedged call when the original fails
+@pytest.mark.asyncio
+async def test_hedged_call_covers_failure():
+    caller = make_caller(hedge=True, hedge_min_samples=1, max_retries=0)
+    caller._histogram(MODEL).record(0.005)
+    outcomes = [(0.05, Transient()), (0.01, None)]
+
+    async def fn():
+        delay, failure = outcomes.pop(0)
+        await asyncio.sleep(delay)
+        if failure:
+            raise failure
+        return "hedged"
+
+    assert await caller.call(MODEL, fn) == "hedged"
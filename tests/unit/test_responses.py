@@ -0,0 +1,32 @@
+import json
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+
+from ..schemas.request_schema import RequestSchema, RequestResponseSchema
+from ..utils.responses import FastJSONResponse
+
+# Test case for rendering a response schema the same as the JSONResponse path did
+def test_schema_matches_json_response():
+    formatted_response = RequestResponseSchema(status="success", response="Bonjour \"monde\" ✓\n" * 3)
+    expected = JSONResponse(content=jsonable_encoder(formatted_response.dict())).body
+    response = FastJSONResponse(content=formatted_response)
+    assert response.body == expected
+    assert response.headers["content-type"] == "application/json"
+
+# Test case for passing bytes through and rendering plain error details
+def test_bytes_and_dicts():
+    assert FastJSONResponse(content=b'{"detail":"raw"}').body == b'{"detail":"raw"}'
+    response = FastJSONResponse(content={"detail": "Too many requests."}, status_code=429, headers={"Retry-After": "3"})
+    assert json.loads(response.body) == {"detail": "Too many requests."}
+    assert response.status_code == 429 and response.headers["retry-after"] == "3"
+
+# Test case for rendering validation errors whose context holds exceptions
+def test_validation_errors():
+    try:
+        RequestSchema(prompt="")
+    except ValidationError as e:
+        errors = e.errors()
+    body = json.loads(FastJSONResponse(content={"detail": errors}).body)
+    assert body["detail"][0]["loc"] == ["prompt"]
+    assert "Prompt cannot be empty." in body["detail"][0]["ctx"]["error"]
@@ -0,0 +1,91 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import event
+
+from ..utils.settings_cache import SettingsCache, settings_cache
+from ..services.db_service import db_service
+from ..schemas.settings_schema import SettingsSchema
+from ..utils.exceptions import NotFoundError
+from ..database import engine, SessionLocal, Base
+
+USER_ID = "cached_user"
+
+SETTINGS_DATA = {"api_key": "sk-test-api-key", "is_cache_enabled": True, "cache_expiration_time": 600}
+
+# Create a database session for testing, counting the statements it runs
+@pytest_asyncio.fixture
+async def db():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    settings_cache.clear()
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+    db = SessionLocal()
+    db.statements = statements
+    try:
+        yield db
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+        await db.close()
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+
+# Test case for caching found and missing settings
+def test_get_and_set():
+    cache = SettingsCache(max_bytes=1024 * 1024, ttl=60)
+    assert cache.get("user") == (False, None)
+    cache.set("user", {"id": "1", "user_id": "user"}, cache.version)
+    cache.set("nobody", None, cache.version)
+    assert cache.get("user") == (True, {"id": "1", "user_id": "user"})
+    assert cache.get("nobody") == (True, None)
+    assert cache.stats()["hits"] == 2
+
+# Test case for not caching a read that raced with an invalidation
+def test_set_skipped_after_invalidation():
+    cache = SettingsCache(max_bytes=1024 * 1024, ttl=60)
+    version = cache.version
+    cache.invalidate("user")
+    cache.set("user", {"id": "1"}, version)
+    assert cache.get("user") == (False, None)
+
+# Test case for always missing when the cache is disabled
+def test_disabled_cache_misses():
+    cache = SettingsCache(max_bytes=1024 * 1024, ttl=60, enabled=False)
+    cache.set("user", {"id": "1"}, cache.version)
+    assert cache.get("user") == (False, None)
+
+# Test case for serving repeated settings lookups without database queries
+@pytest.mark.asyncio
+async def test_get_settings_reads_database_once(db):
+    await db_service.create_settings(db, SettingsSchema(**SETTINGS_DATA), USER_ID)
+    await db_service.get_settings(db, USER_ID)
+    db.statements.clear()
+    for _ in range(3):
+        settings = await db_service.get_settings(db, USER_ID)
+        assert settings.cache_expiration_time == 600
+    assert db.statements == []
+
+# Test case for caching the absence of settings
+@pytest.mark.asyncio
+async def test_missing_settings_are_cached(db):
+    with pytest.raises(NotFoundError):
+        await db_service.get_settings(db, USER_ID)
+    db.statements.clear()
+    with pytest.raises(NotFoundError):
+        await db_service.get_settings(db, USER_ID)
+    assert db.statements == []
+    # Creating settings replaces the negative entry
+    await db_service.create_settings(db, SettingsSchema(**SETTINGS_DATA), USER_ID)
+    assert (await db_service.get_settings(db, USER_ID)).api_key == SETTINGS_DATA["api_key"]
+
+# Test case for invalidating cached settings on update and delete
+@pytest.mark.asyncio
+async def test_writes_invalidate_cached_settings(db):
+    await db_service.create_settings(db, SettingsSchema(**SETTINGS_DATA), USER_ID)
+    await db_service.get_settings(db, USER_ID)
+    await db_service.update_settings(db, SettingsSchema(api_key="sk-test-api-key", cache_expiration_time=30), USER_ID)
+    assert (await db_service.get_settings(db, USER_ID)).cache_expiration_time == 30
+    await db_service.delete_settings(db, USER_ID)
+    with pytest.raises(NotFoundError):
+        await db_service.get_settings(db, USER_ID)
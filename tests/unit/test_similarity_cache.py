@@ -0,0 +1,48 @@
+import pytest
+
+from ..utils.similarity_cache import SimilarityCache, normalize_prompt
+
+REQUEST_DATA = {
+    "prompt": "Summarize the following paragraph about the history of the printing press in Europe.",
+    "model": "text-davinci-003",
+    "temperature": 0,
+}
+
+# Test case for normalising whitespace, casing and trailing punctuation
+def test_normalize_prompt():
+    assert normalize_prompt("  Hello\n  WORLD!? ") == "hello world"
+
+# Test case for matching prompts that differ only in whitespace, casing or punctuation
+def test_lookup_matches_near_duplicates():
+    cache = SimilarityCache(threshold=0.9)
+    cache.add(REQUEST_DATA, "cache-key")
+    variant = {**REQUEST_DATA, "prompt": "summarize the following  paragraph about the History of the printing press in Europe"}
+    assert cache.lookup(variant) == "cache-key"
+    assert cache.stats()["hits"] == 1
+
+# Test case for not matching unrelated prompts
+def test_lookup_rejects_different_prompts():
+    cache = SimilarityCache(threshold=0.9)
+    cache.add(REQUEST_DATA, "cache-key")
+    assert cache.lookup({**REQUEST_DATA, "prompt": "Write a poem about the ocean at night."}) is None
+
+# Test case for not matching when the model or parameters differ
+def test_lookup_requires_identical_parameters():
+    cache = SimilarityCache(threshold=0.9)
+    cache.add(REQUEST_DATA, "cache-key")
+    assert cache.lookup({**REQUEST_DATA, "model": "text-curie-001"}) is None
+    assert cache.lookup({**REQUEST_DATA, "max_tokens": 16}) is None
+
+# Test case for evicting the least recently used prompts beyond the size bound
+def test_eviction_bounds_entries():
+    cache = SimilarityCache(threshold=0.9, max_entries=2)
+    cache.add(REQUEST_DATA, "first")
+    cache.add({**REQUEST_DATA, "prompt": "Translate the following sentence into French."}, "second")
+    cache.add({**REQUEST_DATA, "prompt": "Write a haiku about autumn leaves falling."}, "third")
+    assert len(cache) == 2
+    assert cache.lookup(REQUEST_DATA) is None
+
+# Test case for rejecting a signature size that cannot be split into bands
+def test_invalid_band_configuration():
+    with pytest.raises(ValueError):
+        SimilarityCache(num_perm=64, bands=7)
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+
+from ..utils.single_flight import SingleFlight
+
+KEY = "request-key"
+
+# Test case for coalescing concurrent calls with the same key into one execution
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_coalesced():
+    single_flight = SingleFlight()
+    executions = 0
+
+    async def fetch():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return "response"
+
+    results = await asyncio.gather(*(single_flight.do(KEY, fetch) for _ in range(10)))
+    assert results == ["response"] * 10
+    assert executions == 1
+    assert single_flight.stats() == {"executed": 1, "coalesced": 9, "in_flight": 0}
+
+# Test case for running calls with different keys independently
+@pytest.mark.asyncio
+async def test_different_keys_are_not_coalesced():
+    single_flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return "response"
+
+    await asyncio.gather(single_flight.do("a", fetch), single_flight.do("b", fetch))
+    assert single_flight.stats()["executed"] == 2
+
+# Test case for propagating an error to every coalesced caller
+@pytest.mark.asyncio
+async def test_error_is_propagated_to_all_callers():
+    single_flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    results = await asyncio.gather(*(single_flight.do(KEY, fetch) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert single_flight.stats()["in_flight"] == 0
+
+# Test case for a cancelled caller not cancelling the execution other callers wait on
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others():
+    single_flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "response"
+
+    first = asyncio.ensure_future(single_flight.do(KEY, fetch))
+    second = asyncio.ensure_future(single_flight.do(KEY, fetch))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    assert await second == "response"
+    assert first.cancelled()
+
+# Test case for cancelling the execution once every caller has been cancelled
+@pytest.mark.asyncio
+async def test_execution_is_cancelled_without_callers():
+    single_flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def fetch():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    caller = asyncio.ensure_future(single_flight.do(KEY, fetch))
+    await asyncio.sleep(0.01)
+    caller.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert single_flight.stats()["in_flight"] == 0
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+
+from ..utils.timing import ServerTimingMiddleware, RequestTimings, current_timings, phase
+
+async def get(app, path: str):
+    """
+    Sends a GET request straight to an ASGI app and returns the response start message.
+    """
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+             "server": ("testserver", 80), "client": ("testclient", 50000)}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]
+
+# Test case for phases being a no-op outside of a timed request
+def test_phase_without_request():
+    assert current_timings() is None
+    with phase("cache"):
+        pass
+    assert current_timings() is None
+
+# Test case for adding up repeated phases and formatting the Server-Timing header
+def test_header_format():
+    timings = RequestTimings()
+    timings.add("cache", 0.001)
+    timings.add("cache", 0.002)
+    timings.add("upstream", 0.25)
+    header = timings.header()
+    assert header.startswith("cache;dur=3.0, upstream;dur=250.0, total;dur=")
+
+# Test case for sending the phases recorded by a handler in the Server-Timing header
+@pytest.mark.asyncio
+async def test_middleware_sends_server_timing():
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+
+    @app.get("/work")
+    async def work():
+        current_timings().mark("validation")
+        with phase("upstream"):
+            await asyncio.sleep(0.01)
+        return {}
+
+    start = await get(app, "/work")
+    header = dict(start["headers"])[b"server-timing"].decode()
+    names = [metric.split(";")[0] for metric in header.split(", ")]
+    assert names == ["validation", "upstream", "total"]
+    assert float(header.split("upstream;dur=")[1].split(",")[0]) >= 10
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+
+from ..services.write_behind import WriteBehindQueue
+from ..services.db_service import build_request_row
+from ..models.request import RequestModel
+from ..database import engine, SessionLocal, Base
+
+REQUEST_DATA = {"prompt": "Write a haiku about queues", "model": "text-davinci-003", "temperature": 0.7}
+
+# Create the tables for each test
+@pytest_asyncio.fixture
+async def tables():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    yield
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+
+async def count_rows() -> int:
+    async with SessionLocal() as db:
+        return (await db.execute(select(func.count()).select_from(RequestModel))).scalar()
+
+# Test case for flushing a full batch as soon as it reaches the batch size
+@pytest.mark.asyncio
+async def test_flushes_full_batch(tables):
+    writer = WriteBehindQueue(RequestModel.__table__, SessionLocal, batch_size=5, flush_interval_ms=60000)
+    await writer.start()
+    for _ in range(5):
+        await writer.enqueue(build_request_row(REQUEST_DATA, "user-1", "A queue waits"))
+    for _ in range(100):
+        if writer.stats()["flushes"]:
+            break
+        await asyncio.sleep(0.01)
+    assert await count_rows() == 5
+    assert writer.stats()["flushes"] == 1
+    await writer.close()
+
+# Test case for flushing a partial batch once the flush interval has passed
+@pytest.mark.asyncio
+async def test_flushes_partial_batch_after_interval(tables):
+    writer = WriteBehindQueue(RequestModel.__table__, SessionLocal, batch_size=100, flush_interval_ms=20)
+    await writer.start()
+    await writer.enqueue(build_request_row(REQUEST_DATA, "user-1", "A queue waits"))
+    await asyncio.sleep(0.2)
+    assert await count_rows() == 1
+    await writer.close()
+
+# Test case for draining every queued row on close
+@pytest.mark.asyncio
+async def test_close_drains_queue(tables):
+    writer = WriteBehindQueue(RequestModel.__table__, SessionLocal, batch_size=7, flush_interval_ms=60000)
+    await writer.start()
+    for _ in range(20):
+        await writer.enqueue(build_request_row(REQUEST_DATA, "user-1", "A queue waits"))
+    await writer.close()
+    assert await count_rows() == 20
+    stats = writer.stats()
+    assert stats["rows_written"] == 20
+    assert stats["flushes"] == 3
+    assert stats["queue_depth"] == 0
+    with pytest.raises(RuntimeError):
+        await writer.enqueue(build_request_row(REQUEST_DATA, "user-1", "A queue waits"))
+
+# Test case for counting the rows of a batch that fails to write
+@pytest.mark.asyncio
+async def test_failed_flush_is_counted(tables):
+    writer = WriteBehindQueue(RequestModel.__table__, SessionLocal, batch_size=10, flush_interval_ms=60000)
+    await writer.start()
+    row = build_request_row(REQUEST_DATA, "user-1", "A queue waits")
+    await writer.enqueue(row)
+    await writer.enqueue(dict(row))  # duplicate primary key
+    await writer.close()
+    assert await count_rows() == 0
+    assert writer.stats()["rows_failed"] == 2
@@ -0,0 +1,302 @@
+import asyncio
+import hashlib
+import importlib
+import json
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .config import settings
+from .logger import logger
+from .metrics import CACHE_LOOKUPS, CACHE_LOOKUP_DURATION
+from .timing import phase
+from ..schemas.request_schema import RequestSchema
+
+# Request fields that determine the completion, and therefore the cache entry
+CACHE_KEY_FIELDS = ("prompt", "model", "temperature", "max_tokens", "top_p", "frequency_penalty", "presence_penalty")
+FLOAT_FIELDS = ("temperature", "top_p", "frequency_penalty", "presence_penalty")
+
+# Shared cache backends that can be selected by name through CUSTOM_CACHE_IMPLEMENTATION
+BUILTIN_BACKENDS = {
+    "disk": ".disk_cache.DiskCacheBackend",
+}
+
+def canonical_request(request_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalises the completion-relevant request fields: RequestSchema defaults are filled in for
+    missing values and numbers are rounded to a fixed float precision, so equivalent requests
+    (e.g. temperature 1 and 1.0) compare equal.
+    """
+    canonical = {}
+    for field in CACHE_KEY_FIELDS:
+        value = request_data.get(field)
+        if value is None:
+            value = RequestSchema.model_fields[field].default
+        if field in FLOAT_FIELDS and value is not None:
+            value = round(float(value), 6)
+        canonical[field] = value
+    return canonical
+
+def make_cache_key(request_data: Dict[str, Any]) -> str:
+    """
+    Builds the canonical cache key for a request.
+
+    Args:
+        request_data (Dict[str, Any]): Data containing the prompt, model selection, and parameters.
+
+    Returns:
+        str: A SHA-256 hex digest of the normalised completion-relevant request fields.
+    """
+    canonical = canonical_request(request_data)
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LRUCache:
+    """
+    In-process LRU cache bounded by the approximate memory size of its entries.
+
+    Every entry carries its own creation time, freshness lifetime (soft TTL) and expiration time
+    (hard TTL), so readers can additionally reject entries older than their own maximum age, or
+    accept entries that are stale but not yet expired.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[float, float, float, str, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """
+        Returns the cached value for `key` if it is fresh and not older than `max_age` seconds.
+        """
+        return self.lookup(key, max_age)[0]
+
+    def lookup(self, key: str, max_age: Optional[float] = None, max_stale: float = 0.0) -> Tuple[Optional[str], float]:
+        """
+        Looks up `key`, accepting an entry that is stale by at most `max_stale` seconds, i.e. past its
+        freshness lifetime or `max_age`, but not yet expired.
+
+        Returns:
+            Tuple[Optional[str], float]: The value, or None on a miss, and the seconds it is stale by (0 when fresh).
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, 0.0
+        created_at, fresh_until, expires_at, value, _ = entry
+        now = time.time()
+        if expires_at <= now:
+            self.pop(key)
+            return None, 0.0
+        if max_age is not None:
+            fresh_until = min(fresh_until, created_at + max_age)
+        staleness = max(0.0, now - fresh_until)
+        if staleness > max_stale:
+            return None, 0.0
+        self._entries.move_to_end(key)
+        return value, staleness
+
+    def set(self, key: str, value: str, ttl: float, created_at: Optional[float] = None, stale_ttl: float = 0.0):
+        """
+        Stores `value`, fresh for `ttl` seconds and kept stale for `stale_ttl` seconds more, evicting
+        least recently used entries to stay within the size bound.
+        """
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+        self.pop(key)
+        if size > self.max_bytes:
+            return
+        while self.size_bytes + size > self.max_bytes:
+            self.pop(next(iter(self._entries)))
+        created_at = created_at or time.time()
+        self._entries[key] = (created_at, created_at + ttl, created_at + ttl + stale_ttl, value, size)
+        self.size_bytes += size
+
+    def pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[4]
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+
+def load_backend(implementation: Optional[str]):
+    """
+    Instantiates the shared cache backend named by a dotted path (e.g. "mypackage.cache.RedisBackend")
+    or by one of the BUILTIN_BACKENDS names (e.g. "disk").
+
+    Backends implement `init()`, `close()`, `get(key)` and `set(key, value, ttl)` as coroutines.
+
+    Args:
+        implementation (Optional[str]): Dotted path or name of the backend class, or None for no shared cache.
+
+    Returns:
+        The cache backend instance, or None.
+    """
+    if not implementation or implementation == "None":
+        return None
+    implementation = BUILTIN_BACKENDS.get(implementation, implementation)
+    module_path, _, class_name = implementation.rpartition(".")
+    return getattr(importlib.import_module(module_path, __package__), class_name)()
+
+class CacheHandler:
+    """
+    Caches OpenAI responses under the canonical key of the request that produced them.
+
+    Lookups go through an in-process LRU tier (L1) first and fall through to the shared backend (L2)
+    selected by CUSTOM_CACHE_IMPLEMENTATION. L2 entries are stored with their creation time so a
+    reader's maximum age applies to both tiers.
+
+    An entry is fresh for its TTL (the soft TTL) and is then kept for `stale_ttl` more seconds (up to
+    the hard TTL), during which `lookup` can still return it, flagged as stale, to readers that accept
+    stale responses.
+    """
+
+    def __init__(self, backend=None, l1_max_bytes: Optional[int] = None, stale_ttl: Optional[float] = None):
+        self.backend = backend or load_backend(settings.CUSTOM_CACHE_IMPLEMENTATION)
+        self.l1 = LRUCache(settings.CACHE_L1_MAX_BYTES if l1_max_bytes is None else l1_max_bytes)
+        self.stale_ttl = settings.CACHE_STALE_IF_ERROR if stale_ttl is None else stale_ttl
+        self.counters = {"l1": {"hits": 0, "misses": 0}, "l2": {"hits": 0, "misses": 0}}
+        self._backend_open = False
+        self._backend_lock = asyncio.Lock()
+
+    async def init(self):
+        """
+        Opens the shared backend. This happens on its first use, so calling it ahead of time is optional.
+        """
+        if self.backend is None or self._backend_open:
+            return
+        async with self._backend_lock:
+            if not self._backend_open:
+                await self.backend.init()
+                self._backend_open = True
+
+    async def close(self):
+        self.l1.clear()
+        if self._backend_open:
+            self._backend_open = False
+            await self.backend.close()
+
+    async def get(self, request_data: Dict[str, Any], max_age: Optional[int] = None) -> Optional[str]:
+        """
+        Looks up the cached response for a request.
+
+        Args:
+            request_data (Dict[str, Any]): Data containing the prompt, model selection, and parameters.
+            max_age (Optional[int]): Maximum age in seconds of an acceptable entry, e.g. a user's cache expiration time.
+
+        Returns:
+            Optional[str]: The cached response text, or None on a miss.
+        """
+        return await self.get_by_key(make_cache_key(request_data), max_age)
+
+    async def get_by_key(self, key: str, max_age: Optional[int] = None) -> Optional[str]:
+        """
+        Looks up a fresh cached response by its cache key, as returned by make_cache_key.
+        """
+        return (await self.lookup_by_key(key, max_age))[0]
+
+    async def lookup(self, request_data: Dict[str, Any], max_age: Optional[int] = None,
+                     max_stale: float = 0.0) -> Tuple[Optional[str], float]:
+        """
+        Looks up the cached response for a request, accepting one that is stale by at most `max_stale` seconds.
+
+        Args:
+            request_data (Dict[str, Any]): Data containing the prompt, model selection, and parameters.
+            max_age (Optional[int]): Maximum age in seconds of a fresh entry, e.g. a user's cache expiration time.
+            max_stale (float): Seconds past its freshness an entry is still accepted, up to its hard TTL.
+
+        Returns:
+            Tuple[Optional[str], float]: The cached response text, or None on a miss, and the seconds
+                it is stale by (0 when fresh).
+        """
+        return await self.lookup_by_key(make_cache_key(request_data), max_age, max_stale)
+
+    async def lookup_by_key(self, key: str, max_age: Optional[int] = None,
+                            max_stale: float = 0.0) -> Tuple[Optional[str], float]:
+        """
+        Looks up a cached response by its cache key, as in lookup.
+        """
+        started = time.perf_counter()
+        with phase("cache"):
+            value, staleness = await self._lookup_by_key(key, max_age, max_stale)
+        CACHE_LOOKUP_DURATION.labels("miss" if value is None else "hit").observe(time.perf_counter() - started)
+        return value, staleness
+
+    async def _lookup_by_key(self, key: str, max_age: Optional[int], max_stale: float) -> Tuple[Optional[str], float]:
+        value, staleness = self.l1.lookup(key, max_age, max_stale)
+        if value is not None:
+            self._count("l1", "hits")
+            return value, staleness
+        self._count("l1", "misses")
+
+        if self.backend is None:
+            return None, 0.0
+        try:
+            await self.init()
+            envelope = await self.backend.get(key)
+            if envelope is None:
+                self._count("l2", "misses")
+                return None, 0.0
+            entry = json.loads(envelope)
+            stale_ttl = entry.get("stale_ttl", 0)
+            age = time.time() - entry["created_at"]
+            fresh_for = entry["ttl"] if max_age is None else min(entry["ttl"], max_age)
+            value = entry["value"]
+        except Exception as e:
+            # An unreachable backend or a corrupt entry is a miss
+            logger.error("Cache read failed: %s", e)
+            self._count("l2", "misses")
+            return None, 0.0
+
+        staleness = max(0.0, age - fresh_for)
+        if age >= entry["ttl"] + stale_ttl or staleness > max_stale:
+            self._count("l2", "misses")
+            return None, 0.0
+        self._count("l2", "hits")
+        # Promote to L1 with the lifetimes the entry was written with
+        self.l1.set(key, value, entry["ttl"], created_at=entry["created_at"], stale_ttl=stale_ttl)
+        return value, staleness
+
+    async def set(self, request_data: Dict[str, Any], response: str, ttl: Optional[int] = None):
+        """
+        Caches the response for a request in both tiers.
+
+        Args:
+            request_data (Dict[str, Any]): Data containing the prompt, model selection, and parameters.
+            response (str): The response text to cache.
+            ttl (Optional[int]): Time in seconds the entry is fresh. Defaults to settings.CACHE_EXPIRATION_TIME.
+                The entry is kept stale for `stale_ttl` seconds more.
+        """
+        key = make_cache_key(request_data)
+        ttl = ttl or settings.CACHE_EXPIRATION_TIME
+        created_at = time.time()
+        self.l1.set(key, response, ttl, created_at=created_at, stale_ttl=self.stale_ttl)
+
+        if self.backend is None:
+            return
+        envelope = json.dumps({"value": response, "created_at": created_at, "ttl": ttl, "stale_ttl": self.stale_ttl})
+        try:
+            await self.init()
+            await self.backend.set(key, envelope, ttl + self.stale_ttl)
+        except Exception as e:
+            logger.error("Cache write failed: %s", e)
+
+    def _count(self, tier: str, result: str):
+        self.counters[tier][result] += 1
+        CACHE_LOOKUPS.labels(tier, "hit" if result == "hits" else "miss").inc()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns hit and miss counts per tier, along with the size of the L1 tier.
+        """
+        stats = {tier: dict(counts) for tier, counts in self.counters.items()}
+        stats["l1"].update(entries=len(self.l1), bytes=self.l1.size_bytes)
+        if self.backend is None:
+            del stats["l2"]
+        return stats
+
+cache_handler = CacheHandler()
@@ -0,0 +1,87 @@
+import time
+from typing import Any, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of making a call while the circuit is open.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing dependency for a while, then probes it before letting traffic through again.
+
+    The circuit opens after `failure_threshold` consecutive failures. While it is open, `allow` refuses
+    every call. After `reset_timeout` seconds it becomes half-open and lets a single probe call through:
+    its success closes the circuit, its failure opens it for another `reset_timeout`.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open before a probe call is allowed.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.counters = {"opened": 0, "rejected": 0}
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return OPEN
+        return HALF_OPEN
+
+    def retry_after(self) -> float:
+        """
+        Returns the seconds until the open circuit lets a probe call through.
+        """
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        Tells whether a call may be made now. Every allowed call must be followed by
+        `record_success`, `record_failure` or `release`.
+        """
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.counters["rejected"] += 1
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._probing or (self._opened_at is None and self.consecutive_failures >= self.failure_threshold):
+            self._opened_at = time.monotonic()
+            self.counters["opened"] += 1
+        self._probing = False
+
+    def release(self):
+        """
+        Ends an allowed call that says nothing about the dependency's health, e.g. a cancelled one.
+        """
+        self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.consecutive_failures, **self.counters}
@@ -0,0 +1,188 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+
+class ConcurrencyLimitExceeded(Exception):
+    """
+    Raised when a call waited longer than the queue timeout for a slot, or the queue was full.
+    """
+
+class _Limit:
+    """
+    The adaptive limit of one key, its in-flight calls and the callers queued for a slot.
+    """
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.latency_baseline: Optional[float] = None
+        self.latency_ewma: Optional[float] = None
+        # Loop time of the last decrease; only calls started after it can cause another one
+        self.last_decrease = float("-inf")
+        self.counters = {"completed": 0, "queued": 0, "rejected": 0, "throttled": 0, "increases": 0, "decreases": 0}
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limits the number of concurrent calls per key (e.g. per upstream model) with an AIMD policy.
+
+    Calls beyond the current limit wait in a FIFO queue instead of failing. Each successful call
+    that completes while the limit is fully used grows the limit by `increase / limit`, i.e. by about
+    `increase` per round of calls (additive increase). An overload signal from upstream, recognised by
+    `is_overload` (e.g. HTTP 429), multiplies the limit by `decrease_factor`; a smoothed latency above
+    `latency_tolerance` times the baseline latency multiplies it by `latency_decrease_factor`
+    (multiplicative decrease). Only calls started after the last decrease can trigger the next one,
+    so a burst of failures from the same round cuts the limit once.
+
+    Args:
+        initial_limit (float): Limit of a key before any feedback.
+        min_limit (int): The limit never drops below this.
+        max_limit (int): The limit never grows above this.
+        latency_tolerance (float): Ratio of smoothed to baseline latency treated as congestion. 0 disables latency feedback.
+        queue_timeout (Optional[float]): Seconds a call may wait for a slot before it is rejected. None waits indefinitely.
+        max_queue_size (Optional[int]): Number of queued calls per key beyond which new calls are rejected right away.
+        is_overload (Callable[[BaseException], bool]): Tells whether an exception raised by a call is an overload signal.
+    """
+
+    def __init__(self, initial_limit: float = 10, min_limit: int = 1, max_limit: int = 100, increase: float = 1.0,
+                 decrease_factor: float = 0.5, latency_decrease_factor: float = 0.9, latency_tolerance: float = 2.0,
+                 queue_timeout: Optional[float] = 30.0, max_queue_size: Optional[int] = None,
+                 is_overload: Callable[[BaseException], bool] = lambda e: False):
+        self.initial_limit = min(max(initial_limit, min_limit), max_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_decrease_factor = latency_decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.queue_timeout = queue_timeout
+        self.max_queue_size = max_queue_size
+        self.is_overload = is_overload
+        self._limits: Dict[str, _Limit] = {}
+
+    def _get(self, key: str) -> _Limit:
+        state = self._limits.get(key)
+        if state is None:
+            state = self._limits[key] = _Limit(self.initial_limit)
+        return state
+
+    @staticmethod
+    def _capacity(state: _Limit) -> int:
+        return int(state.limit)
+
+    @asynccontextmanager
+    async def slot(self, key: str, sample_latency: bool = True) -> AsyncIterator[None]:
+        """
+        Holds one of the concurrent slots of `key` while the block runs, waiting for one if all are taken.
+
+        The outcome of the block feeds the limit: success grows it, an overload exception shrinks it,
+        and other exceptions leave it unchanged. Pass `sample_latency=False` for calls whose duration
+        says nothing about upstream load, such as streams, which are held open while the client reads.
+
+        Raises:
+            ConcurrencyLimitExceeded: If no slot became free within the queue timeout, or the queue is full.
+        """
+        loop = asyncio.get_running_loop()
+        state = self._get(key)
+        await self._acquire(state, loop)
+        started = loop.time()
+        try:
+            yield
+        except BaseException as e:
+            if isinstance(e, Exception) and self.is_overload(e):
+                state.counters["throttled"] += 1
+                self._decrease(state, started, loop.time(), self.decrease_factor)
+            self._release(state)
+            raise
+        latency = loop.time() - started
+        state.counters["completed"] += 1
+        if sample_latency and self._record_latency(state, latency):
+            self._decrease(state, started, loop.time(), self.latency_decrease_factor)
+        elif state.in_flight >= self._capacity(state):
+            # Only grow a limit that is actually being used
+            state.limit = min(self.max_limit, state.limit + self.increase / state.limit)
+            state.counters["increases"] += 1
+        self._release(state)
+
+    async def _acquire(self, state: _Limit, loop: asyncio.AbstractEventLoop):
+        if state.in_flight < self._capacity(state) and not state.waiters:
+            state.in_flight += 1
+            return
+        if self.max_queue_size is not None and len(state.waiters) >= self.max_queue_size:
+            state.counters["rejected"] += 1
+            raise ConcurrencyLimitExceeded("Too many queued calls.")
+
+        waiter = loop.create_future()
+        state.waiters.append(waiter)
+        state.counters["queued"] += 1
+        queued_at = loop.time()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the caller gave up; pass it on
+                self._release(state)
+            elif waiter in state.waiters:
+                state.waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                state.counters["rejected"] += 1
+                raise ConcurrencyLimitExceeded(f"No free slot within {self.queue_timeout} seconds.") from None
+            raise
+        finally:
+            waited = loop.time() - queued_at
+            state.wait_seconds_total += waited
+            state.wait_seconds_max = max(state.wait_seconds_max, waited)
+
+    def _release(self, state: _Limit):
+        state.in_flight -= 1
+        # Hand the freed slots over to queued callers, oldest first
+        while state.waiters and state.in_flight < self._capacity(state):
+            waiter = state.waiters.popleft()
+            if not waiter.done():
+                state.in_flight += 1
+                waiter.set_result(None)
+
+    def _record_latency(self, state: _Limit, latency: float) -> bool:
+        """
+        Folds a latency sample into the smoothed and baseline latencies, and returns whether latency
+        has risen past the tolerance. The baseline follows drops immediately and rises only slowly.
+        """
+        if state.latency_baseline is None:
+            state.latency_baseline = state.latency_ewma = latency
+            return False
+        state.latency_ewma += 0.2 * (latency - state.latency_ewma)
+        if latency < state.latency_baseline:
+            state.latency_baseline = latency
+        else:
+            state.latency_baseline += 0.01 * (latency - state.latency_baseline)
+        return self.latency_tolerance > 0 and state.latency_ewma > state.latency_baseline * self.latency_tolerance
+
+    def _decrease(self, state: _Limit, started: float, now: float, factor: float):
+        if started <= state.last_decrease:
+            return
+        state.limit = max(self.min_limit, state.limit * factor)
+        state.last_decrease = now
+        state.counters["decreases"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns, per key, the current limit, in-flight and queued calls, outcome counters,
+        queue wait times and latencies in milliseconds.
+        """
+        stats = {}
+        for key, state in self._limits.items():
+            queued = state.counters["queued"]
+            stats[key] = {
+                "limit": round(state.limit, 2),
+                "in_flight": state.in_flight,
+                "queue_depth": len(state.waiters),
+                **state.counters,
+                "queue_wait_ms_avg": round(state.wait_seconds_total / queued * 1000, 3) if queued else 0.0,
+                "queue_wait_ms_max": round(state.wait_seconds_max * 1000, 3),
+                "latency_ms_baseline": round((state.latency_baseline or 0.0) * 1000, 3),
+                "latency_ms_smoothed": round((state.latency_ewma or 0.0) * 1000, 3),
+            }
+        return stats
@@ -21,19 +21,117 @@ class Settings:
         if not self.DATABASE_URL:
             raise ValueError("DATABASE_URL environment variable not found.")
 
+        # Database connection pool settings
+        self.DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", 10))
+        self.DATABASE_MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", 20))
+        self.DATABASE_POOL_TIMEOUT: float = float(os.getenv("DATABASE_POOL_TIMEOUT", 30))
+        self.DATABASE_POOL_RECYCLE: int = int(os.getenv("DATABASE_POOL_RECYCLE", 1800))
+        self.DATABASE_POOL_PRE_PING: bool = os.getenv("DATABASE_POOL_PRE_PING", "True").lower() == "true"
+
+        # Write-behind persistence of completed requests
+        self.WRITE_BEHIND_ENABLED: bool = os.getenv("WRITE_BEHIND_ENABLED", "False").lower() == "true"
+        self.WRITE_BEHIND_BATCH_SIZE: int = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", 500))
+        self.WRITE_BEHIND_FLUSH_INTERVAL_MS: float = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", 200))
+        self.WRITE_BEHIND_MAX_QUEUE_SIZE: int = int(os.getenv("WRITE_BEHIND_MAX_QUEUE_SIZE", 100000))
+        self.WRITE_BEHIND_USE_COPY: bool = os.getenv("WRITE_BEHIND_USE_COPY", "False").lower() == "true"
+
         # Default OpenAI model to use
         self.DEFAULT_OPENAI_MODEL: str = os.getenv("DEFAULT_OPENAI_MODEL", "text-davinci-003")
 
+        # OpenAI HTTP client settings
+        self.OPENAI_API_BASE: str = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
+        self.OPENAI_POOL_SIZE: int = int(os.getenv("OPENAI_POOL_SIZE", 100))
+        self.OPENAI_POOL_KEEPALIVE_TIMEOUT: float = float(os.getenv("OPENAI_POOL_KEEPALIVE_TIMEOUT", 30))
+        self.OPENAI_REQUEST_TIMEOUT: float = float(os.getenv("OPENAI_REQUEST_TIMEOUT", 60))
+
+        # Micro-batching of concurrent completion calls
+        self.OPENAI_BATCH_ENABLED: bool = os.getenv("OPENAI_BATCH_ENABLED", "False").lower() == "true"
+        self.OPENAI_BATCH_WINDOW_MS: float = float(os.getenv("OPENAI_BATCH_WINDOW_MS", 10))
+        self.OPENAI_BATCH_MAX_SIZE: int = int(os.getenv("OPENAI_BATCH_MAX_SIZE", 20))
+
+        # Adaptive (AIMD) limit of concurrent upstream calls per model
+        self.UPSTREAM_LIMITER_ENABLED: bool = os.getenv("UPSTREAM_LIMITER_ENABLED", "True").lower() == "true"
+        self.UPSTREAM_LIMITER_INITIAL_LIMIT: int = int(os.getenv("UPSTREAM_LIMITER_INITIAL_LIMIT", 10))
+        self.UPSTREAM_LIMITER_MIN_LIMIT: int = int(os.getenv("UPSTREAM_LIMITER_MIN_LIMIT", 1))
+        self.UPSTREAM_LIMITER_MAX_LIMIT: int = int(os.getenv("UPSTREAM_LIMITER_MAX_LIMIT", 100))
+        self.UPSTREAM_LIMITER_LATENCY_TOLERANCE: float = float(os.getenv("UPSTREAM_LIMITER_LATENCY_TOLERANCE", 2.0))
+        self.UPSTREAM_LIMITER_QUEUE_TIMEOUT: float = float(os.getenv("UPSTREAM_LIMITER_QUEUE_TIMEOUT", 30))
+
+        # Retries of transient upstream failures and hedging of slow completion calls
+        self.OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+        self.OPENAI_RETRY_BASE_DELAY_MS: float = float(os.getenv("OPENAI_RETRY_BASE_DELAY_MS", 200))
+        self.OPENAI_RETRY_MAX_DELAY_MS: float = float(os.getenv("OPENAI_RETRY_MAX_DELAY_MS", 5000))
+        self.OPENAI_RETRY_AFTER_MAX: float = float(os.getenv("OPENAI_RETRY_AFTER_MAX", 30))
+        self.OPENAI_HEDGE_ENABLED: bool = os.getenv("OPENAI_HEDGE_ENABLED", "False").lower() == "true"
+        self.OPENAI_HEDGE_QUANTILE: float = float(os.getenv("OPENAI_HEDGE_QUANTILE", 0.95))
+        self.OPENAI_HEDGE_MIN_SAMPLES: int = int(os.getenv("OPENAI_HEDGE_MIN_SAMPLES", 50))
+
+        # Per-model circuit breaker of upstream calls
+        self.CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5))
+        self.CIRCUIT_BREAKER_RESET_TIMEOUT: float = float(os.getenv("CIRCUIT_BREAKER_RESET_TIMEOUT", 30))
+
+        # Cached catalog of the available OpenAI models
+        self.MODEL_CATALOG_ENABLED: bool = os.getenv("MODEL_CATALOG_ENABLED", "True").lower() == "true"
+        self.MODEL_CATALOG_REFRESH_INTERVAL: float = float(os.getenv("MODEL_CATALOG_REFRESH_INTERVAL", 300))
+        self.MODEL_CATALOG_NEGATIVE_TTL: float = float(os.getenv("MODEL_CATALOG_NEGATIVE_TTL", 300))
+
+        # Prometheus metrics
+        self.METRICS_MAX_MODEL_LABELS: int = int(os.getenv("METRICS_MAX_MODEL_LABELS", 50))
+
+        # Per-request phase timings and the sampling profiler
+        self.SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "True").lower() == "true"
+        self.ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+        self.PROFILER_MAX_SECONDS: float = float(os.getenv("PROFILER_MAX_SECONDS", 60))
+
+        # Bulk batch endpoint settings
+        self.BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", 16))
+        self.BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", 128))
+        self.BATCH_MAX_LINE_BYTES: int = int(os.getenv("BATCH_MAX_LINE_BYTES", 1024 * 1024))
+
+        # Monthly partitioning and archival of the requests table (PostgreSQL)
+        self.PARTITION_MONTHS_AHEAD: int = int(os.getenv("PARTITION_MONTHS_AHEAD", 3))
+        self.ARCHIVE_AFTER_MONTHS: int = int(os.getenv("ARCHIVE_AFTER_MONTHS", 6))
+        self.ARCHIVE_PATH: str = os.getenv("ARCHIVE_PATH", "./archive")
+        self.ARCHIVE_COMPRESSION_LEVEL: int = int(os.getenv("ARCHIVE_COMPRESSION_LEVEL", 10))
+
+        # Rows fetched per round trip when exporting requests
+        self.EXPORT_BATCH_ROWS: int = int(os.getenv("EXPORT_BATCH_ROWS", 1000))
+
         # Logging level
         self.LOG_LEVEL: str = os.getenv("LOG_LEVEL", "DEBUG")
+        # "json" for one JSON object per line, "text" for plain lines
+        self.LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
+        # Records waiting for the background log writer; further records are dropped
+        self.LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+        # JSON object of message -> fraction of its records kept, for high-volume messages
+        self.LOG_SAMPLE_RATES: str = os.getenv("LOG_SAMPLE_RATES", '{"Using cached response.": 0.01}')
 
         # Cache settings
         self.CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", False)
         self.CACHE_EXPIRATION_TIME: int = int(os.getenv("CACHE_EXPIRATION_TIME", 3600))
+        self.CACHE_L1_MAX_BYTES: int = int(os.getenv("CACHE_L1_MAX_BYTES", 64 * 1024 * 1024))
+        # Seconds past its expiration time a cached response is served while it is refreshed in the background
+        self.CACHE_STALE_WHILE_REVALIDATE: float = float(os.getenv("CACHE_STALE_WHILE_REVALIDATE", 60))
+        # Seconds past its expiration time a cached response is kept for when the OpenAI API is failing (hard TTL)
+        self.CACHE_STALE_IF_ERROR: float = float(os.getenv("CACHE_STALE_IF_ERROR", 86400))
+
+        # Near-duplicate prompt cache for temperature 0 requests
+        self.SIMILARITY_CACHE_ENABLED: bool = os.getenv("SIMILARITY_CACHE_ENABLED", "False").lower() == "true"
+        self.SIMILARITY_CACHE_THRESHOLD: float = float(os.getenv("SIMILARITY_CACHE_THRESHOLD", 0.9))
+        self.SIMILARITY_CACHE_MAX_ENTRIES: int = int(os.getenv("SIMILARITY_CACHE_MAX_ENTRIES", 100000))
+
+        # Read-through cache of user settings
+        self.SETTINGS_CACHE_ENABLED: bool = os.getenv("SETTINGS_CACHE_ENABLED", "True").lower() == "true"
+        self.SETTINGS_CACHE_TTL: float = float(os.getenv("SETTINGS_CACHE_TTL", 60))
+        self.SETTINGS_CACHE_MAX_BYTES: int = int(os.getenv("SETTINGS_CACHE_MAX_BYTES", 8 * 1024 * 1024))
 
         # Custom cache implementation
         self.CUSTOM_CACHE_IMPLEMENTATION: str = os.getenv("CUSTOM_CACHE_IMPLEMENTATION", None)
 
+        # On-disk cache settings (CUSTOM_CACHE_IMPLEMENTATION=disk)
+        self.CACHE_DISK_PATH: str = os.getenv("CACHE_DISK_PATH", "./cache")
+        self.CACHE_DISK_COMPACTION_INTERVAL: float = float(os.getenv("CACHE_DISK_COMPACTION_INTERVAL", 300))
+
         # Error tracking service settings
         self.ERROR_TRACKING_SERVICE: str = os.getenv("ERROR_TRACKING_SERVICE", None)
         self.ERROR_TRACKING_API_KEY: str = os.getenv("ERROR_TRACKING_API_KEY", None)
@@ -0,0 +1,225 @@
+import asyncio
+import fcntl
+import hashlib
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from .config import settings
+from .logger import logger
+
+# Record header: magic, CRC32 of the rest of the record, key digest, expiry (epoch seconds), value length
+_HEADER = struct.Struct("<4sI32sdI")
+_MAGIC = b"RC01"
+
+class DiskCacheBackend:
+    """
+    Persistent, content-addressed cache backend on local disk.
+
+    Entries are appended to a single log file as checksummed records, and an in-memory index maps
+    each key digest to the offset of its latest record, so a lookup is one dictionary probe and one
+    positioned read. Several worker processes can share the directory: appends and compaction are
+    serialised with an advisory file lock, readers never take it and pick up records appended by
+    other processes on a miss, and a compaction by another process is detected by the log file's
+    inode changing. Expired and superseded records are dropped by a background compaction.
+    """
+
+    def __init__(self, path: Optional[str] = None, compaction_interval: Optional[float] = None,
+                 compaction_ratio: float = 0.5, compaction_min_bytes: int = 16 * 1024 * 1024):
+        self.path = path or settings.CACHE_DISK_PATH
+        self.compaction_interval = compaction_interval or settings.CACHE_DISK_COMPACTION_INTERVAL
+        self.compaction_ratio = compaction_ratio
+        self.compaction_min_bytes = compaction_min_bytes
+        self.data_path = os.path.join(self.path, "responses.log")
+        self.lock_path = os.path.join(self.path, "responses.lock")
+        self._index: Dict[bytes, Tuple[int, int, float]] = {}
+        self._fd: Optional[int] = None
+        self._inode: Optional[int] = None
+        self._scanned_to = 0
+        self._lock_fd: Optional[int] = None
+        # Guards the index and descriptor swaps; only ever held briefly, including by the event loop
+        self._lock = threading.Lock()
+        # Serialises scans, appends and compaction; never taken on the event loop
+        self._refresh_lock = threading.Lock()
+        self._writer_lock = threading.Lock()
+        self._compaction_task: Optional[asyncio.Task] = None
+
+    async def init(self):
+        os.makedirs(self.path, exist_ok=True)
+        self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        await asyncio.to_thread(self._refresh)
+        self._compaction_task = asyncio.ensure_future(self._compaction_loop())
+
+    async def close(self):
+        if self._compaction_task is not None:
+            self._compaction_task.cancel()
+            self._compaction_task = None
+        with self._refresh_lock, self._lock:
+            for fd in (self._fd, self._lock_fd):
+                if fd is not None:
+                    os.close(fd)
+            self._fd = self._lock_fd = self._inode = None
+            self._index = {}
+            self._scanned_to = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        digest = self._digest(key)
+        value = self._read(digest)
+        if value is None and self._is_stale():
+            # Another process appended or compacted since we last looked
+            await asyncio.to_thread(self._refresh)
+            value = self._read(digest)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int):
+        await asyncio.to_thread(self._append, self._digest(key), value.encode("utf-8"), time.time() + ttl)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._index), "file_bytes": self._scanned_to}
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        return hashlib.sha256(key.encode("utf-8")).digest()
+
+    @contextmanager
+    def _file_lock(self, blocking: bool = True) -> Iterator[bool]:
+        # flock() does not exclude threads sharing a descriptor, so threads of this process queue up first
+        if not self._writer_lock.acquire(blocking):
+            yield False
+            return
+        try:
+            try:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        finally:
+            self._writer_lock.release()
+
+    def _read(self, digest: bytes) -> Optional[str]:
+        with self._lock:
+            entry = self._index.get(digest)
+            if entry is None:
+                return None
+            offset, length, expires_at = entry
+            if expires_at <= time.time():
+                del self._index[digest]
+                return None
+            return os.pread(self._fd, length, offset).decode("utf-8")
+
+    def _is_stale(self) -> bool:
+        try:
+            if os.stat(self.data_path).st_ino != self._inode:
+                return True
+        except FileNotFoundError:
+            return False
+        return os.fstat(self._fd).st_size > self._scanned_to
+
+    @staticmethod
+    def _scan(fd: int, start: int) -> Tuple[Dict[bytes, Tuple[int, int, float]], int]:
+        """
+        Indexes the records from `start` on. Stops at an incomplete record that is still being written.
+        """
+        index = {}
+        size = os.fstat(fd).st_size
+        offset = start
+        while offset + _HEADER.size <= size:
+            header = os.pread(fd, _HEADER.size, offset)
+            magic, checksum, digest, expires_at, length = _HEADER.unpack(header)
+            end = offset + _HEADER.size + length
+            if magic != _MAGIC or end > size:
+                break
+            value = os.pread(fd, length, offset + _HEADER.size)
+            if zlib.crc32(header[8:] + value) != checksum:
+                break
+            index[digest] = (offset + _HEADER.size, length, expires_at)
+            offset = end
+        return index, offset
+
+    def _refresh(self):
+        """
+        Reopens the log after a compaction, or indexes records appended by other processes.
+        """
+        with self._refresh_lock:
+            fd = os.open(self.data_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+            if os.fstat(fd).st_ino == self._inode:
+                os.close(fd)
+                index, end = self._scan(self._fd, self._scanned_to)
+                with self._lock:
+                    self._index.update(index)
+                    self._scanned_to = end
+                return
+            index, end = self._scan(fd, 0)
+            with self._lock:
+                if self._fd is not None:
+                    os.close(self._fd)
+                self._fd, self._inode = fd, os.fstat(fd).st_ino
+                self._index, self._scanned_to = index, end
+
+    def _append(self, digest: bytes, value: bytes, expires_at: float):
+        body = _HEADER.pack(_MAGIC, 0, digest, expires_at, len(value))[8:] + value
+        record = _MAGIC + struct.pack("<I", zlib.crc32(body)) + body
+        with self._file_lock():
+            self._refresh()
+            with self._refresh_lock:
+                offset = self._scanned_to
+                size = os.fstat(self._fd).st_size
+                if size > offset:
+                    # A torn record left by a writer that died mid-append: no writer can be active while
+                    # we hold the file lock, so drop it, or this record would land after it unindexed
+                    logger.warning("Disk cache dropping %s bytes of incomplete record at offset %s", size - offset, offset)
+                    os.ftruncate(self._fd, offset)
+                os.write(self._fd, record)
+                with self._lock:
+                    self._index[digest] = (offset + _HEADER.size, len(value), expires_at)
+                    self._scanned_to = offset + len(record)
+
+    async def _compaction_loop(self):
+        while True:
+            await asyncio.sleep(self.compaction_interval)
+            try:
+                await asyncio.to_thread(self.compact)
+            except Exception as e:
+                logger.error("Disk cache compaction failed: %s", e)
+
+    def compact(self, force: bool = False):
+        """
+        Rewrites the log with only the latest unexpired record per key once enough of it is dead weight.
+
+        Args:
+            force (bool): Compact regardless of how much of the log is reclaimable.
+        """
+        with self._file_lock(blocking=False) as locked:
+            if not locked:
+                # Another process is compacting or appending
+                return
+            self._refresh()
+            with self._refresh_lock:
+                now = time.time()
+                with self._lock:
+                    live = [entry for entry in self._index.values() if entry[2] > now]
+                live_bytes = sum(_HEADER.size + length for _, length, _ in live)
+                if not force and (self._scanned_to < self.compaction_min_bytes
+                                  or live_bytes > self._scanned_to * (1 - self.compaction_ratio)):
+                    return
+
+                started = time.perf_counter()
+                tmp_path = self.data_path + ".compact"
+                tmp_fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    for offset, length, _ in sorted(live):
+                        os.write(tmp_fd, os.pread(self._fd, _HEADER.size + length, offset - _HEADER.size))
+                    os.fsync(tmp_fd)
+                finally:
+                    os.close(tmp_fd)
+                os.replace(tmp_path, self.data_path)
+            self._refresh()
+        logger.info("Disk cache compacted to %s entries in %.2fs", len(live), time.perf_counter() - started)
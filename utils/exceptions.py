@@ -21,6 +21,16 @@ class ValidationException(APIError):
     def __init__(self, detail: Union[str, list], status_code: int = status.HTTP_400_BAD_REQUEST, headers: Optional[dict] = None):
         super().__init__(detail=detail, status_code=status_code, headers=headers)
 
+class RateLimitError(APIError):
+    """Custom exception class for requests rejected because the OpenAI API is at capacity."""
+    def __init__(self, detail: str = "Too many requests.", status_code: int = status.HTTP_429_TOO_MANY_REQUESTS, headers: Optional[dict] = None):
+        super().__init__(detail=detail, status_code=status_code, headers=headers)
+
+class ServiceUnavailableError(APIError):
+    """Custom exception class for requests refused while the OpenAI API is considered down."""
+    def __init__(self, detail: str = "Service unavailable.", status_code: int = status.HTTP_503_SERVICE_UNAVAILABLE, headers: Optional[dict] = None):
+        super().__init__(detail=detail, status_code=status_code, headers=headers)
+
 class OpenAIAPIError(APIError):
     """Custom exception class for errors related to the OpenAI API."""
     def __init__(self, detail: str, status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR, headers: Optional[dict] = None):
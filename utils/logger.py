@@ -1,27 +1,136 @@
+import atexit
+import itertools
+import json
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict
 
 from .config import settings
 
+# Attributes every LogRecord has; anything else on a record was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line: timestamp, level, logger and message, followed by the
+    fields passed through `extra` (e.g. the request timings) and the formatted exception, if any.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in every 1/rate records of each sampled message type, so high-volume events are still
+    visible without being written on every request. A message type is the unformatted message, e.g.
+    "Using cached response."; messages without a rate are always kept. Kept records carry their
+    `sample_rate`, to scale counts derived from the logs.
+
+    Args:
+        rates (Dict[str, float]): Fraction of records kept per message type, between 0 and 1.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.intervals = {message: round(1 / rate) if rate > 0 else 0 for message, rate in rates.items() if rate < 1}
+        self.rates = {message: rate for message, rate in rates.items() if message in self.intervals}
+        self._counters = {message: itertools.count() for message in self.intervals}
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        interval = self.intervals.get(record.msg)
+        if interval is None:
+            return True
+        # Deterministic every-nth sampling; next() on itertools.count is atomic under the GIL
+        if not interval or next(self._counters[record.msg]) % interval:
+            self.sampled_out += 1
+            return False
+        record.sample_rate = self.rates[record.msg]
+        return True
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to a bounded queue served by a QueueListener thread, so logging never waits on disk
+    or stdout. When the queue is full, records are dropped and counted instead of blocking the caller.
+
+    Records are queued unformatted: the message is only built from its arguments by the listener thread.
+    """
+
+    def __init__(self, record_queue: queue.Queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Waits for room at shutdown instead of failing when the queue is full
+        self.queue.put(self._sentinel)
+
+def _sample_rates() -> Dict[str, float]:
+    try:
+        return {str(message): float(rate) for message, rate in json.loads(settings.LOG_SAMPLE_RATES).items()}
+    except (ValueError, AttributeError) as e:
+        print(f"Ignoring invalid LOG_SAMPLE_RATES: {e}", file=sys.stderr)
+        return {}
+
 # Configure logging
 logger = logging.getLogger(__name__)
 logger.setLevel(getattr(logging, settings.LOG_LEVEL.upper()))
 
+# Create a formatter
+if settings.LOG_FORMAT.lower() == "json":
+    formatter = JsonFormatter()
+else:
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
 # Create a rotating file handler
 file_handler = RotatingFileHandler("app.log", maxBytes=1024 * 1024 * 10, backupCount=5)
 file_handler.setLevel(logging.INFO)
-
-# Create a formatter
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 file_handler.setFormatter(formatter)
-
-# Add handlers to the logger
-logger.addHandler(file_handler)
+handlers = [file_handler]
 
 # Add a console handler for debug logs
 if logger.level == logging.DEBUG:
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.DEBUG)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
\ No newline at end of file
+    handlers.append(console_handler)
+
+# The file and console handlers run in the listener thread; the logger only enqueues records
+sampling_filter = SamplingFilter(_sample_rates())
+logger.addFilter(sampling_filter)
+queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+logger.addHandler(queue_handler)
+listener = _Listener(queue_handler.queue, *handlers, respect_handler_level=True)
+listener.start()
+# Stopping the listener writes the records still queued at exit
+atexit.register(listener.stop)
+
+def log_stats() -> Dict[str, Any]:
+    return {
+        "queued": queue_handler.queue.qsize(),
+        "dropped": queue_handler.dropped,
+        "sampled_out": sampling_filter.sampled_out,
+    }
@@ -0,0 +1,163 @@
+import os
+import time
+from typing import Set, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from .circuit_breaker import CLOSED, HALF_OPEN, OPEN
+from .config import settings
+
+# Every label value below comes from a fixed set (route templates, statement types, tiers) or is
+# capped (models), so the number of series stays bounded whatever the clients send.
+
+HTTP_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+STATEMENT_TYPES = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled.", ["method", "route", "status"])
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to handle an HTTP request, until its response body is sent.",
+    ["method", "route"], buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+OPENAI_REQUEST_DURATION = Histogram(
+    "openai_request_duration_seconds", "Latency of OpenAI API calls; for streams, until the stream is opened.",
+    ["model", "operation", "outcome"], buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120))
+OPENAI_TOKENS = Counter(
+    "openai_tokens_total", "Tokens consumed by OpenAI completion calls, as reported in their usage.",
+    ["model", "type"])
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Response cache lookups per tier and result.",
+    ["tier", "result"])
+CACHE_LOOKUP_DURATION = Histogram(
+    "cache_lookup_duration_seconds", "Time to look up a response in the cache, through all tiers.",
+    ["result"], buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+CIRCUIT_BREAKER_STATE = Gauge(
+    "circuit_breaker_state", "State of the circuit breaker of an upstream model: 0 closed, 1 half-open, 2 open.",
+    ["model"], multiprocess_mode="livemax")
+STALE_RESPONSES = Counter(
+    "stale_responses_total", "Stale cached responses served instead of a fresh completion, by reason.",
+    ["model", "reason"])
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Time to execute a database statement.",
+    ["statement"], buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+DB_COMMIT_DURATION = Histogram(
+    "db_commit_duration_seconds", "Time to commit a database session, including its final flush.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+
+_model_labels: Set[str] = set()
+
+def model_label(model: str) -> str:
+    """
+    Returns the label value for a model: the model itself for the first METRICS_MAX_MODEL_LABELS
+    models seen, "other" for any model after that.
+    """
+    if model in _model_labels:
+        return model
+    if len(_model_labels) < settings.METRICS_MAX_MODEL_LABELS:
+        _model_labels.add(model)
+        return model
+    return "other"
+
+def record_usage(model: str, usage):
+    """
+    Counts the tokens of a completion response's `usage`, if it reports any.
+    """
+    if not usage:
+        return
+    label = model_label(model)
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            OPENAI_TOKENS.labels(label, kind).inc(tokens)
+
+BREAKER_STATES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+def record_breaker_state(model: str, state: str):
+    """
+    Sets the circuit breaker state gauge of a model.
+    """
+    CIRCUIT_BREAKER_STATE.labels(model_label(model)).set(BREAKER_STATES[state])
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Renders all metrics in the Prometheus text format, returning the body and its content type.
+
+    When PROMETHEUS_MULTIPROC_DIR is set (e.g. under gunicorn), every worker writes its samples to
+    files in that directory, and the metrics of all workers are collected from there, so any worker
+    can answer a scrape.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the count, status and duration of HTTP requests per route template,
+    e.g. "/requests/{request_id}". Requests that match no route are recorded as "unmatched".
+    Streamed responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"] if scope["method"] in HTTP_METHODS else "other"
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            HTTP_REQUEST_DURATION.labels(method, route).observe(time.perf_counter() - started)
+
+def _statement_type(statement: str) -> str:
+    words = statement.split(None, 1)
+    verb = words[0].upper() if words else ""
+    return verb if verb in STATEMENT_TYPES else "other"
+
+def instrument_database(engine: AsyncEngine):
+    """
+    Times the statements executed on `engine` and the commits of ORM sessions.
+    """
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before_execute(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after_execute(connection, cursor, statement, parameters, context, executemany):
+        started = connection.info["query_started"].pop()
+        DB_QUERY_DURATION.labels(_statement_type(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _on_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    if not event.contains(Session, "before_commit", _before_commit):
+        event.listen(Session, "before_commit", _before_commit)
+        event.listen(Session, "after_commit", _after_commit)
+
+def _before_commit(session):
+    session.info["commit_started"] = time.perf_counter()
+
+def _after_commit(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_DURATION.observe(time.perf_counter() - started)
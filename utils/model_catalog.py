@@ -0,0 +1,206 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .config import settings
+from .logger import logger
+
+class ModelNotFound(Exception):
+    """
+    Raised by a catalog's `retrieve_model` callable for a model id that does not exist upstream.
+    """
+
+class ModelCatalog:
+    """
+    In-memory catalog of the models available upstream, keyed by model id.
+
+    The catalog is loaded by `init` and reloaded every `refresh_interval` seconds in the background,
+    so model lookups and request validation never wait on the network. A failed refresh keeps the
+    previous catalog. Ids that are not in the catalog are confirmed with a single `retrieve_model`
+    call: models found that way are added until the next refresh, and ids found missing are
+    remembered for `negative_ttl` seconds so repeated lookups of a bad id do not reach the API.
+
+    Args:
+        refresh_interval (float): Seconds between background reloads of the catalog.
+        negative_ttl (float): Seconds an id found missing upstream is answered as unknown.
+        max_negative_entries (int): Bound on the number of remembered missing ids.
+        max_confirmations (int): Bound on the number of unknown ids confirmed upstream at once.
+    """
+
+    def __init__(self, refresh_interval: float, negative_ttl: float, max_negative_entries: int = 10000,
+                 max_confirmations: int = 8):
+        self.refresh_interval = refresh_interval
+        self.negative_ttl = negative_ttl
+        self.max_negative_entries = max_negative_entries
+        self.max_confirmations = max_confirmations
+        self._models: Dict[str, Any] = {}
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        self._list_models: Optional[Callable[[], Awaitable[List[Any]]]] = None
+        self._retrieve_model: Optional[Callable[[str], Awaitable[Any]]] = None
+        self._refresher: Optional[asyncio.Task] = None
+        # Background confirmations of unknown ids, one per id
+        self._confirming: Dict[str, asyncio.Task] = {}
+        self.loaded_at: Optional[float] = None
+        self.counters = {"refreshes": 0, "refresh_failures": 0, "hits": 0, "misses": 0, "negative_hits": 0,
+                         "confirmations_skipped": 0}
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    async def init(self, list_models: Callable[[], Awaitable[List[Any]]],
+                   retrieve_model: Callable[[str], Awaitable[Any]], wait: bool = True):
+        """
+        Loads the catalog and starts refreshing it in the background. A failed initial load is logged
+        and retried by the background refresh; until the catalog is loaded, every id is accepted and
+        looked up upstream.
+
+        Args:
+            list_models: Coroutine function returning every available model (objects with an "id" key).
+            retrieve_model: Coroutine function returning one model by id, raising ModelNotFound if it does not exist.
+            wait (bool): Whether to wait for the initial load, or run it in the background.
+        """
+        self._list_models = list_models
+        self._retrieve_model = retrieve_model
+        if wait:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Initial model catalog load failed: %s", e)
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_periodically(self.refresh_interval if wait else 0))
+
+    async def close(self):
+        for task in list(self._confirming.values()):
+            task.cancel()
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+    async def refresh(self):
+        """
+        Reloads the catalog from `list_models`, replacing it in one step and forgetting missing ids,
+        since they may have become available.
+        """
+        try:
+            models = await self._list_models()
+        except Exception:
+            self.counters["refresh_failures"] += 1
+            raise
+        self._models = {model["id"]: model for model in models}
+        self._missing.clear()
+        self.loaded_at = time.monotonic()
+        self.counters["refreshes"] += 1
+
+    async def _refresh_periodically(self, delay: float):
+        while True:
+            await asyncio.sleep(delay)
+            delay = self.refresh_interval
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Model catalog refresh failed, keeping %s cached models: %s", len(self._models), e)
+
+    def models(self) -> List[Any]:
+        return list(self._models.values())
+
+    def get(self, model_id: str) -> Optional[Any]:
+        """
+        Returns the catalog entry of `model_id`, or None if it is not in the catalog.
+        """
+        model = self._models.get(model_id)
+        self.counters["hits" if model is not None else "misses"] += 1
+        return model
+
+    def is_missing(self, model_id: str) -> bool:
+        """
+        Tells whether `model_id` was recently found not to exist upstream.
+        """
+        expires_at = self._missing.get(model_id)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._missing[model_id]
+            return False
+        self.counters["negative_hits"] += 1
+        return True
+
+    def add(self, model: Any):
+        self._models[model["id"]] = model
+        self._missing.pop(model["id"], None)
+
+    def mark_missing(self, model_id: str):
+        self._missing.pop(model_id, None)
+        self._missing[model_id] = time.monotonic() + self.negative_ttl
+        while len(self._missing) > self.max_negative_entries:
+            self._missing.popitem(last=False)
+
+    async def lookup(self, model_id: str) -> Optional[Any]:
+        """
+        Returns the model `model_id`, from the catalog or with one `retrieve_model` call, or None if it
+        does not exist. Only ids not recently found missing reach the API.
+        """
+        model = self.get(model_id)
+        if model is not None or self.is_missing(model_id):
+            return model
+        try:
+            model = await self._retrieve_model(model_id)
+        except ModelNotFound:
+            self.mark_missing(model_id)
+            return None
+        self.add(model)
+        return model
+
+    def is_known(self, model_id: str) -> bool:
+        """
+        Validates a model id without network I/O: False only for ids recently found missing upstream.
+
+        An id that is not in the catalog is accepted while it is confirmed in the background, so a model
+        created since the last refresh is never rejected; once a bad id has been found missing, it is
+        rejected for `negative_ttl` seconds. At most `max_confirmations` ids are confirmed at once, so a
+        burst of distinct bad ids cannot pile up API calls; an id skipped for that reason is confirmed
+        by a later validation.
+        """
+        if not self.loaded or self.get(model_id) is not None:
+            return True
+        if self.is_missing(model_id):
+            return False
+        if model_id in self._confirming:
+            return True
+        if len(self._confirming) >= self.max_confirmations:
+            self.counters["confirmations_skipped"] += 1
+            return True
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return True
+        self._confirming[model_id] = asyncio.create_task(self._confirm(model_id))
+        return True
+
+    async def _confirm(self, model_id: str):
+        try:
+            await self.lookup(model_id)
+        except Exception as e:
+            logger.warning("Model lookup failed for %s: %s", model_id, e)
+        finally:
+            self._confirming.pop(model_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "loaded": self.loaded,
+            "models": len(self._models),
+            "missing": len(self._missing),
+            "confirming": len(self._confirming),
+            "age_s": round(time.monotonic() - self.loaded_at, 1) if self.loaded else None,
+        }
+
+model_catalog = ModelCatalog(
+    refresh_interval=settings.MODEL_CATALOG_REFRESH_INTERVAL,
+    negative_ttl=settings.MODEL_CATALOG_NEGATIVE_TTL,
+)
@@ -0,0 +1,65 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+class ProfilerBusy(Exception):
+    """
+    Raised when a profile is requested while another one is running.
+    """
+
+class SamplingProfiler:
+    """
+    Statistical profiler of the live process.
+
+    A background thread captures the Python stack of every other thread every `interval` seconds and
+    counts identical stacks. The profiled code is not instrumented, so it runs at full speed apart
+    from the moments the GIL is taken for a sample. The result is in the collapsed-stack format read
+    by flamegraph.pl, speedscope and similar tools: one `frame;frame;...;frame count` line per stack,
+    outermost frame first.
+
+    On the event loop thread, time spent waiting for I/O shows as the selector's `select` frame, and
+    time spent running coroutines as their frames.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float, interval: float = 0.01) -> str:
+        """
+        Samples all threads for `seconds` and returns the collapsed stacks. Blocks for the whole
+        duration, so call it from a worker thread.
+
+        Raises:
+            ProfilerBusy: If a profile is already running.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running.")
+        try:
+            return self._sample(seconds, interval)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, interval: float) -> str:
+        stacks: Counter = Counter()
+        own_thread = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stacks[(names.get(thread_id, str(thread_id)),) + _frames(frame)] += 1
+            time.sleep(interval)
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks.most_common())
+
+def _frames(frame) -> tuple:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return tuple(reversed(frames))
+
+profiler = SamplingProfiler()
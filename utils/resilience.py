@@ -0,0 +1,223 @@
+import asyncio
+import bisect
+import math
+import random
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+class LatencyHistogram:
+    """
+    Histogram of latencies in logarithmic buckets, for estimating quantiles in constant memory.
+
+    Bucket bounds grow by `growth` per bucket from `min_seconds` to `max_seconds`, so a quantile is
+    overestimated by at most that factor. Once `window` samples have been recorded all counts are
+    halved, so the estimate follows changes in latency instead of averaging over all time.
+
+    Args:
+        min_seconds (float): Upper bound of the first bucket.
+        max_seconds (float): Latencies above this fall into the last bucket.
+        growth (float): Ratio between the bounds of consecutive buckets.
+        window (int): Number of samples after which older samples are decayed.
+    """
+
+    def __init__(self, min_seconds: float = 0.001, max_seconds: float = 600.0, growth: float = 1.1, window: int = 10000):
+        buckets = math.ceil(math.log(max_seconds / min_seconds, growth)) + 1
+        self.bounds: List[float] = [min_seconds * growth ** index for index in range(buckets)]
+        self.counts: List[float] = [0.0] * len(self.bounds)
+        self.window = window
+        self.total = 0.0
+        self._since_decay = 0
+
+    def record(self, seconds: float):
+        index = min(bisect.bisect_left(self.bounds, seconds), len(self.bounds) - 1)
+        self.counts[index] += 1
+        self.total += 1
+        self._since_decay += 1
+        if self._since_decay >= self.window:
+            self.counts = [count / 2 for count in self.counts]
+            self.total /= 2
+            self._since_decay = 0
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Returns the upper bound of the bucket holding the `q` quantile, or None without samples.
+        """
+        if not self.total:
+            return None
+        rank = q * self.total
+        cumulative = 0.0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return self.bounds[-1]
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Returns a capped exponential backoff delay with full jitter for the `attempt`-th retry (from 0).
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header, given either in seconds or as an HTTP date, into seconds from now.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class ResilientCaller:
+    """
+    Runs idempotent calls with retries and, optionally, hedging, keeping a latency histogram per key.
+
+    Failures that `is_retryable` accepts are retried up to `max_retries` times after a capped
+    exponential backoff with full jitter. When `retry_after` returns a delay the server asked for,
+    the retry waits at least that long; a delay above `max_retry_after` is not waited for and the
+    failure is raised right away.
+
+    With hedging enabled, a second identical call is started when the first has not finished within
+    the `hedge_quantile` latency of its key. The first one to succeed wins and the other is cancelled.
+    Hedging starts once a key has `hedge_min_samples` latency samples.
+
+    Args:
+        max_retries (int): Number of retries after the first attempt.
+        base_delay_ms (float): Backoff before the first retry, doubled for every further retry.
+        max_delay_ms (float): Cap of the backoff.
+        max_retry_after (float): Longest server-requested delay in seconds that is waited for.
+        hedge (bool): Whether to send hedged calls.
+        hedge_quantile (float): Latency quantile after which a hedged call is sent.
+        hedge_min_samples (int): Samples a key needs before its calls are hedged.
+        is_retryable (Callable[[Exception], bool]): Tells whether a failure is transient.
+        retry_after (Callable[[Exception], Optional[float]]): Extracts the server-requested delay of a failure.
+    """
+
+    def __init__(self, max_retries: int = 2, base_delay_ms: float = 200, max_delay_ms: float = 5000,
+                 max_retry_after: float = 30.0, hedge: bool = False, hedge_quantile: float = 0.95,
+                 hedge_min_samples: int = 50, is_retryable: Callable[[Exception], bool] = lambda e: False,
+                 retry_after: Callable[[Exception], Optional[float]] = lambda e: None):
+        self.max_retries = max_retries
+        self.base_delay = base_delay_ms / 1000
+        self.max_delay = max_delay_ms / 1000
+        self.max_retry_after = max_retry_after
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.is_retryable = is_retryable
+        self.retry_after = retry_after
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.counters = {"calls": 0, "retries": 0, "retries_exhausted": 0, "hedges": 0, "hedge_wins": 0}
+
+    def _histogram(self, key: str) -> LatencyHistogram:
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        return histogram
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """
+        Returns how long a call of `key` runs before it is hedged, or None if it is not hedged.
+        """
+        histogram = self.histograms.get(key)
+        if not self.hedge or histogram is None or histogram.total < self.hedge_min_samples:
+            return None
+        return histogram.quantile(self.hedge_quantile)
+
+    async def call(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs `fn` with retries and hedging.
+
+        Args:
+            key (str): Key whose latency drives hedging, e.g. the model.
+            fn (Callable[[], Awaitable[Any]]): Factory for one attempt of the call.
+
+        Returns:
+            Any: The result of the first successful attempt.
+
+        Raises:
+            Exception: The failure of the last attempt, when it is not retryable or no retries are left.
+        """
+        self.counters["calls"] += 1
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt(key, fn)
+            except Exception as e:
+                if not self.is_retryable(e):
+                    raise
+                if attempt >= self.max_retries:
+                    self.counters["retries_exhausted"] += 1
+                    raise
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                retry_after = self.retry_after(e)
+                if retry_after is not None:
+                    if retry_after > self.max_retry_after:
+                        raise
+                    # Spread out the callers that were told the same time
+                    delay = retry_after + random.uniform(0, self.base_delay)
+                attempt += 1
+                self.counters["retries"] += 1
+                await asyncio.sleep(delay)
+
+    async def _timed(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        result = await fn()
+        self._histogram(key).record(time.perf_counter() - started)
+        return result
+
+    async def _attempt(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        hedge_delay = self.hedge_delay(key)
+        if hedge_delay is None:
+            return await self._timed(key, fn)
+
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(self._timed(key, fn))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                return primary.result()
+
+            self.counters["hedges"] += 1
+            hedged = asyncio.ensure_future(self._timed(key, fn))
+            tasks.append(hedged)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedged:
+                            self.counters["hedge_wins"] += 1
+                            # The slow primary is about to be cancelled; record how long it had taken
+                            # so far, or the tail it belongs to would vanish from the histogram
+                            self._histogram(key).record(time.perf_counter() - started)
+                        return task.result()
+            # Both failed; report the failure of the original call
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the retry and hedging counters, and the p50, p95 and p99 latency per key in milliseconds.
+        """
+        latency = {}
+        for key, histogram in self.histograms.items():
+            latency[key] = {
+                "samples": int(histogram.total),
+                **{f"p{int(q * 100)}_ms": round(histogram.quantile(q) * 1000, 1) for q in (0.5, 0.95, 0.99)},
+            }
+        return {**self.counters, "latency": latency}
@@ -0,0 +1,50 @@
+import asyncio
+from typing import Any, AsyncIterator
+
+from fastapi.responses import Response, StreamingResponse
+from pydantic_core import to_json
+
+class FastJSONResponse(Response):
+    """
+    JSON response serialized by pydantic-core straight to bytes.
+
+    Unlike JSONResponse with jsonable_encoder, content is not first converted to a tree of plain
+    Python objects: Pydantic models, dicts and lists are written to JSON in a single pass in Rust,
+    so a large completion text is copied once, into the body. Bytes are sent as they are. Values
+    with no JSON form, such as exceptions in validation error contexts, are written as strings.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return to_json(content, serialize_unknown=True)
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    Streaming response whose content is produced while the request body is still being read.
+
+    On servers speaking ASGI spec versions before 2.4, StreamingResponse listens for disconnects by
+    calling `receive` alongside the content, which would consume the body messages the content is
+    waiting for. Here the listener only starts once `body_read` is set; until then, a disconnect is
+    raised by `Request.stream()` as ClientDisconnect.
+    """
+
+    def __init__(self, content: AsyncIterator[Any], body_read: asyncio.Event, **kwargs):
+        super().__init__(content, **kwargs)
+        self.body_read = body_read
+
+    async def listen_for_disconnect(self, receive):
+        await self.body_read.wait()
+        await super().listen_for_disconnect(receive)
+
+async def read_body(chunks: AsyncIterator[bytes], body_read: asyncio.Event) -> AsyncIterator[bytes]:
+    """
+    Forwards the chunks of a request body, e.g. `Request.stream()`, and sets `body_read` once it has been read.
+    """
+    try:
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        body_read.set()
@@ -0,0 +1,131 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from .cache import LRUCache
+from .config import settings
+from .logger import logger
+
+# Cached marker for users known to have no settings
+_NO_SETTINGS = "__no_settings__"
+
+class SettingsCache:
+    """
+    Read-through cache of user settings rows, keyed by user_id.
+
+    Entries are the column values of a settings row, or a negative entry for users without settings,
+    and expire after `ttl` seconds. Writers invalidate the local entry and publish the user_id on a
+    PostgreSQL NOTIFY channel; every worker listens on that channel and drops its own entry, so
+    settings changes are visible everywhere once committed. Without PostgreSQL the TTL bounds how
+    long other workers can serve a stale entry.
+
+    Args:
+        max_bytes (int): Approximate memory bound of the cached entries.
+        ttl (float): Seconds an entry is served before it is read from the database again.
+        enabled (bool): When False, lookups always miss; invalidations are still published.
+        channel (str): Name of the NOTIFY channel used for invalidations.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, enabled: bool = True, channel: str = "settings_invalidation",
+                 reconnect_delay: float = 5.0):
+        self.ttl = ttl
+        self.enabled = enabled
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._entries = LRUCache(max_bytes)
+        # Incremented on every invalidation, so a read that raced with a write is not cached
+        self.version = 0
+        self._listener: Optional[asyncio.Task] = None
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0, "remote_invalidations": 0}
+
+    def get(self, user_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Looks up the cached settings of a user.
+
+        Returns:
+            Tuple[bool, Optional[Dict[str, Any]]]: Whether the entry was cached, and the column values,
+                which are None for a user known to have no settings.
+        """
+        values = self._entries.get(user_id) if self.enabled else None
+        if values is None:
+            self.counters["misses"] += 1
+            return False, None
+        self.counters["hits"] += 1
+        return True, None if values == _NO_SETTINGS else values
+
+    def set(self, user_id: str, values: Optional[Dict[str, Any]], version: int):
+        """
+        Caches the settings read for a user, unless an invalidation happened since `version` was taken
+        at the start of the read.
+        """
+        if self.enabled and version == self.version:
+            self._entries.set(user_id, _NO_SETTINGS if values is None else values, ttl=self.ttl)
+
+    def invalidate(self, user_id: str):
+        self.version += 1
+        self.counters["invalidations"] += 1
+        self._entries.pop(user_id)
+
+    def clear(self):
+        self.version += 1
+        self._entries.clear()
+
+    async def notify(self, db: AsyncSession, user_id: str):
+        """
+        Publishes an invalidation for `user_id` to other workers. The notification is transactional,
+        so call this before committing the change it announces.
+        """
+        if db.bind.dialect.name == "postgresql":
+            await db.execute(text("SELECT pg_notify(:channel, :user_id)"), {"channel": self.channel, "user_id": user_id})
+
+    async def init(self, engine: AsyncEngine):
+        """
+        Starts listening for invalidations from other workers when the database is PostgreSQL on asyncpg.
+        """
+        if self._listener is None and engine.dialect.driver == "asyncpg":
+            self._listener = asyncio.create_task(self._listen(engine))
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self, engine: AsyncEngine):
+        """
+        Holds a dedicated connection subscribed to the invalidation channel, reconnecting when it drops.
+        The cache is cleared whenever the subscription (re)starts, since notifications may have been missed.
+        """
+        while True:
+            try:
+                async with engine.connect() as connection:
+                    raw_connection = (await connection.get_raw_connection()).driver_connection
+                    lost = asyncio.Event()
+                    raw_connection.add_termination_listener(lambda _: lost.set())
+                    await raw_connection.add_listener(self.channel, self._on_notification)
+                    self.clear()
+                    await lost.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Settings invalidation listener failed: %s", e)
+            self.clear()
+            await asyncio.sleep(self.reconnect_delay)
+
+    def _on_notification(self, connection, pid: int, channel: str, user_id: str):
+        self.counters["remote_invalidations"] += 1
+        self.invalidate(user_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "entries": len(self._entries)}
+
+settings_cache = SettingsCache(
+    max_bytes=settings.SETTINGS_CACHE_MAX_BYTES,
+    ttl=settings.SETTINGS_CACHE_TTL,
+    enabled=settings.SETTINGS_CACHE_ENABLED,
+)
@@ -0,0 +1,156 @@
+import re
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import canonical_request
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s.!?,;:]+$")
+_EMPTY = 1 << 32
+_ROTATION = 0x9E3779B1
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Lowercases a prompt, collapses runs of whitespace and strips trailing punctuation.
+    """
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", prompt.lower()).strip())
+
+class SimilarityCache:
+    """
+    In-memory index of near-duplicate prompts for deterministic (temperature 0) requests.
+
+    Prompts are normalised, split into character shingles and summarised by a MinHash signature.
+    Locality-sensitive hashing over bands of the signature finds candidate prompts in constant time;
+    a candidate matches when its estimated Jaccard similarity reaches the threshold and its model and
+    sampling parameters are identical. The index maps a match to the exact cache key of its response,
+    so responses themselves stay in cache_handler. The number of indexed prompts is bounded and the
+    least recently used ones are evicted first.
+    """
+
+    def __init__(self, threshold: float = 0.9, max_entries: int = 100000, num_perm: int = 64,
+                 bands: int = 8, shingle_size: int = 5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands.")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        # entry id -> (signature, params digest, cache key)
+        self._entries: "OrderedDict[int, Tuple[bytes, int, str]]" = OrderedDict()
+        # band key -> id of the latest entry in that bucket
+        self._buckets: Dict[int, int] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _signature(self, prompt: str) -> array:
+        """
+        Computes a MinHash signature with one-permutation hashing: every shingle is hashed once, the low
+        bits pick one of `num_perm` bins and each bin keeps its minimum. Empty bins borrow the value of
+        the next non-empty bin (rotation densification), so a signature costs O(shingles) instead of
+        O(shingles * num_perm).
+        """
+        text = normalize_prompt(prompt)
+        n = self.shingle_size
+        k = self.num_perm
+        # Built-in string hashing is salted per process, which is fine for a process-local index
+        hashes = {hash(text[i:i + n]) & 0xFFFFFFFFFFFFFFFF for i in range(max(1, len(text) - n + 1))}
+        bins = [_EMPTY] * k
+        for h in hashes:
+            slot, value = h % k, h >> 32
+            if value < bins[slot]:
+                bins[slot] = value
+        if _EMPTY in bins:
+            filled = list(bins)
+            for slot in range(k):
+                if filled[slot] == _EMPTY:
+                    for distance in range(1, k):
+                        value = filled[(slot + distance) % k]
+                        if value != _EMPTY:
+                            bins[slot] = (value + distance * _ROTATION) & 0xFFFFFFFF
+                            break
+        return array("I", bins)
+
+    @staticmethod
+    def _params_digest(request_data: Dict[str, Any]) -> int:
+        params = canonical_request(request_data)
+        del params["prompt"]
+        return hash(tuple(sorted(params.items())))
+
+    def _band_keys(self, signature: array, params_digest: int) -> List[int]:
+        rows = self.rows
+        return [hash((params_digest, band, signature[band * rows:(band + 1) * rows].tobytes()))
+                for band in range(self.bands)]
+
+    def _similarity(self, signature: array, other: bytes) -> float:
+        other_signature = array("I")
+        other_signature.frombytes(other)
+        return sum(a == b for a, b in zip(signature, other_signature)) / self.num_perm
+
+    def lookup(self, request_data: Dict[str, Any]) -> Optional[str]:
+        """
+        Finds the cache key of an indexed request with a near-duplicate prompt and identical parameters.
+
+        Args:
+            request_data (Dict[str, Any]): Data containing the prompt, model selection, and parameters.
+
+        Returns:
+            Optional[str]: The cache key of the most similar match above the threshold, or None.
+        """
+        signature = self._signature(request_data["prompt"])
+        params_digest = self._params_digest(request_data)
+        best_id, best_similarity = None, self.threshold
+        for band_key in self._band_keys(signature, params_digest):
+            entry_id = self._buckets.get(band_key)
+            if entry_id is None or entry_id == best_id:
+                continue
+            other, other_params, _ = self._entries[entry_id]
+            if other_params != params_digest:
+                continue
+            similarity = self._similarity(signature, other)
+            if similarity >= best_similarity:
+                best_id, best_similarity = entry_id, similarity
+        if best_id is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(best_id)
+        return self._entries[best_id][2]
+
+    def add(self, request_data: Dict[str, Any], cache_key: str):
+        """
+        Indexes a request whose response is cached under `cache_key`.
+
+        Args:
+            request_data (Dict[str, Any]): Data containing the prompt, model selection, and parameters.
+            cache_key (str): Key of the cached response in cache_handler.
+        """
+        signature = self._signature(request_data["prompt"])
+        params_digest = self._params_digest(request_data)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (signature.tobytes(), params_digest, cache_key)
+        for band_key in self._band_keys(signature, params_digest):
+            self._buckets[band_key] = entry_id
+        while len(self._entries) > self.max_entries:
+            self._evict()
+
+    def _evict(self):
+        entry_id, (signature_bytes, params_digest, _) = self._entries.popitem(last=False)
+        signature = array("I")
+        signature.frombytes(signature_bytes)
+        for band_key in self._band_keys(signature, params_digest):
+            if self._buckets.get(band_key) == entry_id:
+                del self._buckets[band_key]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of indexed prompts and the lookup hit and miss counts.
+        """
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
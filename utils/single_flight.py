@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+class _Call:
+    """
+    A shared in-flight execution and the number of callers awaiting it.
+    """
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+
+    The first caller for a key starts the execution; callers arriving while it is in flight await
+    the same result or exception. A cancelled caller only stops waiting. The shared execution is
+    cancelled once no caller is waiting for it anymore.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Runs `fn` for `key`, or joins the execution already in flight for it.
+
+        Args:
+            key (str): Key identifying identical calls.
+            fn (Callable[[], Awaitable[Any]]): Factory for the awaitable to execute.
+
+        Returns:
+            Any: The result of the shared execution.
+
+        Raises:
+            Exception: Whatever the shared execution raised.
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is interested in the result anymore
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of executions started, calls coalesced into them and executions in flight.
+        """
+        return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
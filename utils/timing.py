@@ -0,0 +1,98 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from .logger import logger
+
+class RequestTimings:
+    """
+    Time spent in each phase of handling one request, in seconds. Phases entered several times add up.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last_mark = self.started
+        self.phases: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def mark(self, name: str):
+        """
+        Records the time since the request started, or since the previous mark, as phase `name`.
+        """
+        now = time.perf_counter()
+        self.add(name, now - self._last_mark)
+        self._last_mark = now
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self) -> str:
+        """
+        Formats the phases, and the time elapsed so far as "total", as a Server-Timing header value.
+        """
+        metrics = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        metrics.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(metrics)
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+def current_timings() -> Optional[RequestTimings]:
+    """
+    Returns the timings of the request being handled, or None outside of a timed request.
+    """
+    return _current.get()
+
+@contextmanager
+def phase(name: str):
+    """
+    Adds the time spent in the block to phase `name` of the current request. Outside of a timed
+    request, e.g. with SERVER_TIMING_ENABLED off or in background jobs, this only costs a context
+    variable lookup.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware collecting the phase timings of each HTTP request. The phases recorded up to the
+    response headers are sent in a `Server-Timing` header, which browser developer tools display;
+    all phases are logged once the response has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+
+        async def send_with_timings(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timings.header().encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _current.reset(token)
+            logger.info(
+                "%s %s %s timings: %s", scope["method"], scope["path"], status, timings.header(),
+                extra={"timings": {name: round(seconds * 1000, 3) for name, seconds in timings.phases.items()},
+                       "duration_ms": round(timings.elapsed() * 1000, 3), "status": status},
+            )